@@ -0,0 +1,207 @@
+"""
+Measures end-to-end downloads against a local stand-in for Uqload.
+
+UQLoad resolves a video from the stand-in's embed and plain pages and then
+downloads it, and FileDownloader fetches the file directly. Each run happens in
+a fresh process so its peak RSS is its own. The median of every metric is
+printed as a table and written as JSON, to compare across versions.
+
+Metrics:
+    time_to_info_s: seconds until the video info is known, including the size
+        and what the container probe reads from the movie's moov.
+    mb_per_s: download throughput in MB (10^6 bytes) per second.
+    cpu_s_per_gib: CPU seconds of the client process per GiB downloaded.
+    peak_rss_mib: peak resident memory of the client process.
+
+Usage:
+    python benchmarks/bench_e2e.py [--size MIB] [--latency MS] [--bandwidth MIBPS]
+        [--connections 1,4] [--repeat N] [--output FILE] [--compare FILE]
+"""
+
+import argparse, contextlib, json, multiprocessing, os, platform, statistics
+import sys, tempfile, time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from local_server import start_server
+from uqload_dl import http_pool
+from uqload_dl.file_downloader import FileDownloader
+from uqload_dl.uqload import UQLoad
+from uqload_dl.version import __version__
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+GIB = 1024**3
+# Host the stand-in answers for, through the pool's resolve map.
+UQLOAD_HOST = "uqload.cx"
+VIDEO_URL = f"http://{UQLOAD_HOST}/embed-vule3vel9n5q.html"
+METRICS = ("time_to_info_s", "mb_per_s", "cpu_s_per_gib", "peak_rss_mib")
+
+
+def peak_rss_mib():
+    """Returns the peak resident memory of this process in MiB, if known."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def run_once(client: str, port: int, size: int, connections: int) -> dict:
+    """Runs one download in this (fresh) process and returns its metrics."""
+    http_pool.get_default_pool().resolve[(UQLOAD_HOST, 80)] = ("127.0.0.1", port)
+    with tempfile.TemporaryDirectory() as directory, open(
+        os.devnull, "w"
+    ) as devnull, contextlib.redirect_stdout(devnull):
+        started, cpu_started = time.perf_counter(), time.process_time()
+        if client == "uqload":
+            downloader = UQLoad(
+                VIDEO_URL, output_dir=directory, connections=connections
+            )
+            info = downloader.get_video_info()
+        else:
+            downloader = FileDownloader(
+                f"http://{UQLOAD_HOST}/vule3vel9n5q/v.mp4",
+                output_dir=directory,
+                connections=connections,
+            )
+            downloader.fetch_metadata()
+            info = {"size": downloader.total_size}
+        time_to_info = time.perf_counter() - started
+
+        download_started = time.perf_counter()
+        downloader.download()
+        elapsed = time.perf_counter() - download_started
+        cpu = time.process_time() - cpu_started
+
+        if info["size"] != size or os.path.getsize(downloader.destination) != size:
+            raise RuntimeError(f"{client}: incomplete download")
+
+    return {
+        "time_to_info_s": time_to_info,
+        "mb_per_s": size / elapsed / 1e6,
+        "cpu_s_per_gib": cpu * GIB / size,
+        "peak_rss_mib": peak_rss_mib(),
+    }
+
+
+def measure(client: str, port: int, size: int, connections: int, repeat: int):
+    """Returns the median metrics of `repeat` runs, each in a new process."""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            runs.append(
+                executor.submit(run_once, client, port, size, connections).result()
+            )
+    return {
+        metric: (
+            None
+            if any(run[metric] is None for run in runs)
+            else statistics.median(run[metric] for run in runs)
+        )
+        for metric in METRICS
+    }
+
+
+def compare(results: list, baseline_path: str) -> None:
+    """Prints the change of every metric against an earlier JSON report."""
+    with open(baseline_path, encoding="utf-8") as file:
+        baseline = json.load(file)
+    previous = {
+        (result["client"], result["connections"]): result
+        for result in baseline["results"]
+    }
+    print(f"\nchanges against {baseline_path} ({baseline.get('version')}):")
+    for result in results:
+        old = previous.get((result["client"], result["connections"]))
+        if old is None:
+            continue
+        changes = [
+            f"{metric} {(result[metric] - old[metric]) / old[metric]:+.1%}"
+            for metric in METRICS
+            if result.get(metric) is not None and old.get(metric)
+        ]
+        case = f"{result['client']:<16} x{result['connections']:<3}"
+        print(f"{case} {', '.join(changes)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=256, help="File size in MiB")
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Delay of every request in ms"
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=0,
+        help="Bandwidth per connection in MiB/s (0 for unlimited)",
+    )
+    parser.add_argument(
+        "--connections", default="1,4", help="Comma separated connection counts"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case")
+    parser.add_argument(
+        "--output", default="bench_e2e.json", help="JSON report, '-' for stdout"
+    )
+    parser.add_argument("--compare", help="An earlier JSON report to compare with")
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    bandwidth = int(args.bandwidth * 1024 * 1024) or None
+    connections = [int(value) for value in args.connections.split(",")]
+    url, server = start_server(size, args.latency / 1000, bandwidth)
+    port = urlsplit(url).port
+
+    results = []
+    try:
+        print(
+            f"{'client':<16} {'conns':>5} {'info s':>8} {'MB/s':>9} "
+            f"{'CPU s/GiB':>10} {'RSS MiB':>8}"
+        )
+        for client in ("uqload", "file_downloader"):
+            for count in connections:
+                metrics = measure(client, port, size, count, args.repeat)
+                results.append({"client": client, "connections": count, **metrics})
+                rss = metrics["peak_rss_mib"]
+                print(
+                    f"{client:<16} {count:>5} {metrics['time_to_info_s']:>8.3f} "
+                    f"{metrics['mb_per_s']:>9.1f} {metrics['cpu_s_per_gib']:>10.3f} "
+                    f"{'-' if rss is None else f'{rss:.1f}':>8}"
+                )
+    finally:
+        server.terminate()
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {
+            "size_mib": args.size,
+            "latency_ms": args.latency,
+            "bandwidth_mib_per_s": args.bandwidth or None,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output == "-":
+        print(json.dumps(report, indent=2))
+    else:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"\nresults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Measures page extraction throughput and worst-case latency on saved pages.
+
+Every embed/plain page pair of tests/fixtures/pages is extracted with the
+original multi-pass regexes and with the single-pass extractor.
+
+Usage:
+    python benchmarks/bench_extract.py [--rounds N]
+"""
+
+import argparse, os, re, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from uqload_dl.exceptions import VideoNotFound
+from uqload_dl.extractor import extract_video_data
+from uqload_dl.utils import remove_special_characters
+
+FIXTURES = os.path.join(ROOT, "tests", "fixtures", "pages")
+PAIRS = (
+    ("embed_ok.html", "page_ok.html"),
+    ("embed_minified.html", "page_no_resolution.html"),
+    ("embed_ok.html", "page_err.html"),
+    ("embed_deleted.html", "page_err.html"),
+)
+
+
+def legacy_extract(embed_page: str, page: str) -> dict:
+    """The original extraction: one re.findall per field over the whole page."""
+    if "File was deleted" in embed_page:
+        raise VideoNotFound("The video has been deleted or does not exist")
+    matches = re.findall(r"https?://.+/v\.mp4", embed_page)
+    if not matches:
+        raise VideoNotFound("The video has been deleted or does not exist")
+    image_url = re.findall(r"https?://.*?\.jpg", embed_page)[0]
+    title_match = re.findall(r'title:\s*"([^"]+)"', embed_page)
+    title = title_match[0] if title_match else "video"
+    resolution = duration = None
+    class_names = re.findall(r'class\s*=\s*[\'"]([^\'" ]+)[\'"]', page)
+    if not "err" in class_names:
+        h1_match = re.findall(r"<h1[^>]*>(.*?)</h1>", page, re.DOTALL)
+        if h1_match:
+            title = remove_special_characters(" ".join(h1_match[0].split()))
+        textareas = re.findall(r"<textarea[^>]*>(.*?)</textarea>", page, re.DOTALL)
+        for text in textareas:
+            match = re.search(r"\[(\d+x\d+)\, ((\d+:)*\d+)\]", text)
+            if match:
+                resolution, duration = match.group(1), match.group(2)
+                break
+    return {
+        "video_url": matches[0],
+        "image_url": image_url,
+        "title": title,
+        "resolution": resolution,
+        "duration": duration,
+    }
+
+
+def measure(function, pages, rounds: int):
+    """Returns (extractions per second, worst latency in ms) over every pair."""
+    worst, started = 0.0, time.perf_counter()
+    for _ in range(rounds):
+        for embed_page, page in pages:
+            call_started = time.perf_counter()
+            try:
+                function(embed_page, page)
+            except VideoNotFound:
+                pass
+            worst = max(worst, time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    return rounds * len(pages) / elapsed, worst * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=500, help="Passes over the pages")
+    args = parser.parse_args()
+
+    def read(name: str) -> str:
+        with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+            return file.read()
+
+    pages = [(read(embed_page), read(page)) for embed_page, page in PAIRS]
+
+    re.purge()
+    print(f"{'extractor':<12} {'extractions/s':>14} {'worst ms':>10}")
+    extractors = (("multi-pass", legacy_extract), ("single-pass", extract_video_data))
+    for name, function in extractors:
+        per_second, worst = measure(function, pages, args.rounds)
+        print(f"{name:<12} {per_second:>14.0f} {worst:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
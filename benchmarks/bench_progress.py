@@ -0,0 +1,53 @@
+"""
+Measures the progress-reporting overhead per GiB, before and after coalescing.
+
+The transfer itself is simulated: only the progress path is exercised, with
+the progress bar printing to os.devnull.
+
+Usage:
+    python benchmarks/bench_progress.py [--chunk KIB]
+"""
+
+import argparse, contextlib, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uqload_dl.cli import make_progress_callback
+from uqload_dl.progress_bar import ProgressBar
+from uqload_dl.progress_dispatcher import ProgressDispatcher
+
+GIB = 1024**3
+
+
+def per_chunk(chunk: int) -> int:
+    """The original behavior: a new ProgressBar drawn after every chunk."""
+    callback = lambda downloaded, total: ProgressBar(total).update(downloaded)
+    for downloaded in range(chunk, GIB + 1, chunk):
+        callback(downloaded, GIB)
+    return GIB // chunk
+
+
+def coalesced(chunk: int) -> int:
+    """The current behavior: one ProgressBar behind a ProgressDispatcher."""
+    dispatcher = ProgressDispatcher(make_progress_callback())
+    for downloaded in range(chunk, GIB + 1, chunk):
+        dispatcher.update(downloaded, GIB)
+    return dispatcher.delivered
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk", type=int, default=8, help="Chunk size in KiB")
+    args = parser.parse_args()
+
+    print(f"{'progress':<10} {'callbacks':>10} {'CPU s/GiB':>10}")
+    for name, function in (("per-chunk", per_chunk), ("coalesced", coalesced)):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            started = time.process_time()
+            callbacks = function(args.chunk * 1024)
+            elapsed = time.process_time() - started
+        print(f"{name:<10} {callbacks:>10} {elapsed:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
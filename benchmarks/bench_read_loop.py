@@ -0,0 +1,71 @@
+"""
+Compares the CPU cost of the download loop before and after the readinto rewrite.
+
+Usage:
+    python benchmarks/bench_read_loop.py [--size MIB] [--repeat N]
+"""
+
+import argparse, os, sys, tempfile, time, urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_server import start_server
+from uqload_dl.file_downloader import FileDownloader
+
+GIB = 1024**3
+
+
+def legacy_download(url: str, destination: str) -> None:
+    """The original loop: a new 8 KiB bytes object and a callback per chunk."""
+    downloaded = 0
+    with urllib.request.urlopen(url) as response:
+        with open(destination, "wb") as file:
+            while chunk := response.read(8192):
+                file.write(chunk)
+                downloaded += len(chunk)
+
+
+def current_download(url: str, destination: str) -> None:
+    """The current FileDownloader.download() loop."""
+    downloader = FileDownloader(
+        url,
+        filename=os.path.splitext(os.path.basename(destination))[0],
+        output_dir=os.path.dirname(destination),
+        on_progress_callback=lambda downloaded, total: None,
+    )
+    downloader.download()
+    downloader.delete_file()
+
+
+def measure(function, url: str, size: int, repeat: int) -> float:
+    """Returns the best CPU-seconds per GiB over `repeat` runs."""
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for index in range(repeat):
+            destination = os.path.join(directory, f"bench_{index}.mp4")
+            started = time.process_time()
+            function(url, destination)
+            results.append((time.process_time() - started) * GIB / size)
+            if os.path.exists(destination):
+                os.remove(destination)
+    return min(results)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=512, help="File size in MiB")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per loop")
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    url, server = start_server(size)
+    try:
+        print(f"{'loop':<10} {'CPU s/GiB':>10}")
+        for name, function in (("legacy", legacy_download), ("readinto", current_download)):
+            print(f"{name:<10} {measure(function, url, size, args.repeat):>10.3f}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
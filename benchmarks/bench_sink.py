@@ -0,0 +1,138 @@
+"""
+Compares the file sinks that write downloads to disk.
+
+Each backend writes a file of the given size in chunks, from one thread or
+from several threads writing contiguous segments at the same time, as a
+segmented download does. "legacy" is the writing done before the sinks: a
+file grown chunk by chunk, or truncated and written through one file object
+per segment. The time includes opening, preallocating and the fsync policy.
+Where the filefrag tool exists, the extents of the result are counted.
+
+Point --dir at the disk to test, e.g. a spinning-disk archive volume.
+
+Usage:
+    python benchmarks/bench_sink.py [--size MIB] [--chunk KIB] [--segments 1,4]
+        [--fsync never|complete|periodic] [--dir PATH]
+"""
+
+import argparse, os, re, shutil, subprocess, sys, tempfile, time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uqload_dl.file_sink import FSYNC_POLICIES, SINKS, open_sink
+
+GIB = 1024**3
+# Seconds between two syncs with the "periodic" policy, as the download journal.
+SYNC_INTERVAL = 1.0
+
+
+def segments_of(size: int, count: int):
+    """Splits [0, size) into `count` contiguous (start, end) segments."""
+    step = -(-size // count)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+def legacy_write(path: str, size: int, chunk: bytes, count: int, fsync: str) -> None:
+    """The writing done before the sinks."""
+    if count == 1:
+        with open(path, "wb") as file:
+            for offset in range(0, size, len(chunk)):
+                file.write(chunk[: size - offset])
+            if fsync != "never":
+                file.flush()
+                os.fsync(file.fileno())
+        return
+
+    with open(path, "wb") as file:
+        file.truncate(size)
+
+    def write_segment(start: int, end: int) -> None:
+        with open(path, "r+b") as file:
+            file.seek(start)
+            for offset in range(start, end, len(chunk)):
+                file.write(chunk[: end - offset])
+            if fsync != "never":
+                file.flush()
+                os.fsync(file.fileno())
+
+    with ThreadPoolExecutor(max_workers=count) as executor:
+        for future in [
+            executor.submit(write_segment, *s) for s in segments_of(size, count)
+        ]:
+            future.result()
+
+
+def sink_write(
+    kind: str, path: str, size: int, chunk: bytes, count: int, fsync: str
+) -> None:
+    """Writes through a sink like FileDownloader does."""
+    sink = open_sink(kind, path, size)
+    synced_at = time.monotonic()
+
+    def write_segment(start: int, end: int) -> None:
+        nonlocal synced_at
+        view = memoryview(chunk)
+        for offset in range(start, end, len(chunk)):
+            sink.write(offset, view[: end - offset])
+            if fsync == "periodic" and time.monotonic() - synced_at > SYNC_INTERVAL:
+                synced_at = time.monotonic()
+                sink.sync()
+
+    try:
+        with ThreadPoolExecutor(max_workers=count) as executor:
+            for future in [
+                executor.submit(write_segment, *s) for s in segments_of(size, count)
+            ]:
+                future.result()
+    finally:
+        sink.close(sync=fsync != "never")
+
+
+def extents(path: str):
+    """Returns the number of extents of a file, or None without filefrag."""
+    if not shutil.which("filefrag"):
+        return None
+    output = subprocess.run(["filefrag", path], capture_output=True, text=True).stdout
+    match = re.search(r"(\d+) extents? found", output)
+    return int(match.group(1)) if match else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=1024, help="File size in MiB")
+    parser.add_argument("--chunk", type=int, default=256, help="Write size in KiB")
+    parser.add_argument(
+        "--segments", default="1,4", help="Comma separated writer thread counts"
+    )
+    parser.add_argument("--fsync", choices=FSYNC_POLICIES, default="complete")
+    parser.add_argument("--dir", help="Directory to write in, defaults to a temp dir")
+    args = parser.parse_args()
+
+    size = args.size * 1024 * 1024
+    chunk = os.urandom(args.chunk * 1024)
+    counts = [int(value) for value in args.segments.split(",")]
+
+    print(f"{'sink':<10} {'segments':>8} {'MB/s':>9} {'CPU s/GiB':>10} {'extents':>8}")
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        path = os.path.join(directory, "bench.mp4.part")
+        for kind in ("legacy", *SINKS):
+            for count in counts:
+                started, cpu_started = time.perf_counter(), time.process_time()
+                if kind == "legacy":
+                    legacy_write(path, size, chunk, count, args.fsync)
+                else:
+                    sink_write(kind, path, size, chunk, count, args.fsync)
+                elapsed = time.perf_counter() - started
+                cpu = time.process_time() - cpu_started
+                fragments = extents(path)
+                os.remove(path)
+                print(
+                    f"{kind:<10} {count:>8} {size / elapsed / 1e6:>9.1f} "
+                    f"{cpu * GIB / size:>10.3f} "
+                    f"{'-' if fragments is None else fragments:>8}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Local HTTP server used by the benchmarks.
+
+It serves a synthetic MP4 of a given size at /v.mp4, with HEAD and Range
+support, from a separate process so the benchmarked client is measured alone.
+The movie is fast start: its ftyp and moov come first and describe one video
+track of fixed-size frames, so clients probe it like a real video. The frames
+are zero bytes.
+
+It also stands in for Uqload: /embed-<id>.html and /<id>.html answer with the
+saved pages of tests/fixtures/pages, whose video link is rewritten to point
+back at this server, and /<id>/v.mp4 serves the synthetic file. Point a host
+such as uqload.cx at it with http_pool's resolve map.
+
+Every request can be delayed by a fixed latency, and bodies can be throttled
+to a bandwidth per connection.
+"""
+
+import multiprocessing, os, re, struct, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+from uqload_dl.mp4 import MAX_UINT32, make_box, make_full_box
+
+BLOCK = bytes(1024 * 1024)
+# Block size used when the bandwidth is throttled, for a smooth rate.
+THROTTLED_BLOCK = 64 * 1024
+
+# The served movie: 720p frames of 256 KiB at 25 frames per second.
+FRAME_SIZE = 256 * 1024
+FRAME_RATE = 25
+WIDTH, HEIGHT = 1280, 720
+
+PAGES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "tests",
+    "fixtures",
+    "pages",
+)
+EMBED_PAGE = "embed_ok.html"
+VIDEO_PAGE = "page_ok.html"
+
+EMBED_PATH_PATTERN = re.compile(r"^/embed-([a-zA-Z0-9]{12})\.html$")
+VIDEO_PAGE_PATH_PATTERN = re.compile(r"^/([a-zA-Z0-9]{12})\.html$")
+SOURCES_PATTERN = re.compile(r'sources: \["[^"]+"\]')
+
+
+def read_page(name: str) -> str:
+    """Returns a saved page of tests/fixtures/pages."""
+    with open(os.path.join(PAGES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+def build_movie_head(size: int) -> bytes:
+    """
+    Builds the start of a fast start MP4 of `size` bytes, up to its samples.
+
+    The moov holds one video track of as many frames as fit in the file, all
+    in one chunk, and the mdat runs to the end of the file.
+
+    Args:
+        size (int): Size in bytes of the whole file.
+
+    Returns:
+        bytes: The ftyp, the moov and the mdat header.
+
+    Raises:
+        ValueError: If the file is too small for a single frame.
+    """
+    ftyp = make_box("ftyp", b"isom\0\0\2\0isomavc1mp41")
+
+    def build(frames: int, offset: int, mdat_header: bytes) -> bytes:
+        delta = 1000 // FRAME_RATE
+        duration = frames * delta
+        tkhd = make_full_box(
+            "tkhd",
+            0,
+            struct.pack(">IIIII", 0, 0, 1, 0, duration),
+            bytes(52),
+            struct.pack(">II", WIDTH << 16, HEIGHT << 16),
+        )
+        mdhd = make_full_box(
+            "mdhd", 0, struct.pack(">IIIIHH", 0, 0, 1000, duration, 0, 0)
+        )
+        hdlr = make_full_box("hdlr", 0, struct.pack(">I4s12x", 0, b"vide"), b"\0")
+        stbl = make_box(
+            "stbl",
+            make_full_box("stsd", 0, struct.pack(">I", 1), make_box("avc1", bytes(8))),
+            make_full_box("stts", 0, struct.pack(">III", 1, frames, delta)),
+            make_full_box("stsc", 0, struct.pack(">IIII", 1, 1, frames, 1)),
+            make_full_box("stsz", 0, struct.pack(">II", FRAME_SIZE, frames)),
+            make_full_box("stco", 0, struct.pack(">II", 1, offset)),
+        )
+        minf = make_box("minf", make_full_box("vmhd", 0, bytes(8)), stbl)
+        trak = make_box("trak", tkhd, make_box("mdia", mdhd, hdlr, minf))
+        mvhd = make_full_box(
+            "mvhd", 0, struct.pack(">IIII", 0, 0, 1000, duration), bytes(80)
+        )
+        return ftyp + make_box("moov", mvhd, trak) + mdat_header
+
+    # The boxes have the same size whatever the frame count and offset: a small
+    # mdat gets an empty free box in place of the 64-bit size.
+    head_size = len(build(0, 0, bytes(16)))
+    frames = (size - head_size) // FRAME_SIZE
+    if frames < 1:
+        raise ValueError(f"A movie needs at least {head_size + FRAME_SIZE} bytes")
+    payload = size - head_size
+    mdat_header = (
+        struct.pack(">I4sQ", 1, b"mdat", payload + 16)
+        if payload + 16 > MAX_UINT32
+        else make_box("free") + struct.pack(">I4s", payload + 8, b"mdat")
+    )
+    return build(frames, head_size, mdat_header)
+
+
+class SyntheticFileHandler(BaseHTTPRequestHandler):
+    """Serves a synthetic MP4 of `size` bytes, and the pages linking to it."""
+
+    protocol_version = "HTTP/1.1"
+    size = 0
+    # The ftyp, moov and mdat header of the movie, followed by zero bytes.
+    head = b""
+    latency = 0.0
+    bandwidth: Optional[int] = None
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def __send_headers(self) -> Tuple[int, int]:
+        time.sleep(self.latency)
+        start, end = 0, self.size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2) or end), end)
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{self.size}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+        return start, end
+
+    def __page(self) -> Optional[bytes]:
+        """Returns the page asked for, or None if the path is not a page."""
+        match = EMBED_PATH_PATTERN.match(self.path)
+        if match:
+            video_url = f"http://{self.headers['Host']}/{match.group(1)}/v.mp4"
+            page = SOURCES_PATTERN.sub(
+                f'sources: ["{video_url}"]', read_page(EMBED_PAGE)
+            )
+            return page.encode()
+        if VIDEO_PAGE_PATH_PATTERN.match(self.path):
+            return read_page(VIDEO_PAGE).encode()
+        return None
+
+    def __write(self, data: bytes) -> None:
+        """Writes a body, no faster than the bandwidth if one is set."""
+        block_size = THROTTLED_BLOCK if self.bandwidth else len(BLOCK)
+        started, sent = time.perf_counter(), 0
+        for position in range(0, len(data), block_size):
+            block = data[position : position + block_size]
+            self.wfile.write(block)
+            sent += len(block)
+            if self.bandwidth:
+                delay = started + sent / self.bandwidth - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def do_HEAD(self) -> None:
+        self.__send_headers()
+
+    def do_GET(self) -> None:
+        page = self.__page()
+        if page is not None:
+            time.sleep(self.latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.__write(page)
+            return
+
+        start, end = self.__send_headers()
+        head = self.head[start : end + 1]
+        remaining = end - start + 1 - len(head)
+        try:
+            self.__write(head)
+            while remaining > 0:
+                block = memoryview(BLOCK)[: min(remaining, len(BLOCK))]
+                self.__write(block)
+                remaining -= len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def _serve(
+    size: int, head: bytes, latency: float, bandwidth: Optional[int], queue
+) -> None:
+    attributes = {
+        "size": size,
+        "head": head,
+        "latency": latency,
+        "bandwidth": bandwidth,
+    }
+    handler = type("Handler", (SyntheticFileHandler,), attributes)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_server(
+    size: int, latency: float = 0.0, bandwidth: Optional[int] = None
+) -> Tuple[str, multiprocessing.Process]:
+    """
+    Starts the server in a child process.
+
+    Args:
+        size (int): Size in bytes of the served file.
+        latency (float, optional): Seconds every request waits before its answer.
+        bandwidth (int, optional): Bytes per second sent on each connection.
+
+    Returns:
+        Tuple[str, multiprocessing.Process]: The file URL and the server process.
+
+    Raises:
+        ValueError: If the size is too small for a movie.
+    """
+    head = build_movie_head(size)
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_serve, args=(size, head, latency, bandwidth, queue), daemon=True
+    )
+    process.start()
+    return f"http://127.0.0.1:{queue.get()}/v.mp4", process
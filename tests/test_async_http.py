@@ -0,0 +1,98 @@
+import asyncio, pytest, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from uqload_dl.async_http import AsyncHTTPClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path == "/redirect":
+            self.send_response(301)
+            self.send_header("Location", "/page")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in (b"hello ", b"chunked ", b"world"):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", "5")
+            self.end_headers()
+            self.wfile.write(b"hello")
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "5")
+        self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def base_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_keep_alive_connection_is_reused(base_url: str) -> None:
+    async def run() -> AsyncHTTPClient:
+        async with AsyncHTTPClient() as client:
+            for _ in range(3):
+                async with await client.request(f"{base_url}/page") as response:
+                    assert response.getcode() == 200
+                    assert await response.read() == b"hello"
+            async with await client.request(f"{base_url}/page", method="HEAD") as response:
+                assert response.info().get("Content-Length") == "5"
+                assert await response.read() == b""
+            return client
+
+    client = asyncio.run(run())
+    assert client.misses == 1
+    assert client.hits == 3
+
+
+def test_chunked_body(base_url: str) -> None:
+    async def run() -> bytes:
+        async with AsyncHTTPClient() as client:
+            async with await client.request(f"{base_url}/chunked") as response:
+                return await response.read()
+
+    assert asyncio.run(run()) == b"hello chunked world"
+
+
+def test_redirect_is_followed(base_url: str) -> None:
+    async def run() -> str:
+        async with AsyncHTTPClient() as client:
+            async with await client.request(f"{base_url}/redirect") as response:
+                assert await response.read() == b"hello"
+                return response.url
+
+    assert asyncio.run(run()) == f"{base_url}/page"
+
+
+def test_concurrent_requests_are_bounded(base_url: str) -> None:
+    async def run() -> list:
+        async with AsyncHTTPClient(max_connections=2) as client:
+
+            async def fetch() -> bytes:
+                async with await client.request(f"{base_url}/page") as response:
+                    return await response.read()
+
+            return await asyncio.gather(*(fetch() for _ in range(10)))
+
+    assert asyncio.run(run()) == [b"hello"] * 10
+
+
+def test_unsupported_url() -> None:
+    with pytest.raises(ValueError):
+        asyncio.run(AsyncHTTPClient().request("ftp://example.com/file"))
@@ -0,0 +1,169 @@
+import asyncio, gzip, os, pytest, re, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator
+from uqload_dl.async_uqload import AsyncFileDownloader, AsyncUQLoad
+from uqload_dl.download_journal import DownloadJournal
+from uqload_dl.exceptions import VideoNotFound
+
+CONTENT = bytes(range(256)) * 4096
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        start, end = 0, len(CONTENT) - 1
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        if match:
+            start, end = int(match.group(1)), int(match.group(2))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(CONTENT)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self.wfile.write(CONTENT[start : end + 1])
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(CONTENT)))
+        self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def file_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v.mp4"
+    server.shutdown()
+
+
+def test_async_download(file_url: str, tmp_path) -> None:
+    progress = []
+
+    async def run() -> AsyncFileDownloader:
+        downloader = AsyncFileDownloader(
+            file_url,
+            output_dir=str(tmp_path),
+            on_progress_callback=lambda downloaded, total: progress.append(downloaded),
+        )
+        await downloader.download()
+        await downloader.aclose()
+        return downloader
+
+    downloader = asyncio.run(run())
+    with open(downloader.destination, "rb") as file:
+        assert file.read() == CONTENT
+    assert downloader.total_size == len(CONTENT)
+    assert downloader.type == "video/mp4"
+    assert progress[-1] == len(CONTENT)
+    assert os.listdir(tmp_path) == ["v.mp4"]
+
+
+def test_async_download_resumes(file_url: str, tmp_path) -> None:
+    partial = os.path.join(tmp_path, "v.mp4.part")
+    with open(partial, "wb") as file:
+        file.write(CONTENT[:1000])
+    journal = DownloadJournal(f"{partial}.json", file_url, len(CONTENT))
+    journal.add(0, 1000)
+    journal.save()
+
+    async def run() -> AsyncFileDownloader:
+        downloader = AsyncFileDownloader(file_url, output_dir=str(tmp_path))
+        await downloader.fetch_metadata()
+        await downloader.download()
+        await downloader.aclose()
+        return downloader
+
+    downloader = asyncio.run(run())
+    with open(downloader.destination, "rb") as file:
+        assert file.read() == CONTENT
+    assert not os.path.exists(partial)
+
+
+class FakeResponse:
+    def __init__(self, body: bytes, headers: Dict[str, str] = None) -> None:
+        self.body = body
+        self.headers = headers or {}
+
+    def getcode(self) -> int:
+        return 200
+
+    def info(self) -> Dict[str, str]:
+        return self.headers
+
+    async def read(self, amt: int = None) -> bytes:
+        body, self.body = self.body, b""
+        return body
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+
+class FakeClient:
+    def __init__(self, pages: Dict[str, str], gzip_pages: bool = False) -> None:
+        self.pages = pages
+        self.gzip_pages = gzip_pages
+
+    async def request(self, url: str, **kwargs) -> FakeResponse:
+        body = self.pages[url].encode("utf-8")
+        if self.gzip_pages:
+            return FakeResponse(gzip.compress(body), {"Content-Encoding": "gzip"})
+        return FakeResponse(body)
+
+
+@pytest.mark.parametrize("gzip_pages", [False, True])
+def test_async_uqload_video_info(tmp_path, gzip_pages: bool) -> None:
+    client = FakeClient(
+        {
+            "https://uqload.cx/embed-vule3vel9n5q.html": (
+                '<video src="https://m180.uqload.cx/abc/v.mp4"></video>'
+                '<img src="https://m180.uqload.cx/i/abc.jpg">'
+            ),
+            "https://uqload.cx/vule3vel9n5q.html": (
+                "<h1>My Title</h1><textarea>[1280x720, 10:00]</textarea>"
+            ),
+        },
+        gzip_pages,
+    )
+    uq = AsyncUQLoad("vule3vel9n5q", output_dir=str(tmp_path), client=client)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+
+        async def fetch_metadata(self) -> None:
+            self.total_size, self.type = 100, "video/mp4"
+
+        monkeypatch.setattr(AsyncFileDownloader, "fetch_metadata", fetch_metadata)
+        info = asyncio.run(uq.get_video_info())
+
+    assert info["url"] == "https://m180.uqload.cx/abc/v.mp4"
+    assert info["title"] == "My Title"
+    assert info["resolution"] == "1280x720"
+    assert info["duration"] == "10:00"
+    assert info["size"] == 100
+
+
+def test_async_uqload_deleted_video() -> None:
+    client = FakeClient(
+        {
+            "https://uqload.cx/embed-vule3vel9n5q.html": "File was deleted",
+            "https://uqload.cx/vule3vel9n5q.html": "",
+        }
+    )
+    uq = AsyncUQLoad("vule3vel9n5q", client=client)
+    with pytest.raises(VideoNotFound):
+        asyncio.run(uq.get_video_info())
+
+
+def test_async_uqload_invalid_url() -> None:
+    with pytest.raises(ValueError):
+        AsyncUQLoad("invalid_url")
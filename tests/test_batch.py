@@ -0,0 +1,195 @@
+import pytest, os, time
+from threading import Lock
+from uqload_dl.batch import (
+    BatchDownloader,
+    BatchSummary,
+    ProcessBatchDownloader,
+    iter_batch_input,
+)
+from uqload_dl.cli import main
+from uqload_dl.exceptions import VideoNotFound
+from unittest.mock import patch
+
+
+class FakeBatch(BatchDownloader):
+    """Writes a small file per job instead of downloading, in worker processes."""
+
+    def _download(self, url):
+        if url == "gone":
+            raise VideoNotFound("Video not found")
+        if self.on_metrics_callback:
+            self.on_metrics_callback({"job": url, "pid": os.getpid()})
+        path = os.path.join(self.output_dir, f"{url}.mp4")
+        with open(path, "wb") as file:
+            file.write(b"x" * 10)
+        return path
+
+
+class FakeProcessBatch(ProcessBatchDownloader):
+    worker_class = FakeBatch
+
+
+class BrokenBatch(BatchDownloader):
+    def run(self, urls, summary=None):
+        raise RuntimeError("worker failed")
+
+
+class BrokenProcessBatch(ProcessBatchDownloader):
+    worker_class = BrokenBatch
+
+
+class LateBrokenBatch(BatchDownloader):
+    def run(self, urls, summary=None):
+        time.sleep(1)
+        raise RuntimeError("worker failed")
+
+
+class LateBrokenProcessBatch(ProcessBatchDownloader):
+    worker_class = LateBrokenBatch
+
+
+def test_iter_batch_input_reads_urls_and_file(tmp_path) -> None:
+    input_file = tmp_path / "videos.txt"
+    input_file.write_text("# comment\nabc\n\n  def  \n", encoding="utf-8")
+
+    urls = list(iter_batch_input(["first", " "], str(input_file)))
+
+    assert urls == ["first", "abc", "def"]
+
+
+def test_iter_batch_input_reads_stdin(monkeypatch) -> None:
+    monkeypatch.setattr("sys.stdin", iter(["abc\n", "#x\n", "def\n"]))
+    assert list(iter_batch_input(None, "-")) == ["abc", "def"]
+
+
+def test_batch_downloader_invalid_arguments() -> None:
+    with pytest.raises(ValueError):
+        BatchDownloader(concurrency=0)
+
+    with pytest.raises(ValueError):
+        BatchDownloader(per_host="2")
+
+
+def test_batch_summary_counts(tmp_path) -> None:
+    def fake_download(self, url):
+        if url == "gone":
+            raise VideoNotFound("Video not found")
+        if url == "broken":
+            raise ValueError("boom")
+        path = tmp_path / f"{url}.mp4"
+        path.write_bytes(b"x" * 10)
+        return str(path)
+
+    with patch.object(BatchDownloader, "_download", fake_download):
+        summary = BatchDownloader(concurrency=2).run(["a", "gone", "broken", "b"])
+
+    assert (summary.ok, summary.skipped, summary.failed) == (2, 1, 1)
+    assert summary.total == 4
+    assert summary.bytes == 20
+    assert "ok: 2" in summary.format()
+
+
+def _counting_uqload(tmp_path, video_host):
+    """A fake UQLoad counting the transfers running at once."""
+    lock = Lock()
+    running = {"now": 0, "max": 0}
+
+    class FakeUQLoad:
+        def __init__(self, url, **kwargs):
+            self.url = f"https://uqload.cx/embed-{url}.html"
+            self.video_url = f"https://{video_host(url)}/{url}/v.mp4"
+            self.destination = str(tmp_path / f"{url}.mp4")
+
+        def get_video_url(self):
+            return self.video_url
+
+        def download(self):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            time.sleep(0.05)
+            with open(self.destination, "wb") as file:
+                file.write(b"x")
+            with lock:
+                running["now"] -= 1
+
+    return FakeUQLoad, running
+
+
+def test_batch_respects_per_host_limit(tmp_path) -> None:
+    fake_uqload, running = _counting_uqload(tmp_path, lambda url: "m1.uqload.cx")
+
+    with patch("uqload_dl.batch.UQLoad", fake_uqload):
+        batch = BatchDownloader(concurrency=8, per_host=2)
+        summary = batch.run([f"abcdefghijk{i}" for i in range(6)])
+
+    assert summary.ok == 6
+    assert running["max"] == 2
+
+
+def test_batch_limits_transfers_per_video_host(tmp_path) -> None:
+    # Bare IDs all resolve through uqload.cx, but their files are on many hosts.
+    fake_uqload, running = _counting_uqload(
+        tmp_path, lambda url: f"m{url[-1]}.uqload.cx"
+    )
+
+    with patch("uqload_dl.batch.UQLoad", fake_uqload):
+        batch = BatchDownloader(concurrency=4, per_host=2)
+        summary = batch.run([f"abcdefghijk{i}" for i in range(8)])
+
+    assert summary.ok == 8
+    assert running["max"] > 2
+
+
+def test_batch_summary_throughput() -> None:
+    summary = BatchSummary()
+    summary.add("ok", 1000)
+    summary.finished_at = summary.started_at + 2
+    assert summary.elapsed == 2
+    assert summary.throughput == 500
+
+
+def test_cli_batch_mode_exit_code(tmp_path) -> None:
+    with patch.object(BatchDownloader, "run") as mock_run:
+        summary = BatchSummary()
+        summary.add("failed")
+        mock_run.return_value = summary
+        assert main(["-u", "a", "-u", "b", "-o", str(tmp_path)]) == 1
+
+    urls = list(mock_run.call_args[0][0])
+    assert urls == ["a", "b"]
+
+
+def test_process_batch_aggregates_results_and_metrics(tmp_path) -> None:
+    metrics = []
+    batch = FakeProcessBatch(
+        processes=2,
+        concurrency=2,
+        output_dir=str(tmp_path),
+        on_metrics_callback=metrics.append,
+    )
+    summary = batch.run(iter(["gone"] + [f"video{i}" for i in range(8)]))
+
+    assert (summary.ok, summary.skipped, summary.failed) == (8, 1, 0)
+    assert summary.bytes == 80
+    assert sorted(m["job"] for m in metrics) == [f"video{i}" for i in range(8)]
+    assert all(m["pid"] != os.getpid() for m in metrics)
+    assert len(os.listdir(tmp_path)) == 8
+
+
+def test_process_batch_raises_worker_errors(tmp_path) -> None:
+    batch = BrokenProcessBatch(processes=2, output_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        batch.run(iter(f"video{i}" for i in range(20)))
+
+
+def test_process_batch_stops_when_workers_died_with_a_full_queue(tmp_path) -> None:
+    # The only job fills the queue, and the worker dies without taking it.
+    batch = LateBrokenProcessBatch(processes=1, concurrency=1, output_dir=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        batch.run(iter(["video"]))
+
+
+def test_process_batch_invalid_processes() -> None:
+    with pytest.raises(ValueError):
+        ProcessBatchDownloader(processes=0)
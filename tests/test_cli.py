@@ -1,6 +1,12 @@
-import pytest, sys, os, builtins
+import argparse, pytest, sys, os, builtins
 from io import StringIO
-from uqload_dl.cli import main, print_video_info
+from uqload_dl.cli import (
+    main,
+    make_progress_callback,
+    parse_clip,
+    parse_time,
+    print_video_info,
+)
 from unittest.mock import patch, MagicMock
 
 
@@ -28,3 +34,80 @@ def test_print_video_info_valid_output(capsys: pytest.CaptureFixture[builtins.st
     assert "Test Video" in captured.out
     assert "1.0 MiB" in captured.out
     assert "video info" in captured.out
+
+
+def test_progress_callback_reuses_progress_bar() -> None:
+    with patch("uqload_dl.cli.ProgressBar") as mock_progress_bar:
+        mock_progress_bar.return_value.total = 100
+        on_progress = make_progress_callback()
+        on_progress(10, 100)
+        on_progress(100, 100)
+
+    assert mock_progress_bar.call_count == 1
+    assert mock_progress_bar.return_value.update.call_count == 2
+
+
+def test_stream_to_stdout_keeps_messages_off_the_video(capfdbinary) -> None:
+    def stream_to(file) -> None:
+        print("Looking for video...")
+        file.write(b"video bytes")
+
+    with patch("uqload_dl.uqload.UQLoad") as mock_uqload:
+        mock_uqload.return_value.stream_to.side_effect = stream_to
+        assert main(["-u", "vule3vel9n5q", "-o", "-", "--no-cache"]) == 0
+
+    sys.stdout.flush()
+    captured = capfdbinary.readouterr()
+    assert captured.out == b"video bytes"
+    assert b"Looking for video" in captured.err
+    assert "output_dir" not in mock_uqload.call_args.kwargs
+
+
+def test_stream_to_stdout_takes_one_video() -> None:
+    assert main(["-u", "a", "-u", "b", "-o", "-"]) == 2
+
+
+def test_parse_clip() -> None:
+    assert parse_time("90") == 90
+    assert parse_time("1:30.5") == 90.5
+    assert parse_time("01:00:00") == 3600
+    assert parse_clip("1:30-2:00") == (90, 120)
+    for value in ("90", "2:00-1:30", "a-b", "1::2-3", "0-inf", "nan-1", "0-1e400"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_clip(value)
+    for value in ("inf", "nan", "1e400", "-1", "a", "1:2:3:4"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_time(value)
+
+
+def test_cancelled_download_exits_with_130(capsys) -> None:
+    with patch("uqload_dl.uqload.UQLoad") as mock_uqload:
+        mock_uqload.return_value.get_video_info.return_value = {"title": "video"}
+        mock_uqload.return_value.download.side_effect = KeyboardInterrupt
+        assert main(["-u", "vule3vel9n5q", "-y", "--no-cache"]) == 130
+
+    assert "successfully" not in capsys.readouterr().out
+
+
+def test_clip_takes_one_video() -> None:
+    with patch("uqload_dl.cli.run_batch") as mock_run_batch:
+        assert main(["-u", "a", "-u", "b", "--clip", "10-20"]) == 2
+
+    assert not mock_run_batch.called
+
+
+def test_clip_downloads_part_of_one_video() -> None:
+    with patch("uqload_dl.uqload.UQLoad") as mock_uqload:
+        mock_uqload.return_value.get_video_info.return_value = {"title": "video"}
+        assert main(["-u", "vule3vel9n5q", "--clip", "10-20", "-y", "--no-cache"]) == 0
+
+    mock_uqload.return_value.download_clip.assert_called_once_with(10, 20)
+    mock_uqload.return_value.download.assert_not_called()
+
+    with patch("uqload_dl.uqload.UQLoad") as mock_uqload:
+        mock_uqload.return_value.get_video_info.return_value = {"title": "video"}
+        mock_uqload.return_value.download_clip.side_effect = ValueError(
+            "the file is not an MP4 file"
+        )
+        assert main(["-u", "vule3vel9n5q", "--clip", "10-20", "-y", "--no-cache"]) == 1
+    assert main(["-u", "vule3vel9n5q", "--clip", "10-20", "-o", "-"]) == 2
@@ -0,0 +1,78 @@
+import os
+import pytest
+from uqload_dl.download_journal import DownloadJournal
+
+
+@pytest.fixture
+def journal_path(tmp_path) -> str:
+    return os.path.join(tmp_path, "video.mp4.part.json")
+
+
+def test_new_journal_is_empty(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    assert journal.completed_bytes == 0
+    assert journal.missing_ranges() == [(0, 99)]
+    assert not journal.is_complete
+
+
+def test_add_merges_adjacent_ranges(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    journal.add(0, 10)
+    journal.add(50, 60)
+    journal.add(10, 20)
+    assert journal.completed_bytes == 30
+    assert journal.missing_ranges() == [(20, 49), (60, 99)]
+
+    journal.add(20, 50)
+    journal.add(60, 100)
+    assert journal.is_complete
+    assert journal.missing_ranges() == []
+
+
+def test_first_missing(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    journal.add(10, 20)
+    journal.add(20, 30)
+
+    assert journal.first_missing(0, 50) == 0
+    assert journal.first_missing(12, 50) == 30
+    assert journal.first_missing(12, 29) is None
+
+
+def test_save_and_load(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    journal.add(0, 40)
+    journal.save()
+
+    loaded = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    assert loaded.completed_bytes == 40
+    assert loaded.missing_ranges() == [(40, 99)]
+
+    loaded.delete()
+    assert not os.path.exists(journal_path)
+
+
+def test_journal_for_another_size_is_ignored(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://example.com/v.mp4", 100)
+    journal.add(0, 40)
+    journal.save()
+
+    assert DownloadJournal(journal_path, "https://example.com/v.mp4", 200).completed_bytes == 0
+
+
+def test_journal_for_another_file_is_ignored(journal_path: str) -> None:
+    journal = DownloadJournal(journal_path, "https://m1.example.com/abc/v.mp4?e=1", 100)
+    journal.add(0, 40)
+    journal.save()
+
+    # The same video resolved again, with another host and signature.
+    same = DownloadJournal(journal_path, "https://m2.example.com/abc/v.mp4?e=2", 100)
+    assert same.completed_bytes == 40
+    other = DownloadJournal(journal_path, "https://m1.example.com/xyz/v.mp4", 100)
+    assert other.completed_bytes == 0
+
+
+def test_corrupted_journal_is_ignored(journal_path: str) -> None:
+    with open(journal_path, "w") as file:
+        file.write("{not json")
+    assert DownloadJournal(journal_path, "https://example.com/v.mp4", 100).completed_bytes == 0
@@ -0,0 +1,190 @@
+import pytest, os
+from uqload_dl.exceptions import VideoNotFound
+from uqload_dl.extractor import (
+    PageScanner,
+    embed_page_scanner,
+    extract_video_data,
+    video_page_scanner,
+)
+
+EMBED_PAGE = (
+    "<html>\n"
+    '<script>sources: ["https://m180.uqload.cx/abc/v.mp4"],\n'
+    'poster: "https://m180.uqload.cx/i/05/abc_xt.jpg",\n'
+    'title: "My Title",\n'
+    "</script>\n" + "<p>filler</p>\n" * 2000 + "</html>\n"
+)
+VIDEO_PAGE = (
+    "<html>\n<h1>  My   Video </h1>\n"
+    "<textarea>nothing here</textarea>\n"
+    "<textarea>[url=x][1280x720, 1:02:03][/url]</textarea>\n"
+    + "<p>filler</p>\n" * 2000
+    + "</html>\n"
+)
+
+
+def _feed(scanner, page: str, size: int = 64) -> int:
+    for start in range(0, len(page), size):
+        if scanner.feed(page[start : start + size]):
+            return start + size
+    return len(page)
+
+
+def test_embed_scanner_stops_early_with_same_data() -> None:
+    scanner = embed_page_scanner()
+    read = _feed(scanner, EMBED_PAGE)
+
+    assert scanner.done
+    assert read < len(EMBED_PAGE) // 10
+    assert extract_video_data(scanner.text, VIDEO_PAGE) == extract_video_data(
+        EMBED_PAGE, VIDEO_PAGE
+    )
+
+
+def test_video_scanner_reads_the_whole_page() -> None:
+    scanner = video_page_scanner()
+
+    assert _feed(scanner, VIDEO_PAGE) == len(VIDEO_PAGE)
+    assert not scanner.done
+    data = extract_video_data(EMBED_PAGE, scanner.text)
+    assert data == extract_video_data(EMBED_PAGE, VIDEO_PAGE)
+    assert (data["resolution"], data["duration"]) == ("1280x720", "1:02:03")
+
+
+def test_video_scanner_stops_on_error_marker() -> None:
+    scanner = video_page_scanner()
+    page = "<h1>Title</h1>\n<div class='err'>Not found</div>\n" + "<p>x</p>\n" * 100
+
+    assert _feed(scanner, page) < len(page)
+    assert scanner.done
+
+
+def test_scanner_stops_on_deleted_marker() -> None:
+    scanner = embed_page_scanner()
+    assert scanner.feed("<b>File was deleted</b>\n")
+
+
+def test_scanner_waits_for_complete_lines() -> None:
+    scanner = embed_page_scanner()
+    # The greedy video pattern could match a longer link once the line ends.
+    assert not scanner.feed('title: "x" https://a.cx/i.jpg https://a.cx/1/v.mp4')
+    assert not scanner.feed("?https://a.cx/2/v.mp4")
+    assert scanner.feed("\n")
+
+
+def test_scanner_scans_each_line_once() -> None:
+    class CountingPattern:
+        scanned = 0
+
+        def search(self, text):
+            CountingPattern.scanned += len(text)
+            return None
+
+    scanner = PageScanner(required=(CountingPattern(),))
+    page = "<p>filler</p>\n" * 5000
+    _feed(scanner, page)
+
+    assert CountingPattern.scanned == len(page)
+    assert scanner.text == page
+
+
+def test_scanner_reads_everything_when_fields_are_missing() -> None:
+    scanner = video_page_scanner()
+    page = "<h1>Title</h1>\n" + "<p>no resolution</p>\n" * 100
+    assert _feed(scanner, page) == len(page)
+    assert not scanner.done
+    assert scanner.text == page
+
+    scanner.reset()
+    assert scanner.text == ""
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "pages")
+
+
+def _fixture(name: str) -> str:
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize(
+    "embed_page, page, expected",
+    [
+        (
+            "embed_ok.html",
+            "page_ok.html",
+            {
+                "video_url": "https://m180.uqload.cx/3rfkv4rhrvw2q4drdkgpxmnva6flydhkehdqtxrb6635d6s4w6j7tq2bdq4q/v.mp4",
+                "image_url": "https://m180.uqload.cx/i/05/02288/vule3vel9n5q_xt.jpg",
+                "title": "Big Buck Bunny 2008 1080p",
+                "resolution": "1920x1080",
+                "duration": "09:56",
+            },
+        ),
+        (
+            "embed_minified.html",
+            "page_no_resolution.html",
+            {
+                "video_url": "https://m180.uqload.cx/ab4f7kq2xwz8mn3pdr6tyu5vhs1jc9ge0lo2ia7bfq3ne8wk4rx6tm1dy5sh9zc0/v.mp4",
+                "image_url": "https://m180.uqload.cx/i/05/02288/h63yfu9dkw1r_xt.jpg",
+                "title": "Elephants Dream",
+                "resolution": None,
+                "duration": None,
+            },
+        ),
+        (
+            "embed_ok.html",
+            "page_err_after_fields.html",
+            {
+                "video_url": "https://m180.uqload.cx/3rfkv4rhrvw2q4drdkgpxmnva6flydhkehdqtxrb6635d6s4w6j7tq2bdq4q/v.mp4",
+                "image_url": "https://m180.uqload.cx/i/05/02288/vule3vel9n5q_xt.jpg",
+                "title": "Big Buck Bunny 1080p",
+                "resolution": None,
+                "duration": None,
+            },
+        ),
+        (
+            "embed_ok.html",
+            "page_err.html",
+            {
+                "video_url": "https://m180.uqload.cx/3rfkv4rhrvw2q4drdkgpxmnva6flydhkehdqtxrb6635d6s4w6j7tq2bdq4q/v.mp4",
+                "image_url": "https://m180.uqload.cx/i/05/02288/vule3vel9n5q_xt.jpg",
+                "title": "Big Buck Bunny 1080p",
+                "resolution": None,
+                "duration": None,
+            },
+        ),
+    ],
+)
+def test_extract_fixtures(embed_page: str, page: str, expected: dict) -> None:
+    assert extract_video_data(_fixture(embed_page), _fixture(page)) == expected
+
+
+def test_extract_deleted_fixture() -> None:
+    with pytest.raises(VideoNotFound):
+        extract_video_data(_fixture("embed_deleted.html"), _fixture("page_err.html"))
+
+
+def test_extract_without_content() -> None:
+    with pytest.raises(ValueError):
+        extract_video_data(None, None)
+
+
+def test_error_class_in_heading_discards_page_data() -> None:
+    page = '<h1 class="err">Oops</h1><textarea>[1280x720, 01:00]</textarea>'
+    data = extract_video_data(_fixture("embed_ok.html"), page)
+    assert data["title"] == "Big Buck Bunny 1080p"
+    assert data["resolution"] is None
+
+
+@pytest.mark.parametrize("page_name", ["page_ok.html", "page_err_after_fields.html"])
+def test_scanners_agree_with_fixtures(page_name: str) -> None:
+    embed_page, page = _fixture("embed_ok.html"), _fixture(page_name)
+    embed_scanner, page_scanner = embed_page_scanner(), video_page_scanner()
+    _feed(embed_scanner, embed_page, 4096)
+    _feed(page_scanner, page, 4096)
+
+    assert embed_scanner.done
+    assert extract_video_data(embed_scanner.text, page_scanner.text) == (
+        extract_video_data(embed_page, page)
+    )
@@ -1,10 +1,28 @@
 import os
 import pytest
+import time
+from io import BytesIO
 from unittest.mock import patch, MagicMock
-from uqload_dl.file_downloader import FileDownloader
+from uqload_dl.file_downloader import FileDownloader, build_headers
+from uqload_dl.download_journal import DownloadJournal
+from uqload_dl.exceptions import DownloadError
 from typing import Dict
 
 
+def _set_body(response: MagicMock, *chunks: bytes) -> None:
+    """Makes readinto() return the given chunks, then end of stream."""
+    pending = list(chunks)
+
+    def readinto(buffer) -> int:
+        if not pending:
+            return 0
+        chunk = pending.pop(0)
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    response.readinto.side_effect = readinto
+
+
 @pytest.fixture
 def test_data() -> Dict[str, str]:
     return {
@@ -14,7 +32,7 @@ def test_data() -> Dict[str, str]:
     }
 
 
-@patch("uqload_dl.file_downloader.urllib.request.urlopen")
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
 def test_valid_url_and_metadata(mock_urlopen, test_data: Dict[str, str]) -> None:
     mock_response = MagicMock()
     mock_response.getcode.return_value = 200
@@ -25,6 +43,10 @@ def test_valid_url_and_metadata(mock_urlopen, test_data: Dict[str, str]) -> None
     mock_urlopen.return_value.__enter__.return_value = mock_response
 
     downloader = FileDownloader(url=test_data["url"])
+    assert downloader.total_size is None
+    downloader.fetch_metadata()
+
+    assert mock_urlopen.call_args.kwargs["method"] == "HEAD"
     assert downloader.url == test_data["url"]
     assert downloader.total_size == 100
     assert downloader.type == "text/plain"
@@ -35,7 +57,7 @@ def test_invalid_url() -> None:
         FileDownloader("invalid_url.txt")
 
 
-@patch("uqload_dl.file_downloader.urllib.request.urlopen")
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
 def test_callback_validation(mock_urlopen, test_data: Dict[str, str]) -> None:
     def callback(downloaded, total) -> None:
         pass
@@ -53,23 +75,19 @@ def test_callback_validation(mock_urlopen, test_data: Dict[str, str]) -> None:
         FileDownloader(url=test_data["url"], on_progress_callback="not_callable")
 
 
-@patch("uqload_dl.file_downloader.urllib.request.urlopen")
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
 def test_download_creates_file(mock_urlopen, test_data: Dict[str, str]) -> None:
-    mock_head_response = MagicMock()
-    mock_head_response.getcode.return_value = 200
-    mock_head_response.info.return_value = {
-        "Content-Length": "16",
-        "Content-Type": "text/plain",
-    }
-
     mock_download_response = MagicMock()
     mock_download_response.getcode.return_value = 200
-    mock_download_response.read.side_effect = [b"Hello, world!\n", b""]
+    mock_download_response.info.return_value = {
+        "Content-Length": "14",
+        "Content-Type": "text/plain",
+    }
+    _set_body(mock_download_response, b"Hello, world!\n")
 
-    mock_head_response.__enter__.return_value = mock_head_response
     mock_download_response.__enter__.return_value = mock_download_response
 
-    mock_urlopen.side_effect = [mock_head_response, mock_download_response]
+    mock_urlopen.side_effect = [mock_download_response]
 
     downloader = FileDownloader(
         test_data["url"], filename="testfile", output_dir=test_data["output_dir"]
@@ -77,34 +95,41 @@ def test_download_creates_file(mock_urlopen, test_data: Dict[str, str]) -> None:
     downloader.download()
 
     assert os.path.isfile(downloader.destination)
+    assert downloader.total_size == 14
+    assert downloader.type == "text/plain"
 
     downloader.delete_file()
     assert not os.path.isfile(downloader.destination)
 
 
-@patch("uqload_dl.file_downloader.urllib.request.urlopen")
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
 def test_download_keyboard_interrupt(mock_urlopen, test_data: Dict[str, str]) -> None:
     mock_response = MagicMock()
     mock_response.getcode.return_value = 200
-    mock_response.read.side_effect = KeyboardInterrupt()
+    mock_response.readinto.side_effect = KeyboardInterrupt()
 
     mock_response.__enter__.return_value = mock_response
 
     mock_urlopen.side_effect = [mock_response, mock_response]
 
+    reports = []
     downloader = FileDownloader(
-        test_data["url"], filename="testfile", output_dir=test_data["output_dir"]
+        test_data["url"],
+        filename="testfile",
+        output_dir=test_data["output_dir"],
+        on_metrics_callback=reports.append,
     )
 
     try:
-        downloader.download()
-    except KeyboardInterrupt:
-        pytest.fail("Download should handle KeyboardInterrupt internally")
+        with pytest.raises(KeyboardInterrupt):
+            downloader.download()
+        assert not os.path.isfile(downloader.destination)
+        assert [report["status"] for report in reports] == ["cancelled"]
     finally:
         downloader.delete_file()
 
 
-@patch("uqload_dl.file_downloader.urllib.request.urlopen")
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
 def test_download_raises_on_404_and_does_not_create_file(
     mock_urlopen, test_data: Dict[str, str]
 ) -> None:
@@ -118,6 +143,548 @@ def test_download_raises_on_404_and_does_not_create_file(
         downloader = FileDownloader(
             test_data["url"], output_dir=test_data["output_dir"]
         )
-        downloader.download()
+        downloader.fetch_metadata()
 
     assert "non-200" in str(exc_info.value).lower()
+
+
+def _range_response(data: bytes, code: int, total: int = None) -> MagicMock:
+    response = MagicMock()
+    response.getcode.return_value = code
+    if code == 206:
+        response.info.return_value = {
+            "Content-Range": f"bytes 0-{len(data) - 1}/{total}",
+            "Content-Type": "text/plain",
+        }
+    else:
+        response.info.return_value = {"Content-Length": str(total or len(data))}
+    _set_body(response, data)
+    response.__enter__.return_value = response
+    return response
+
+
+@patch("uqload_dl.file_downloader.MIN_SEGMENT_SIZE", 4)
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_segmented(mock_urlopen, test_data: Dict[str, str]) -> None:
+    content = b"0123456789abcdef"
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        start, end = headers["Range"][6:].split("-")
+        return _range_response(content[int(start) : int(end) + 1], 206, len(content))
+
+    mock_urlopen.side_effect = urlopen
+    progress = []
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="segmented",
+        output_dir=test_data["output_dir"],
+        on_progress_callback=lambda downloaded, total: progress.append(downloaded),
+        connections=4,
+    )
+    downloader.download()
+
+    try:
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+        assert mock_urlopen.call_count == 5
+        assert progress[-1] == len(content)
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.MIN_SEGMENT_SIZE", 4)
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_segmented_falls_back_when_range_ignored(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    content = b"0123456789abcdef"
+
+    mock_urlopen.side_effect = [_range_response(content, 200)]
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="fallback",
+        output_dir=test_data["output_dir"],
+        connections=4,
+    )
+    downloader.download()
+
+    try:
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+        assert mock_urlopen.call_count == 1
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_without_head_request(mock_urlopen, test_data: Dict[str, str]) -> None:
+    content = b"0123456789abcdef"
+    requests = []
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        requests.append((method, headers.get("Range")))
+        if headers.get("Range"):
+            return _range_response(content[:1], 206, len(content))
+        return _range_response(content, 200)
+
+    mock_urlopen.side_effect = urlopen
+
+    downloader = FileDownloader(
+        test_data["url"], filename="probed", output_dir=test_data["output_dir"]
+    )
+    downloader.download()
+
+    try:
+        assert requests == [("GET", "bytes=0-0"), ("GET", None)]
+        assert downloader.total_size == len(content)
+        assert downloader.type == "text/plain"
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_resumes_from_journal(mock_urlopen, test_data: Dict[str, str]) -> None:
+    content = b"0123456789abcdef"
+    requested_ranges = []
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        requested_ranges.append(headers["Range"])
+        start = int(headers["Range"][6:].split("-")[0])
+        return _range_response(content[start:] if start else b"0", 206, len(content))
+
+    mock_urlopen.side_effect = urlopen
+
+    downloader = FileDownloader(
+        test_data["url"], filename="resumed", output_dir=test_data["output_dir"]
+    )
+    partial = os.path.join(test_data["output_dir"], "resumed.txt.part")
+    with open(partial, "wb") as file:
+        file.write(content[:8] + b"\0" * 8)
+    journal = DownloadJournal(f"{partial}.json", test_data["url"], len(content))
+    journal.add(0, 8)
+    journal.save()
+
+    try:
+        downloader.download()
+
+        assert requested_ranges == ["bytes=0-0", "bytes=8-15"]
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+        assert not os.path.exists(partial)
+        assert not os.path.exists(f"{partial}.json")
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_incomplete_keeps_partial_file(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    mock_urlopen.side_effect = [_range_response(b"01234567", 200, 16)]
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="incomplete",
+        output_dir=test_data["output_dir"],
+        retries=0,
+    )
+    with pytest.raises(DownloadError) as exc_info:
+        downloader.download()
+
+    try:
+        assert exc_info.value.bytes_downloaded == 8
+        assert exc_info.value.total_size == 16
+        assert not os.path.exists(downloader.destination)
+        assert os.path.isfile(downloader.partial_destination)
+        journal = DownloadJournal(
+            f"{downloader.partial_destination}.json", test_data["url"], 16
+        )
+        assert journal.missing_ranges() == [(8, 15)]
+    finally:
+        downloader.delete_file()
+
+
+def _dropping_response(data: bytes, total: int, start: int = 0) -> MagicMock:
+    """A response that sends data, then fails like a reset connection."""
+    response = _range_response(data, 206 if start else 200, total)
+    if start:
+        response.info.return_value = {
+            "Content-Range": f"bytes {start}-{total - 1}/{total}"
+        }
+    pending = [data]
+
+    def readinto(buffer) -> int:
+        if not pending:
+            raise ConnectionResetError(104, "Connection reset by peer")
+        chunk = pending.pop(0)
+        buffer[: len(chunk)] = chunk
+        return len(chunk)
+
+    response.readinto.side_effect = readinto
+    return response
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_reconnects_after_reset(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    content = b"0123456789abcdef"
+    requested_ranges = []
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        requested_ranges.append(headers.get("Range"))
+        if len(requested_ranges) == 1:
+            return _dropping_response(content[:5], len(content))
+        if len(requested_ranges) == 2:
+            return _dropping_response(content[5:9], len(content), 5)
+        return _range_response(content[9:], 206, len(content))
+
+    mock_urlopen.side_effect = urlopen
+    reports = []
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="reconnected",
+        output_dir=test_data["output_dir"],
+        retries=1,
+        retry_backoff=0,
+        on_metrics_callback=reports.append,
+    )
+    try:
+        downloader.download()
+
+        assert requested_ranges == ["bytes=0-0", "bytes=5-15", "bytes=9-15"]
+        assert len(reports) == 1
+        assert reports[0]["status"] == "ok"
+        assert reports[0]["bytes"] == len(content)
+        assert reports[0]["retries"] == 2
+        assert {"head", "transfer", "retry_wait"} <= set(reports[0]["phases"])
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.MIN_SEGMENT_SIZE", 4)
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_segment_reconnects_after_reset(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    content = b"0123456789abcdef"
+    requested_ranges = []
+    dropped = []
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        requested_ranges.append(headers["Range"])
+        start, end = map(int, headers["Range"][6:].split("-"))
+        if start == 8 and not dropped:
+            dropped.append(start)
+            response = _dropping_response(content[8:10], len(content), 8)
+        else:
+            response = _range_response(content[start : end + 1], 206, len(content))
+        response.info.return_value = {
+            "Content-Range": f"bytes {start}-{end}/{len(content)}"
+        }
+        return response
+
+    mock_urlopen.side_effect = urlopen
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="segment_reconnected",
+        output_dir=test_data["output_dir"],
+        connections=4,
+        retry_backoff=0,
+    )
+    downloader.total_size = len(content)
+    downloader.accepts_ranges = True
+    try:
+        downloader.download()
+
+        assert "bytes=10-11" in requested_ranges
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_raises_when_retries_are_spent(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    content = b"0123456789abcdef"
+    mock_urlopen.side_effect = [
+        _dropping_response(content[:4], len(content)),
+        ConnectionResetError(104, "Connection reset by peer"),
+        TimeoutError("timed out"),
+    ]
+
+    reports = []
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="given_up",
+        output_dir=test_data["output_dir"],
+        retries=2,
+        retry_backoff=0,
+        on_metrics_callback=reports.append,
+    )
+    try:
+        with pytest.raises(DownloadError) as exc_info:
+            downloader.download()
+
+        assert mock_urlopen.call_count == 3
+        assert exc_info.value.bytes_downloaded == 4
+        assert isinstance(exc_info.value.__cause__, TimeoutError)
+        assert reports[0]["status"] == "failed"
+        assert reports[0]["error"].startswith("DownloadError")
+        assert os.path.isfile(downloader.partial_destination)
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_does_not_retry_disk_errors(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    mock_urlopen.return_value = _range_response(b"0123", 200, 4)
+
+    downloader = FileDownloader(
+        test_data["url"], filename="disk_full", output_dir=test_data["output_dir"]
+    )
+    with patch(
+        "uqload_dl.file_sink.PwriteSink.write",
+        side_effect=OSError(28, "No space left on device"),
+    ), pytest.raises(OSError):
+        downloader.download()
+
+    try:
+        assert mock_urlopen.call_count == 1
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_raises_when_the_file_cannot_be_downloaded(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    mock_urlopen.return_value = _range_response(b"", 404)
+    metrics = []
+
+    downloader = FileDownloader(
+        test_data["url"],
+        output_dir=test_data["output_dir"],
+        on_metrics_callback=metrics.append,
+    )
+    with pytest.raises(ValueError):
+        downloader.download()
+
+    assert metrics[0]["status"] == "failed"
+    assert not os.path.exists(downloader.destination or "")
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_stream_to_resumes_after_reset(mock_urlopen, test_data: Dict[str, str]) -> None:
+    content = b"0123456789abcdef"
+    requested_ranges = []
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        requested_ranges.append(headers.get("Range"))
+        if len(requested_ranges) == 1:
+            return _dropping_response(content[:5], len(content))
+        return _range_response(content[5:], 206, len(content))
+
+    mock_urlopen.side_effect = urlopen
+    reports = []
+    output = BytesIO()
+
+    downloader = FileDownloader(
+        test_data["url"],
+        output_dir=test_data["output_dir"],
+        retry_backoff=0,
+        on_metrics_callback=reports.append,
+    )
+    downloader.stream_to(output)
+
+    assert output.getvalue() == content
+    assert requested_ranges == [None, "bytes=5-15"]
+    assert downloader.total_size == len(content)
+    assert reports[0]["status"] == "ok"
+    assert reports[0]["retries"] == 1
+    assert downloader.destination is None
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_iter_content_yields_the_body(mock_urlopen, test_data: Dict[str, str]) -> None:
+    mock_urlopen.return_value = _range_response(b"", 200, 12)
+    _set_body(mock_urlopen.return_value, b"0123", b"4567", b"89ab")
+    progress = []
+
+    downloader = FileDownloader(
+        test_data["url"],
+        on_progress_callback=lambda done, total: progress.append(done),
+        progress_interval=0,
+    )
+    chunks = list(downloader.iter_content())
+
+    assert chunks == [b"0123", b"4567", b"89ab"]
+    assert progress[-1] == 12
+    assert "Range" not in mock_urlopen.call_args.kwargs["headers"]
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_stream_cannot_resume_without_ranges(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    mock_urlopen.return_value = _dropping_response(b"0123", 16)
+    mock_urlopen.return_value.info.return_value["Accept-Ranges"] = "none"
+
+    downloader = FileDownloader(test_data["url"], retry_backoff=0)
+    with pytest.raises(DownloadError):
+        downloader.stream_to(BytesIO())
+
+    assert mock_urlopen.call_count == 1
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_stream_to_does_not_retry_a_closed_output(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    mock_urlopen.return_value = _range_response(b"0123", 200, 4)
+    output = MagicMock()
+    output.write.side_effect = BrokenPipeError(32, "Broken pipe")
+    reports = []
+
+    downloader = FileDownloader(test_data["url"], on_metrics_callback=reports.append)
+    with pytest.raises(DownloadError) as exc_info:
+        downloader.stream_to(output)
+
+    assert isinstance(exc_info.value.__cause__, BrokenPipeError)
+    assert mock_urlopen.call_count == 1
+    assert reports[0]["status"] == "failed"
+
+
+def test_invalid_retries(test_data: Dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], retries=-1)
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], retry_backoff="1")
+
+
+def test_invalid_sink_and_fsync(test_data: Dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], sink="direct")
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], fsync="always")
+
+
+def test_invalid_buffer_memory(test_data: Dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], buffer_memory="1K")
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], buffer_memory="lots")
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_keeps_reading_while_the_disk_is_slow(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    chunks = [bytes([index]) * 8192 for index in range(8)]
+    mock_urlopen.return_value = _range_response(b"", 200, 8 * 8192)
+    _set_body(mock_urlopen.return_value, *chunks)
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename="slow_disk",
+        output_dir=test_data["output_dir"],
+        buffer_memory="32K",
+    )
+    with patch("uqload_dl.file_sink.PwriteSink.write", autospec=True) as write:
+        write.side_effect = lambda sink, offset, data: time.sleep(0.01)
+        started = time.perf_counter()
+        downloader.download()
+
+    try:
+        assert time.perf_counter() - started < 5
+        assert write.call_count == 8
+        assert downloader.bytes_downloaded == 8 * 8192
+        assert os.path.isfile(downloader.destination)
+    finally:
+        downloader.delete_file()
+
+
+@pytest.mark.parametrize("sink", ["pwrite", "mmap", "buffered"])
+@pytest.mark.parametrize("fsync", ["never", "complete", "periodic"])
+@patch("uqload_dl.file_downloader.MIN_SEGMENT_SIZE", 4)
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_with_each_sink(
+    mock_urlopen, fsync: str, sink: str, test_data: Dict[str, str]
+) -> None:
+    content = b"0123456789abcdef"
+
+    def urlopen(url, method="GET", headers=None, timeout=None):
+        start, end = map(int, headers["Range"][6:].split("-"))
+        response = _range_response(content[start : end + 1], 206, len(content))
+        response.info.return_value = {
+            "Content-Range": f"bytes {start}-{end}/{len(content)}"
+        }
+        return response
+
+    mock_urlopen.side_effect = urlopen
+
+    downloader = FileDownloader(
+        test_data["url"],
+        filename=f"sink_{sink}_{fsync}",
+        output_dir=test_data["output_dir"],
+        connections=4,
+        sink=sink,
+        fsync=fsync,
+    )
+    try:
+        downloader.download()
+
+        with open(downloader.destination, "rb") as file:
+            assert file.read() == content
+    finally:
+        downloader.delete_file()
+
+
+@patch("uqload_dl.file_downloader.http_pool.urlopen")
+def test_download_grows_chunk_size_on_fast_reads(
+    mock_urlopen, test_data: Dict[str, str]
+) -> None:
+    requested_sizes = []
+
+    def readinto(buffer) -> int:
+        size = min(len(buffer), 64 * 1024 - sum(requested_sizes))
+        requested_sizes.append(size)
+        return size
+
+    mock_download_response = _range_response(b"", 200, 64 * 1024)
+    mock_download_response.readinto.side_effect = readinto
+    mock_urlopen.side_effect = [mock_download_response]
+
+    downloader = FileDownloader(
+        test_data["url"], filename="adaptive", output_dir=test_data["output_dir"]
+    )
+    downloader.download()
+
+    try:
+        assert requested_sizes[:3] == [8192, 16384, 32768]
+        assert os.path.getsize(downloader.destination) == 64 * 1024
+    finally:
+        downloader.delete_file()
+
+
+def test_invalid_rate_limit(test_data: Dict[str, str]) -> None:
+    with pytest.raises(ValueError):
+        FileDownloader(test_data["url"], rate_limit="fast")
+
+
+def test_media_requests_ask_for_identity_encoding() -> None:
+    headers = build_headers("https://m180.uqload.cx/abc/v.mp4")
+    assert headers["Accept-Encoding"] == "identity"
+    assert headers["Referer"] == "https://m180.uqload.cx"
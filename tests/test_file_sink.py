@@ -0,0 +1,54 @@
+import os, pytest
+from collections import namedtuple
+from unittest.mock import patch
+from uqload_dl.constants import SINK_NAMES
+from uqload_dl.exceptions import DownloadError
+from uqload_dl.file_sink import SINKS, open_sink
+
+
+@pytest.mark.parametrize("kind", SINKS)
+def test_sink_writes_at_offsets(kind: str, tmp_path) -> None:
+    path = os.path.join(tmp_path, "video.mp4.part")
+    with open_sink(kind, path, 16) as sink:
+        assert os.path.getsize(path) == 16
+        sink.write(8, b"89abcdef")
+        sink.write(0, memoryview(b"01234567"))
+        sink.sync()
+
+    with open(path, "rb") as file:
+        assert file.read() == b"0123456789abcdef"
+
+
+@pytest.mark.parametrize("kind", SINKS)
+def test_sink_keeps_existing_data(kind: str, tmp_path) -> None:
+    path = os.path.join(tmp_path, "video.mp4.part")
+    with open(path, "wb") as file:
+        file.write(b"0123")
+
+    sink = open_sink(kind, path, 8)
+    sink.write(4, b"4567")
+    sink.close(sync=True)
+    sink.close()
+
+    with open(path, "rb") as file:
+        assert file.read() == b"01234567"
+
+
+def test_sink_checks_free_space(tmp_path) -> None:
+    path = os.path.join(tmp_path, "video.mp4.part")
+    usage = namedtuple("usage", "total used free")(100, 90, 10)
+    with patch("uqload_dl.file_sink.shutil.disk_usage", return_value=usage):
+        with pytest.raises(DownloadError) as exc_info:
+            open_sink("pwrite", path, 11)
+
+    assert "disk space" in str(exc_info.value)
+    assert not os.path.exists(path)
+
+
+def test_invalid_sink(tmp_path) -> None:
+    with pytest.raises(ValueError):
+        open_sink("direct", os.path.join(tmp_path, "video.mp4.part"), 8)
+
+
+def test_sink_names_match_the_backends() -> None:
+    assert tuple(SINKS) == SINK_NAMES
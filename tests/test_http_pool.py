@@ -0,0 +1,117 @@
+import pytest, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from uqload_dl.http_pool import ConnectionPool
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/page")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = b"x" * 100
+        if self.path == "/host":
+            body = self.headers["Host"].encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "100")
+        self.end_headers()
+
+
+@pytest.fixture(scope="module")
+def base_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_connection_is_reused(base_url: str) -> None:
+    pool = ConnectionPool()
+    for _ in range(3):
+        with pool.urlopen(f"{base_url}/page") as response:
+            assert response.getcode() == 200
+            assert response.read() == b"x" * 100
+    with pool.urlopen(f"{base_url}/page", method="HEAD") as response:
+        assert response.info().get("Content-Length") == "100"
+
+    assert pool.stats["misses"] == 1
+    assert pool.stats["hits"] == 3
+    assert pool.stats["idle"] == 1
+    pool.clear()
+    assert pool.stats["idle"] == 0
+
+
+def test_response_timings(base_url: str) -> None:
+    pool = ConnectionPool()
+    with pool.urlopen(f"{base_url}/page") as response:
+        response.read()
+        assert response.timings["connect"] > 0
+        assert response.timings["ttfb"] > 0
+    with pool.urlopen(f"{base_url}/page") as response:
+        response.read()
+        assert response.timings["connect"] == 0
+    pool.clear()
+
+
+def test_partially_read_response_is_not_reused(base_url: str) -> None:
+    pool = ConnectionPool()
+    with pool.urlopen(f"{base_url}/page") as response:
+        response.read(10)
+    assert pool.stats["idle"] == 0
+
+
+def test_redirect_is_followed(base_url: str) -> None:
+    pool = ConnectionPool()
+    with pool.urlopen(f"{base_url}/redirect") as response:
+        assert response.geturl() == f"{base_url}/page"
+        assert response.read() == b"x" * 100
+    assert pool.stats["hits"] == 1
+
+
+def test_idle_connections_are_evicted(base_url: str) -> None:
+    pool = ConnectionPool(max_idle_time=0)
+    with pool.urlopen(f"{base_url}/page") as response:
+        response.read()
+    with pool.urlopen(f"{base_url}/page") as response:
+        response.read()
+    assert pool.stats["hits"] == 0
+    assert pool.stats["evictions"] == 1
+
+
+def test_max_idle_per_host(base_url: str) -> None:
+    pool = ConnectionPool(max_idle_per_host=1)
+    first = pool.urlopen(f"{base_url}/page")
+    second = pool.urlopen(f"{base_url}/page")
+    for response in (first, second):
+        response.read()
+        response.close()
+    assert pool.stats["idle"] == 1
+    pool.clear()
+
+
+def test_resolve_connects_to_another_address(base_url: str) -> None:
+    pool = ConnectionPool()
+    pool.resolve[("uqload.cx", 80)] = ("127.0.0.1", int(base_url.rsplit(":", 1)[1]))
+    with pool.urlopen("http://uqload.cx/host") as response:
+        assert response.read() == b"uqload.cx"
+    pool.clear()
+
+
+def test_unsupported_url() -> None:
+    with pytest.raises(ValueError):
+        ConnectionPool().urlopen("ftp://example.com/file")
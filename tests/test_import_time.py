@@ -0,0 +1,68 @@
+import os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Cumulative import time of the CLI module, in microseconds. It is about 45 ms
+# on a laptop; the margin absorbs slow CI machines, not a new eager import of
+# the download stack, which costs over 100 ms.
+CLI_IMPORT_BUDGET_US = 90_000
+
+# Modules that must not be loaded to parse the command line.
+HEAVY_MODULES = (
+    "asyncio",
+    "concurrent.futures",
+    "http.client",
+    "sqlite3",
+    "ssl",
+    "urllib.request",
+    "uuid",
+    "mmap",
+    "uqload_dl.uqload",
+    "uqload_dl.file_downloader",
+    "uqload_dl.batch",
+)
+
+
+def _import_times(statement: str) -> dict:
+    """Runs a statement in a fresh interpreter and parses -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_does_not_import_the_download_stack() -> None:
+    times = _import_times("import uqload_dl.cli")
+
+    assert [name for name in HEAVY_MODULES if name in times] == []
+
+
+def test_cli_import_time_budget() -> None:
+    # Best of three, so a single slow run on a busy machine does not fail.
+    cumulative = min(
+        _import_times("import uqload_dl.cli")["uqload_dl.cli"] for _ in range(3)
+    )
+
+    assert cumulative < CLI_IMPORT_BUDGET_US
+
+
+def test_package_attributes_are_loaded_on_first_use() -> None:
+    times = _import_times("import uqload_dl; uqload_dl.__version__")
+    assert "uqload_dl.uqload" not in times
+
+    import uqload_dl
+    from uqload_dl.uqload import UQLoad
+
+    assert uqload_dl.UQLoad is UQLoad
+    assert "AsyncUQLoad" in dir(uqload_dl)
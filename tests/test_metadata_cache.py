@@ -0,0 +1,82 @@
+import pytest, time
+from uqload_dl.metadata_cache import MetadataCache, default_cache_dir
+from uqload_dl.exceptions import VideoNotFound
+
+
+@pytest.fixture
+def cache(tmp_path) -> MetadataCache:
+    cache = MetadataCache(str(tmp_path / "cache" / "metadata.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_put_and_get(cache: MetadataCache) -> None:
+    assert cache.get("vule3vel9n5q") is None
+
+    cache.put("vule3vel9n5q", {"url": "https://m1.uqload.cx/x/v.mp4", "size": 10})
+
+    assert cache.get("vule3vel9n5q") == {
+        "url": "https://m1.uqload.cx/x/v.mp4",
+        "size": 10,
+    }
+
+
+def test_entries_persist_across_instances(tmp_path) -> None:
+    path = str(tmp_path / "metadata.sqlite3")
+    first = MetadataCache(path)
+    first.put("vule3vel9n5q", {"title": "My Title"})
+    first.close()
+
+    second = MetadataCache(path)
+    assert second.get("vule3vel9n5q") == {"title": "My Title"}
+    second.close()
+
+
+def test_negative_entry_raises(cache: MetadataCache) -> None:
+    cache.put_missing("vule3vel9n5q")
+    with pytest.raises(VideoNotFound):
+        cache.get("vule3vel9n5q")
+
+    cache.invalidate("vule3vel9n5q")
+    assert cache.get("vule3vel9n5q") is None
+
+
+def test_expired_entries_are_ignored(tmp_path, monkeypatch) -> None:
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"), ttl=60, negative_ttl=10)
+    cache.put("aaaaaaaaaaaa", {"title": "a"})
+    cache.put_missing("bbbbbbbbbbbb")
+
+    now = time.time()
+    monkeypatch.setattr("uqload_dl.metadata_cache.time.time", lambda: now + 30)
+    assert cache.get("aaaaaaaaaaaa") == {"title": "a"}
+    assert cache.get("bbbbbbbbbbbb") is None
+
+    monkeypatch.setattr("uqload_dl.metadata_cache.time.time", lambda: now + 90)
+    assert cache.get("aaaaaaaaaaaa") is None
+    cache.close()
+
+
+def test_unusable_database_behaves_as_empty(tmp_path) -> None:
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    cache = MetadataCache(str(blocker / "metadata.sqlite3"))
+
+    cache.put("vule3vel9n5q", {"title": "My Title"})
+    assert cache.get("vule3vel9n5q") is None
+
+
+def test_invalid_ttl() -> None:
+    with pytest.raises(ValueError):
+        MetadataCache(ttl=-1)
+
+    with pytest.raises(ValueError):
+        MetadataCache(negative_ttl="1")
+
+
+def test_default_cache_dir(monkeypatch, tmp_path) -> None:
+    monkeypatch.setenv("UQLOAD_DL_CACHE_DIR", str(tmp_path))
+    assert default_cache_dir() == str(tmp_path)
+
+    monkeypatch.delenv("UQLOAD_DL_CACHE_DIR")
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == str(tmp_path / "uqload-dl")
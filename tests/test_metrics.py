@@ -0,0 +1,99 @@
+import json, os, pytest
+from uqload_dl.metrics import (
+    JobMetrics,
+    JsonLinesExporter,
+    PrometheusTextfileExporter,
+    report_metrics,
+)
+
+
+def test_job_metrics() -> None:
+    metrics = JobMetrics("vule3vel9n5q")
+    metrics.add("connect", 0.25)
+    metrics.add("connect", 0.5)
+    with pytest.raises(ValueError):
+        with metrics.phase("transfer"):
+            raise ValueError()
+    metrics.add_bytes(100)
+    metrics.add_retry()
+
+    result = metrics.finish("failed", ValueError("boom"))
+
+    assert result["job"] == "vule3vel9n5q"
+    assert result["phases"]["connect"] == 0.75
+    assert result["phases"]["transfer"] >= 0
+    assert result["bytes"] == 100
+    assert result["retries"] == 1
+    assert result["status"] == "failed"
+    assert result["error"] == "ValueError: boom"
+    assert result["duration"] >= 0
+
+
+def test_report_metrics_ignores_callback_errors() -> None:
+    received = []
+    report_metrics(JobMetrics("job"), received.append, "ok")
+    assert received[0]["status"] == "ok"
+
+    def failing(metrics) -> None:
+        raise RuntimeError("exporter down")
+
+    report_metrics(JobMetrics("job"), failing, "ok")
+
+
+def test_json_lines_exporter(tmp_path) -> None:
+    path = os.path.join(tmp_path, "metrics.jsonl")
+    exporter = JsonLinesExporter(path)
+    for status in ("ok", "cancelled"):
+        exporter(JobMetrics("job").finish(status))
+
+    with open(path) as file:
+        lines = [json.loads(line) for line in file]
+    assert [line["status"] for line in lines] == ["ok", "cancelled"]
+
+
+def test_prometheus_textfile_exporter(tmp_path) -> None:
+    path = os.path.join(tmp_path, "uqload_dl.prom")
+    exporter = PrometheusTextfileExporter(path)
+    for seconds, status in ((0.02, "ok"), (3.0, "ok"), (0.02, "failed")):
+        metrics = JobMetrics("job")
+        metrics.add("ttfb", seconds)
+        metrics.add_bytes(10)
+        exporter(metrics.finish(status))
+
+    with open(path) as file:
+        text = file.read()
+    assert "# TYPE uqload_dl_phase_seconds histogram" in text
+    assert 'uqload_dl_phase_seconds_bucket{phase="ttfb",le="0.025"} 2' in text
+    assert 'uqload_dl_phase_seconds_bucket{phase="ttfb",le="5.0"} 3' in text
+    assert 'uqload_dl_phase_seconds_bucket{phase="ttfb",le="+Inf"} 3' in text
+    assert 'uqload_dl_phase_seconds_count{phase="ttfb"} 3' in text
+    assert 'uqload_dl_phase_seconds_sum{phase="ttfb"} 3.040000' in text
+    assert "uqload_dl_job_seconds_count 3" in text
+    assert 'uqload_dl_jobs_total{status="failed"} 1' in text
+    assert 'uqload_dl_jobs_total{status="ok"} 2' in text
+    assert "uqload_dl_bytes_total 30" in text
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_prometheus_textfile_exporter_carries_on_earlier_runs(tmp_path) -> None:
+    path = os.path.join(tmp_path, "uqload_dl.prom")
+    for status in ("ok", "failed"):
+        # A new exporter per job, like one CLI run each.
+        metrics = JobMetrics("job")
+        metrics.add("ttfb", 0.02)
+        metrics.add_bytes(10)
+        PrometheusTextfileExporter(path)(metrics.finish(status))
+    with open(path) as file:
+        first = file.read()
+
+    PrometheusTextfileExporter(path)(JobMetrics("job").finish("ok"))
+
+    with open(path) as file:
+        text = file.read()
+    assert 'uqload_dl_phase_seconds_bucket{phase="ttfb",le="0.025"} 2' in first
+    assert 'uqload_dl_phase_seconds_bucket{phase="ttfb",le="0.025"} 2' in text
+    assert 'uqload_dl_phase_seconds_sum{phase="ttfb"} 0.040000' in text
+    assert "uqload_dl_job_seconds_count 3" in text
+    assert 'uqload_dl_jobs_total{status="failed"} 1' in text
+    assert 'uqload_dl_jobs_total{status="ok"} 2' in text
+    assert "uqload_dl_bytes_total 20" in text
@@ -0,0 +1,158 @@
+import pytest, time
+from unittest.mock import MagicMock, patch
+from uqload_dl.extractor import embed_page_scanner, is_embed_page
+from uqload_dl.mirrors import MirrorStats, normalize_mirror
+from uqload_dl.parallel_url_fetcher import ParallelURLFetcher
+from uqload_dl.uqload import UQLoad
+
+EMBED_PAGE = (
+    '<video src="https://m180.uqload.cx/abc/v.mp4"></video>\n'
+    '<img src="https://m180.uqload.cx/i/abc.jpg">\n'
+    '<script>title: "My Title"</script>\n'
+)
+
+
+def _response(body: str, delay: float = 0.0) -> MagicMock:
+    def read(amt=None):
+        time.sleep(delay)
+        data, response.body = response.body, b""
+        return data
+
+    response = MagicMock()
+    response.body = body.encode("utf-8")
+    response.getcode.return_value = 200
+    response.info.return_value = {}
+    response.length = None
+    response.read.side_effect = read
+    response.__enter__.return_value = response
+    return response
+
+
+def test_normalize_mirror() -> None:
+    assert normalize_mirror("uqload.io") == "uqload.io"
+    assert normalize_mirror(" https://UQLOAD.co/ ") == "uqload.co"
+
+    with pytest.raises(ValueError):
+        normalize_mirror("example.com")
+
+    with pytest.raises(ValueError):
+        normalize_mirror(None)
+
+
+def test_stats_rank_and_persist(tmp_path) -> None:
+    path = str(tmp_path / "mirrors.json")
+    stats = MirrorStats(path)
+    stats.record("uqload.cx", None)
+    stats.record("uqload.io", 0.5)
+    stats.record("uqload.co", 0.1)
+    stats.record("uqload.co", 0.2)
+    stats.save()
+
+    mirrors = ["uqload.cx", "uqload.io", "uqload.net", "uqload.co"]
+    assert stats.rank(mirrors) == ["uqload.co", "uqload.io", "uqload.net", "uqload.cx"]
+
+    reloaded = MirrorStats(path)
+    assert reloaded.rank(mirrors) == stats.rank(mirrors)
+    assert reloaded.get("uqload.co")["latency"] == pytest.approx(0.13)
+    assert reloaded.get("uqload.cx")["failures"] == 1
+
+
+def test_failed_mirror_recovers_after_cooldown(tmp_path, monkeypatch) -> None:
+    stats = MirrorStats(str(tmp_path / "mirrors.json"))
+    stats.record("uqload.cx", 0.1)
+    stats.record("uqload.cx", None)
+    assert stats.rank(["uqload.cx", "uqload.io"]) == ["uqload.io", "uqload.cx"]
+
+    later = time.time() + 3600
+    monkeypatch.setattr("uqload_dl.mirrors.time.time", lambda: later)
+    assert stats.rank(["uqload.cx", "uqload.io"]) == ["uqload.cx", "uqload.io"]
+
+
+def test_corrupt_stats_are_ignored(tmp_path) -> None:
+    path = tmp_path / "mirrors.json"
+    path.write_text("{not json")
+    assert MirrorStats(str(path)).get("uqload.cx") == {}
+
+
+def test_fetch_first_returns_fastest_valid_page() -> None:
+    responses = {
+        "https://slow/": _response(EMBED_PAGE, delay=0.3),
+        "https://parked/": _response("<html>domain for sale</html>\n"),
+        "https://fast/": _response(EMBED_PAGE, delay=0.01),
+    }
+    urls = list(responses)
+
+    with patch(
+        "uqload_dl.http_pool.urlopen", side_effect=lambda url, **kwargs: responses[url]
+    ):
+        fetcher = ParallelURLFetcher(retries=0)
+        started = time.monotonic()
+        index, text, outcomes = fetcher.fetch_first(
+            urls, [embed_page_scanner() for _ in urls], accept=is_embed_page
+        )
+
+    assert urls[index] == "https://fast/"
+    assert text == EMBED_PAGE
+    assert time.monotonic() - started < 0.25
+    assert outcomes[1] is None
+    assert outcomes[2] is not None
+    assert 0 not in outcomes
+
+
+def test_fetch_first_staggers_starts() -> None:
+    responses = {"https://a/": _response(EMBED_PAGE), "https://b/": _response("")}
+
+    with patch(
+        "uqload_dl.http_pool.urlopen", side_effect=lambda url, **kwargs: responses[url]
+    ) as mock_urlopen:
+        index, _, _ = ParallelURLFetcher().fetch_first(
+            list(responses),
+            [embed_page_scanner(), embed_page_scanner()],
+            accept=is_embed_page,
+            stagger=5,
+        )
+
+    assert index == 0
+    assert mock_urlopen.call_count == 1
+
+
+def test_fetch_first_all_failed() -> None:
+    empty = lambda url, **kwargs: _response("")
+    with patch("uqload_dl.http_pool.urlopen", side_effect=empty):
+        index, text, outcomes = ParallelURLFetcher().fetch_first(
+            ["https://a/", "https://b/"],
+            [embed_page_scanner(), embed_page_scanner()],
+            accept=is_embed_page,
+            stagger=0.01,
+        )
+
+    assert (index, text) == (None, None)
+    assert outcomes == {0: None, 1: None}
+
+
+@patch("uqload_dl.uqload.FileDownloader")
+def test_uqload_uses_winning_mirror(mock_downloader, tmp_path) -> None:
+    stats = MirrorStats(str(tmp_path / "mirrors.json"))
+    stats.record("uqload.co", 0.1)
+    fetcher = MagicMock()
+    fetcher.fetch_first.return_value = (1, EMBED_PAGE, {0: None, 1: 0.2})
+    fetcher.fetch_all.return_value = ["<h1>Mirror Title</h1>"]
+
+    uq = UQLoad(
+        "vule3vel9n5q",
+        mirrors=["uqload.io", "https://uqload.co"],
+        mirror_stats=stats,
+        fetcher=fetcher,
+    )
+    info = uq.get_video_info()
+
+    raced = fetcher.fetch_first.call_args[0][0]
+    assert raced == [
+        "https://uqload.co/embed-vule3vel9n5q.html",
+        "https://uqload.io/embed-vule3vel9n5q.html",
+    ]
+    assert uq.url == "https://uqload.io/embed-vule3vel9n5q.html"
+    assert fetcher.fetch_all.call_args[0][0] == ["https://uqload.io/vule3vel9n5q.html"]
+    assert info["title"] == "Mirror Title"
+    assert stats.get("uqload.co")["failures"] == 1
+    assert MirrorStats(stats.path).get("uqload.io")["latency"] == 0.2
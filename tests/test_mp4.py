@@ -0,0 +1,315 @@
+import os, pytest, re, struct
+from unittest.mock import MagicMock, patch
+from uqload_dl.download_journal import DownloadJournal
+from uqload_dl.file_downloader import FileDownloader
+from uqload_dl.mp4 import HEAD_SIZE, Movie, make_box, plan_clip, probe, read_moov
+
+VIDEO_SAMPLES = 10
+AUDIO_SAMPLES = 20
+
+
+def _full(kind: str, payload: bytes, version: int = 0) -> bytes:
+    return make_box(kind, struct.pack(">I", version << 24) + payload)
+
+
+def _table(kind: str, entry: str, entries) -> bytes:
+    packed = b"".join(struct.pack(">" + entry, *e) for e in entries)
+    return _full(kind, struct.pack(">I", len(entries)) + packed)
+
+
+def _sample(track: int, index: int, size: int) -> bytes:
+    return (b"%d:%03d|" % (track, index)).ljust(size, b".")
+
+
+def _trak(track_id, handler, codec, sizes, delta, chunks, per_chunk, extra=b""):
+    tkhd = _full(
+        "tkhd",
+        struct.pack(">IIIII", 0, 0, track_id, 0, len(sizes) * delta)
+        + bytes(52)
+        + struct.pack(">II", 640 << 16 if handler == b"vide" else 0, 360 << 16),
+    )
+    mdhd = _full("mdhd", struct.pack(">IIIIHH", 0, 0, 1000, len(sizes) * delta, 0, 0))
+    hdlr = _full("hdlr", struct.pack(">I4s12x", 0, handler) + b"\0")
+    stsd = _full("stsd", struct.pack(">I", 1) + make_box(codec, bytes(8)))
+    stbl = make_box(
+        "stbl",
+        stsd,
+        _table("stts", "II", [(len(sizes), delta)]),
+        extra,
+        _table("stsc", "III", [(1, per_chunk, 1)]),
+        _full("stsz", struct.pack(f">II{len(sizes)}I", 0, len(sizes), *sizes)),
+        _table("stco", "I", [(chunk,) for chunk in chunks]),
+    )
+    minf = make_box("minf", _full("vmhd", bytes(8)), stbl)
+    return make_box("trak", tkhd, make_box("mdia", mdhd, hdlr, minf))
+
+
+def build_mp4(fast_start: bool, padding: int = 0) -> bytes:
+    """A 1 s movie: 10 video frames of 100 ms, keyframes 0 and 5, and AAC audio.
+
+    The padding is appended to the mdat after the samples, to push a trailing
+    moov past the first window read by read_moov.
+    """
+    ftyp = make_box("ftyp", b"isom\0\0\2\0isommp41")
+    video_sizes = [100 + i for i in range(VIDEO_SAMPLES)]
+    audio_sizes = [30] * AUDIO_SAMPLES
+
+    def layout(base: int):
+        payload, video_chunks, audio_chunks = b"", [], []
+        for i in range(VIDEO_SAMPLES):
+            video_chunks.append(base + len(payload))
+            payload += _sample(1, i, video_sizes[i])
+            audio_chunks.append(base + len(payload))
+            for j in (2 * i, 2 * i + 1):
+                payload += _sample(2, j, audio_sizes[j])
+        payload += bytes(padding)
+        ctts = _table("ctts", "II", [(VIDEO_SAMPLES, 100)])
+        stss = _table("stss", "I", [(1,), (6,)])
+        moov = make_box(
+            "moov",
+            _full("mvhd", struct.pack(">IIII", 0, 0, 1000, 1000) + bytes(80)),
+            _trak(1, b"vide", "avc1", video_sizes, 100, video_chunks, 1, ctts + stss),
+            _trak(2, b"soun", "mp4a", audio_sizes, 50, audio_chunks, 2),
+        )
+        return payload, moov
+
+    if fast_start:
+        _, moov = layout(0)
+        payload, moov = layout(len(ftyp) + len(moov) + 8)
+        return ftyp + moov + make_box("mdat", payload)
+    payload, _ = layout(len(ftyp) + 8)
+    _, moov = layout(len(ftyp) + 8)
+    return ftyp + make_box("mdat", payload) + moov
+
+
+def _reader(data: bytes, requests: list):
+    def read_range(start: int, end: int) -> bytes:
+        requests.append((start, end))
+        return data[start : end + 1]
+
+    return read_range
+
+
+def _cut(source: bytes, start: float, end: float):
+    movie = Movie(*reversed(read_moov(_reader(source, []), len(source))))
+    clip = plan_clip(movie, start, end)
+    output = bytearray(clip.size)
+    output[: len(clip.header)] = clip.header
+    for first, last, offset in clip.ranges:
+        output[offset : offset + last - first + 1] = source[first : last + 1]
+    return clip, bytes(output)
+
+
+@pytest.mark.parametrize("fast_start", [True, False])
+def test_read_moov_takes_few_requests(fast_start: bool) -> None:
+    source = build_mp4(fast_start, padding=1 << 20)
+    requests = []
+
+    ftyp, moov = read_moov(_reader(source, requests), len(source))
+    movie = Movie(moov, ftyp)
+
+    assert len(requests) == (1 if fast_start else 2)
+    assert ftyp.startswith(struct.pack(">I", 24) + b"ftyp")
+    assert movie.duration == 1.0
+    assert [track.codec for track in movie.tracks] == ["avc1", "mp4a"]
+    assert (movie.video.width, movie.video.height) == (640, 360)
+
+
+@pytest.mark.parametrize("fast_start", [True, False])
+def test_probe_reads_headers_only(fast_start: bool) -> None:
+    source = build_mp4(fast_start, padding=1 << 20)
+    requests = []
+
+    info = probe(_reader(source, requests), len(source), source[:HEAD_SIZE])
+
+    assert len(requests) == (0 if fast_start else 1)
+    assert all(last - first < HEAD_SIZE for first, last in requests)
+    assert info == {
+        "duration": 1.0,
+        "width": 640,
+        "height": 360,
+        "codec": "avc1,mp4a",
+        "bitrate": len(source) * 8,
+    }
+
+
+@pytest.mark.parametrize("fast_start", [True, False])
+def test_clip_starts_on_a_keyframe_and_keeps_sample_data(fast_start: bool) -> None:
+    source = build_mp4(fast_start)
+
+    clip, output = _cut(source, 0.65, 0.85)
+
+    assert (clip.start, clip.end) == (0.5, 0.9)
+    ftyp, moov = read_moov(_reader(output, []), len(output))
+    assert moov.startswith(struct.pack(">I", len(moov)) + b"moov")
+    assert output.index(b"moov") < output.index(b"mdat")
+    movie = Movie(moov, ftyp)
+    video, audio = movie.tracks
+    assert movie.duration == pytest.approx(0.4)
+    assert video.sizes == [105, 106, 107, 108]
+    assert video.sync == [0]
+    assert video.composition == [100] * 4
+    assert len(audio.sizes) == 8
+    for track, first in ((video, 5), (audio, 10)):
+        for index, (offset, size) in enumerate(zip(track.offsets, track.sizes)):
+            expected = _sample(1 if track is video else 2, first + index, size)
+            assert output[offset : offset + size] == expected
+
+
+def test_clip_downloads_only_the_interval() -> None:
+    source = build_mp4(False)
+
+    clip, _ = _cut(source, 0.5, 0.6)
+
+    copied = sum(last - first + 1 for first, last, _ in clip.ranges)
+    assert copied < len(source) // 2
+
+
+def test_invalid_clips() -> None:
+    source = build_mp4(True)
+    with pytest.raises(ValueError):
+        _cut(source, 0.5, 0.5)
+    with pytest.raises(ValueError):
+        _cut(source, 2.0, 3.0)
+    with pytest.raises(ValueError):
+        read_moov(_reader(b"<html>not a video</html>", []), 24)
+
+
+@pytest.mark.parametrize(
+    "moov",
+    [
+        make_box("moov", make_box("mvhd")),
+        make_box(
+            "moov",
+            _full("mvhd", struct.pack(">IIII", 0, 0, 1000, 1000) + bytes(80)),
+            make_box("trak", make_box("tkhd")),
+        ),
+    ],
+    ids=["empty mvhd", "empty tkhd"],
+)
+def test_truncated_moov_is_invalid(moov: bytes) -> None:
+    source = make_box("ftyp", b"isom\0\0\2\0isommp41") + moov
+
+    with pytest.raises(ValueError):
+        probe(_reader(source, []), len(source), source)
+    with pytest.raises(ValueError):
+        Movie(moov)
+
+
+def _range_server(source: bytes, requests: list):
+    """Answers Range requests for the source, like http_pool.urlopen."""
+
+    def urlopen(url, headers, **kwargs):
+        match = re.match(r"bytes=(\d+)-(\d+)", headers["Range"])
+        first, last = int(match.group(1)), int(match.group(2))
+        requests.append((first, last))
+        body = source[first : last + 1]
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.getcode.return_value = 206
+        response.info.return_value = {
+            "Content-Length": str(len(body)),
+            "Content-Range": f"bytes {first}-{last}/{len(source)}",
+        }
+        response.read.return_value = body
+        pending = [body]
+
+        def readinto(buffer) -> int:
+            chunk = pending.pop() if pending else b""
+            buffer[: len(chunk)] = chunk
+            return len(chunk)
+
+        response.readinto.side_effect = readinto
+        return response
+
+    return urlopen
+
+
+def test_download_clip_writes_the_planned_file(tmp_path) -> None:
+    source = build_mp4(False, padding=1 << 20)
+    _, expected = _cut(source, 0.65, 0.85)
+    requests = []
+
+    with patch(
+        "uqload_dl.file_downloader.http_pool.urlopen",
+        side_effect=_range_server(source, requests),
+    ):
+        downloader = FileDownloader(
+            "https://example.com/video.mp4", "clip", str(tmp_path), connections=2
+        )
+        downloader.download_clip(0.65, 0.85)
+
+    with open(downloader.destination, "rb") as file:
+        assert file.read() == expected
+    assert downloader.total_size == len(expected)
+    assert os.path.basename(downloader.destination) == "clip_clip_0.65-0.85.mp4"
+    assert not os.path.exists(downloader.partial_destination)
+    # The probe, the moov and the samples: the padding is never requested.
+    assert sum(last - first + 1 for first, last in requests) < len(source) // 4
+
+
+def test_download_clip_leaves_an_unfinished_download_alone(tmp_path) -> None:
+    source = build_mp4(True, padding=1 << 20)
+    url = "https://example.com/v.mp4"
+    partial = os.path.join(tmp_path, "v.mp4.part")
+    with open(partial, "wb") as file:
+        file.write(source[: len(source) // 2])
+    journal = DownloadJournal(f"{partial}.json", url, len(source))
+    journal.add(0, len(source) // 2)
+    journal.save()
+
+    with patch(
+        "uqload_dl.file_downloader.http_pool.urlopen",
+        side_effect=_range_server(source, []),
+    ):
+        downloader = FileDownloader(url, output_dir=str(tmp_path))
+        downloader.download_clip(0, 0.3)
+        # A partial file of another clip of the same length is not reused either.
+        other = os.path.join(tmp_path, "v_clip_0.5-0.8.mp4")
+        with open(f"{other}.part", "wb") as file:
+            file.write(b"x" * 10)
+        DownloadJournal(f"{other}.part.json", "https://example.com/w.mp4", 10).save()
+        downloader.download_clip(0.5, 0.8)
+
+    assert os.path.basename(downloader.destination).startswith("v_clip_0.5-0.8_")
+    with open(f"{other}.part", "rb") as file:
+        assert file.read() == b"x" * 10
+    with open(partial, "rb") as file:
+        assert file.read() == source[: len(source) // 2]
+    assert os.path.isfile(os.path.join(tmp_path, "v_clip_0-0.3.mp4"))
+    assert DownloadJournal(f"{partial}.json", url, len(source)).completed_bytes > 0
+
+
+def test_download_clip_raises_on_invalid_clips(tmp_path) -> None:
+    source = build_mp4(True)
+
+    with patch(
+        "uqload_dl.file_downloader.http_pool.urlopen",
+        side_effect=_range_server(source, []),
+    ):
+        downloader = FileDownloader("https://example.com/v.mp4", "v", str(tmp_path))
+        with pytest.raises(ValueError):
+            downloader.download_clip(5, 6)
+    with patch(
+        "uqload_dl.file_downloader.http_pool.urlopen",
+        side_effect=_range_server(b"<html>" + bytes(100), []),
+    ):
+        with pytest.raises(ValueError):
+            downloader.download_clip(0, 1)
+    assert os.listdir(tmp_path) == []
+
+
+def test_probe_container_reads_the_size_and_head_at_once() -> None:
+    source = build_mp4(True, padding=1 << 20)
+    requests = []
+
+    with patch(
+        "uqload_dl.file_downloader.http_pool.urlopen",
+        side_effect=_range_server(source, requests),
+    ):
+        downloader = FileDownloader("https://example.com/video.mp4")
+        info = downloader.probe_container()
+
+    assert requests == [(0, HEAD_SIZE - 1)]
+    assert downloader.total_size == len(source)
+    assert (info["width"], info["height"], info["duration"]) == (640, 360, 1.0)
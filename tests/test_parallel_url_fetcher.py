@@ -1,7 +1,13 @@
-import pytest
+import gzip, pytest, random, threading, zlib
 from typing import NoReturn
 from unittest.mock import patch, MagicMock
-from uqload_dl.parallel_url_fetcher import ParallelURLFetcher
+from uqload_dl.extractor import embed_page_scanner, video_page_scanner
+from uqload_dl.parallel_url_fetcher import PAGE_HEADERS, ParallelURLFetcher
+
+# The start of an embed page, with every field its scanner waits for.
+EMBED_HEAD = (
+    b'sources: ["https://a.cx/1/v.mp4"], poster: "https://a.cx/i.jpg", title: "x"\n'
+)
 
 
 def test_valid_urls_fetch_success() -> None:
@@ -17,7 +23,7 @@ def test_valid_urls_fetch_success() -> None:
     mock_response2.read.return_value = b"content2"
     mock_response2.__enter__.return_value = mock_response2
 
-    with patch("urllib.request.urlopen", side_effect=[mock_response1, mock_response2]):
+    with patch("uqload_dl.http_pool.urlopen", side_effect=[mock_response1, mock_response2]):
         fetcher = ParallelURLFetcher(urls)
         result = fetcher.fetch_all()
         assert result == ["content1", "content2"]
@@ -35,7 +41,7 @@ def test_fetch_with_invalid_url_returns_none() -> None:
     mock_invalid.getcode.return_value = 404
     mock_invalid.__enter__.return_value = mock_invalid
 
-    with patch("urllib.request.urlopen", side_effect=[mock_valid, mock_invalid]):
+    with patch("uqload_dl.http_pool.urlopen", side_effect=[mock_valid, mock_invalid]):
         fetcher = ParallelURLFetcher(urls)
         result = fetcher.fetch_all()
         assert result == ["ok", None]
@@ -52,7 +58,7 @@ def test_fetch_with_exception_returns_none() -> None:
     def raise_error(*args, **kwargs) -> NoReturn:
         raise Exception("Network error")
 
-    with patch("urllib.request.urlopen", side_effect=[mock_valid, raise_error]):
+    with patch("uqload_dl.http_pool.urlopen", side_effect=[mock_valid, raise_error]):
         fetcher = ParallelURLFetcher(urls)
         result = fetcher.fetch_all()
         assert result == ["success", None]
@@ -64,3 +70,152 @@ def test_invalid_urls_raise_value_error():
 
     with pytest.raises(ValueError):
         ParallelURLFetcher(["", None])
+
+
+def _response(code: int, body: bytes = b"") -> MagicMock:
+    response = MagicMock()
+    response.getcode.return_value = code
+    response.read.return_value = body
+    response.__enter__.return_value = response
+    return response
+
+
+def test_retries_temporary_errors() -> None:
+    responses = [_response(503), ConnectionResetError("reset"), _response(200, b"ok")]
+
+    with patch("uqload_dl.http_pool.urlopen", side_effect=responses) as mock_urlopen:
+        fetcher = ParallelURLFetcher(retries=2, backoff=0)
+        assert fetcher.fetch_all(["https://example.com/1"]) == ["ok"]
+
+    assert mock_urlopen.call_count == 3
+
+
+def test_does_not_retry_client_errors() -> None:
+    response = _response(404)
+    with patch("uqload_dl.http_pool.urlopen", return_value=response) as mock_urlopen:
+        fetcher = ParallelURLFetcher(retries=3, backoff=0)
+        assert fetcher.fetch_all(["https://example.com/1"]) == [None]
+
+    assert mock_urlopen.call_count == 1
+
+
+def test_gives_up_after_retries() -> None:
+    error = TimeoutError("timed out")
+    with patch("uqload_dl.http_pool.urlopen", side_effect=error) as mock_urlopen:
+        fetcher = ParallelURLFetcher(retries=1, backoff=0, timeout=2)
+        assert fetcher.fetch_all(["https://example.com/1"]) == [None]
+
+    assert mock_urlopen.call_count == 2
+    assert mock_urlopen.call_args.kwargs["timeout"] == 2
+
+
+def test_reusable_fetcher_keeps_order_with_bounded_threads() -> None:
+    seen_threads = set()
+
+    def fake_urlopen(url, **kwargs):
+        seen_threads.add(threading.get_ident())
+        return _response(200, url.encode())
+
+    urls = [f"https://example.com/{i}" for i in range(200)]
+    with patch("uqload_dl.http_pool.urlopen", side_effect=fake_urlopen):
+        with ParallelURLFetcher(max_workers=4) as fetcher:
+            assert fetcher.fetch_all(urls) == urls
+            assert fetcher.fetch_all(urls[:3]) == urls[:3]
+
+    assert len(seen_threads) <= 4
+
+
+def test_invalid_options_raise_value_error() -> None:
+    with pytest.raises(ValueError):
+        ParallelURLFetcher(retries=-1)
+
+    with pytest.raises(ValueError):
+        ParallelURLFetcher(timeout=0)
+
+    with pytest.raises(ValueError):
+        ParallelURLFetcher().fetch_all()
+
+
+class _StreamResponse:
+    def __init__(self, body: bytes, encoding: str = None) -> None:
+        self.body = body
+        self.position = 0
+        self.headers = {"Content-Encoding": encoding} if encoding else {}
+
+    def info(self) -> dict:
+        return self.headers
+
+    @property
+    def length(self) -> int:
+        return len(self.body) - self.position
+
+    def getcode(self) -> int:
+        return 200
+
+    def read(self, amt=None) -> bytes:
+        end = len(self.body) if amt is None else self.position + amt
+        data = self.body[self.position : end]
+        self.position += len(data)
+        return data
+
+    def __enter__(self) -> "_StreamResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        pass
+
+
+def test_scanner_stops_reading_early() -> None:
+    head = EMBED_HEAD
+    response = _StreamResponse(head + b"<p>filler</p>\n" * 50000)
+
+    with patch("uqload_dl.http_pool.urlopen", return_value=response):
+        result = ParallelURLFetcher().fetch_all(
+            ["https://example.com/1"], [embed_page_scanner()]
+        )
+
+    assert result[0].startswith(head.decode())
+    assert response.position < len(response.body)
+
+
+def test_invalid_utf8_is_replaced() -> None:
+    response = _StreamResponse(b"caf\xe9 \xc3\xa9\n")
+
+    with patch("uqload_dl.http_pool.urlopen", return_value=response):
+        result = ParallelURLFetcher().fetch_all(
+            ["https://example.com/1"], [video_page_scanner()]
+        )
+
+    assert result == ["caf� é\n"]
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [
+        ("gzip", gzip.compress),
+        ("deflate", zlib.compress),
+        ("deflate", lambda data: zlib.compress(data)[2:-4]),
+    ],
+)
+def test_compressed_pages_are_decoded(encoding, compress) -> None:
+    page = "<h1>Título</h1>\n" + "<p>filler</p>\n" * 5000
+    response = _StreamResponse(compress(page.encode("utf-8")), encoding)
+
+    with patch("uqload_dl.http_pool.urlopen", return_value=response):
+        assert ParallelURLFetcher().fetch_all(["https://example.com/1"]) == [page]
+
+    assert PAGE_HEADERS["Accept-Encoding"] == "gzip, deflate"
+
+
+def test_compressed_page_scanner_stops_early() -> None:
+    head = EMBED_HEAD
+    body = head + bytes(random.getrandbits(8) for _ in range(300000)).hex().encode()
+    response = _StreamResponse(gzip.compress(body), "gzip")
+
+    with patch("uqload_dl.http_pool.urlopen", return_value=response):
+        result = ParallelURLFetcher().fetch_all(
+            ["https://example.com/1"], [embed_page_scanner()]
+        )
+
+    assert result[0].startswith(head.decode())
+    assert response.position < len(response.body)
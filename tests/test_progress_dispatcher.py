@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import patch
+from uqload_dl.progress_dispatcher import ProgressDispatcher
+
+
+def test_requires_a_criterion() -> None:
+    with pytest.raises(ValueError):
+        ProgressDispatcher(print, min_interval=None, min_bytes=None)
+
+
+@patch("uqload_dl.progress_dispatcher.time.monotonic", return_value=10.0)
+def test_time_coalescing_always_delivers_final(mock_monotonic) -> None:
+    calls = []
+    dispatcher = ProgressDispatcher(lambda d, t: calls.append(d), min_interval=1.0)
+    for downloaded in range(1, 101):
+        dispatcher.update(downloaded, 100)
+    assert calls == [1, 100]
+
+    mock_monotonic.return_value = 20.0
+    dispatcher.update(100, 100)
+    assert calls == [1, 100]
+
+
+def test_byte_coalescing() -> None:
+    calls = []
+    dispatcher = ProgressDispatcher(
+        lambda d, t: calls.append(d), min_interval=None, min_bytes=30
+    )
+    for downloaded in range(10, 101, 10):
+        dispatcher.update(downloaded, 100)
+    assert calls == [10, 40, 70, 100]
+
+
+@patch("uqload_dl.progress_dispatcher.time.monotonic", return_value=10.0)
+def test_flush_delivers_pending_update(mock_monotonic) -> None:
+    calls = []
+    dispatcher = ProgressDispatcher(lambda d, t: calls.append(d), min_interval=1.0)
+    dispatcher.update(10, 100)
+    dispatcher.update(50, 100)
+    dispatcher.flush()
+    dispatcher.flush()
+    assert calls == [10, 50]
+    assert dispatcher.delivered == 2
@@ -0,0 +1,39 @@
+import pytest, time
+from threading import Thread
+from uqload_dl.rate_limiter import TokenBucket, get_shared_bucket
+
+
+@pytest.mark.parametrize("rate", [(0), (-1), ("fast"), (None)])
+def test_invalid_rate(rate) -> None:
+    with pytest.raises(ValueError):
+        TokenBucket(rate)
+
+
+def test_consume_respects_rate() -> None:
+    bucket = TokenBucket(100_000)
+    started = time.monotonic()
+    for _ in range(10):
+        bucket.consume(5_000)
+    assert time.monotonic() - started >= 0.45
+
+
+def test_consume_is_shared_between_threads() -> None:
+    bucket = TokenBucket(100_000)
+
+    def worker() -> None:
+        for _ in range(5):
+            bucket.consume(5_000)
+
+    threads = [Thread(target=worker) for _ in range(2)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= 0.45
+
+
+def test_shared_bucket_is_reused_and_reconfigured() -> None:
+    bucket = get_shared_bucket(1000)
+    assert get_shared_bucket(2000) is bucket
+    assert bucket.rate == 2000
@@ -2,6 +2,7 @@ import pytest
 from unittest.mock import patch
 from uqload_dl.uqload import UQLoad
 from uqload_dl.exceptions import VideoNotFound
+from uqload_dl.metadata_cache import MetadataCache
 from typing import Dict
 
 
@@ -15,6 +16,17 @@ def sample_data() -> Dict[str, str]:
     }
 
 
+@pytest.fixture
+def container() -> Dict:
+    return {
+        "duration": 3723.4,
+        "width": 1280,
+        "height": 720,
+        "codec": "avc1,mp4a",
+        "bitrate": 800000,
+    }
+
+
 def test_invalid_url_raises_value_error() -> None:
     with pytest.raises(ValueError):
         UQLoad("invalid_url")
@@ -41,6 +53,8 @@ def test_get_video_info_success(
 
     mock_downloader.return_value.total_size = 12345
     mock_downloader.return_value.type = "video/mp4"
+    # Not an MP4 file: the resolution and duration of the page are kept.
+    mock_downloader.return_value.probe_container.side_effect = ValueError()
 
     uq = UQLoad(sample_data["valid_url"])
     info = uq.get_video_info()
@@ -94,3 +108,152 @@ def test_video_not_found_missing_mp4(mock_fetcher, sample_data: Dict[str, str])
     uq = UQLoad(sample_data["valid_url"])
     with pytest.raises(VideoNotFound):
         uq.get_video_info()
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_get_video_info_reads_the_container(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str], container: Dict
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [
+        sample_data["video_response"],
+        sample_data["embed_response"],
+    ]
+    mock_downloader.return_value.total_size = 12345
+    mock_downloader.return_value.probe_container.return_value = container
+
+    info = UQLoad(sample_data["valid_url"]).get_video_info()
+
+    assert info["resolution"] == "1280x720"
+    assert info["duration"] == "1:02:03"
+    assert info["codec"] == "avc1,mp4a"
+    assert info["bitrate"] == 800000
+    assert not mock_downloader.return_value.fetch_metadata.called
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_container_probe_only_for_video_info(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str]
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [
+        sample_data["video_response"],
+        sample_data["embed_response"],
+    ]
+    mock_downloader.return_value.total_size = None
+    mock_downloader.return_value.probe_container.side_effect = ValueError()
+
+    uq = UQLoad(sample_data["valid_url"])
+    uq.download()
+    assert not mock_downloader.return_value.probe_container.called
+
+    uq.get_video_info()
+    assert mock_downloader.return_value.probe_container.called
+    # The probe found no size, so it falls back to a HEAD request.
+    assert mock_downloader.return_value.fetch_metadata.called
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_video_page_is_optional(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str], container: Dict
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [sample_data["video_response"]]
+    mock_downloader.return_value.total_size = 12345
+    mock_downloader.return_value.probe_container.return_value = container
+
+    info = UQLoad(sample_data["valid_url"], video_page=False).get_video_info()
+
+    urls, _ = mock_fetcher.return_value.fetch_all.call_args.args
+    assert urls == [sample_data["formatted_url"]]
+    assert info["title"] == "My Title"
+    assert info["resolution"] == "1280x720"
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_get_video_info_answers_from_cache(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str], container, tmp_path
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [
+        sample_data["video_response"],
+        sample_data["embed_response"],
+    ]
+    mock_downloader.return_value.total_size = 12345
+    mock_downloader.return_value.type = "video/mp4"
+    mock_downloader.return_value.probe_container.return_value = container
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+
+    first = UQLoad(sample_data["valid_url"], cache=cache).get_video_info()
+    assert mock_fetcher.call_count == 1
+
+    uq = UQLoad(sample_data["valid_url"], output_file="other", cache=cache)
+    info = uq.get_video_info()
+    assert mock_fetcher.call_count == 1
+    assert info == {**first, "title": "other"}
+
+    uq.get_video_info(use_cache=False)
+    assert mock_fetcher.call_count == 2
+
+    uq.download()
+    assert mock_fetcher.call_count == 2
+    assert mock_downloader.return_value.download.called
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_download_refreshes_the_link_and_keeps_cached_metadata(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str], container, tmp_path
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [
+        sample_data["video_response"],
+        sample_data["embed_response"],
+    ]
+    mock_downloader.return_value.total_size = 12345
+    mock_downloader.return_value.type = "video/mp4"
+    mock_downloader.return_value.probe_container.return_value = container
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    first = UQLoad(sample_data["valid_url"], cache=cache).get_video_info()
+
+    uq = UQLoad(sample_data["valid_url"], cache=cache)
+    uq.get_video_info()
+    uq.download()
+
+    assert mock_fetcher.call_count == 2
+    assert mock_downloader.return_value.probe_container.call_count == 1
+    assert cache.get(uq.video_id)["size"] == 12345
+    assert cache.get(uq.video_id)["codec"] == first["codec"]
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+@patch("uqload_dl.uqload.FileDownloader")
+def test_get_video_url_resolves_once_for_the_download(
+    mock_downloader, mock_fetcher, sample_data: Dict[str, str]
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = [
+        sample_data["video_response"],
+        sample_data["embed_response"],
+    ]
+
+    uq = UQLoad(sample_data["valid_url"])
+    video_url = uq.get_video_url()
+    uq.download()
+
+    assert video_url == mock_downloader.call_args.kwargs["url"]
+    assert mock_fetcher.call_count == 1
+    assert mock_downloader.return_value.download.called
+
+
+@patch("uqload_dl.uqload.ParallelURLFetcher")
+def test_deleted_video_is_cached(
+    mock_fetcher, sample_data: Dict[str, str], tmp_path
+) -> None:
+    mock_fetcher.return_value.fetch_all.return_value = ["File was deleted", ""]
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+
+    with pytest.raises(VideoNotFound):
+        UQLoad(sample_data["valid_url"], cache=cache).get_video_info()
+    with pytest.raises(VideoNotFound):
+        UQLoad(sample_data["valid_url"], cache=cache).get_video_info()
+
+    assert mock_fetcher.call_count == 1
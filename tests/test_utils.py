@@ -7,6 +7,8 @@ from uqload_dl.utils import (
     is_a_valid_directory,
     is_a_callback,
     sizeof_fmt,
+    parse_size,
+    format_duration,
 )
 
 
@@ -151,3 +153,34 @@ def test_uqload_correct_url(url) -> None:
 )
 def test_sizeof_fmt(input_bytes, expected):
     assert sizeof_fmt(input_bytes) == expected
+
+
+@pytest.mark.parametrize(
+    "seconds, expected",
+    [(0, "00:00"), (83.4, "01:23"), (3723, "1:02:03")],
+)
+def test_format_duration(seconds, expected):
+    assert format_duration(seconds) == expected
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        (1024, 1024),
+        (1.5, 1),
+        ("512", 512),
+        ("500K", 500 * 1024),
+        ("2M", 2 * 1024**2),
+        ("2MB", 2 * 1024**2),
+        ("1.5MiB", int(1.5 * 1024**2)),
+        (" 1g ", 1024**3),
+    ],
+)
+def test_parse_size(size, expected) -> None:
+    assert parse_size(size) == expected
+
+
+@pytest.mark.parametrize("size", [(0), (-1), (""), ("fast"), ("2X"), (None), (True)])
+def test_parse_size_invalid(size) -> None:
+    with pytest.raises(ValueError):
+        parse_size(size)
@@ -0,0 +1,55 @@
+import pytest, time
+from threading import Event, Thread
+from uqload_dl.write_pipeline import WritePipeline
+
+
+def test_pipeline_writes_and_reports_in_order() -> None:
+    data = bytearray(12)
+    written = []
+
+    def write(offset: int, chunk) -> None:
+        data[offset : offset + len(chunk)] = chunk
+
+    pipeline = WritePipeline(write, lambda o, s: written.append((o, s)), 64, 8)
+    for offset, chunk in ((0, b"0123"), (4, b"4567"), (8, b"89ab")):
+        buffer = pipeline.acquire()
+        buffer[: len(chunk)] = chunk
+        pipeline.submit(offset, buffer, len(chunk))
+    pipeline.drain()
+    pipeline.close()
+
+    assert bytes(data) == b"0123456789ab"
+    assert written == [(0, 4), (4, 4), (8, 4)]
+
+
+def test_pipeline_caps_memory_and_applies_backpressure() -> None:
+    unblocked = Event()
+    pipeline = WritePipeline(lambda o, d: unblocked.wait(), lambda o, s: None, 32, 16)
+    assert (pipeline.buffer_size, pipeline.max_buffers) == (16, 2)
+
+    pipeline.submit(0, pipeline.acquire(), 16)
+    pipeline.submit(16, pipeline.acquire(), 16)
+    acquired = []
+    reader = Thread(target=lambda: acquired.append(pipeline.acquire()))
+    reader.start()
+    time.sleep(0.2)
+    assert not acquired
+
+    unblocked.set()
+    reader.join(timeout=5)
+    assert acquired and pipeline.allocated == 2
+    pipeline.release(acquired[0])
+    pipeline.close()
+
+
+def test_pipeline_raises_write_errors_to_readers() -> None:
+    def write(offset: int, chunk) -> None:
+        raise OSError(28, "No space left on device")
+
+    pipeline = WritePipeline(write, lambda o, s: None, 32, 16)
+    pipeline.submit(0, pipeline.acquire(), 16)
+    with pytest.raises(OSError):
+        pipeline.drain()
+    with pytest.raises(OSError):
+        pipeline.acquire()
+    pipeline.close()
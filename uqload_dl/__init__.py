@@ -1,2 +1,30 @@
-from uqload_dl.uqload import UQLoad
 from uqload_dl.version import __version__
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from uqload_dl.uqload import UQLoad
+    from uqload_dl.async_uqload import AsyncUQLoad
+
+__all__ = ["UQLoad", "AsyncUQLoad", "__version__"]
+
+# Public names and the module defining them. They are imported on first access
+# (PEP 562), so `import uqload_dl` and the CLI start without loading the HTTP
+# stack or asyncio.
+_LAZY_ATTRIBUTES = {
+    "UQLoad": "uqload_dl.uqload",
+    "AsyncUQLoad": "uqload_dl.async_uqload",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
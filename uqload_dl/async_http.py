@@ -0,0 +1,350 @@
+import asyncio, http.client, io, ssl
+from urllib.parse import urljoin, urlsplit
+from typing import Dict, List, Optional, Tuple
+
+from uqload_dl.http_pool import REDIRECT_CODES, PoolKey
+
+_Stream = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncResponse:
+    """
+    An HTTP/1.1 response read from an asyncio stream.
+
+    The body is framed by Content-Length, chunked transfer encoding or the
+    end of the connection. Closing a fully read keep-alive response hands its
+    connection back to the client.
+
+    Args:
+        client (AsyncHTTPClient): The client that owns the connection.
+        key (PoolKey): The (scheme, host, port) of the connection.
+        stream (Tuple[StreamReader, StreamWriter]): The connection.
+        method (str): The request method.
+        url (str): The URL that produced this response.
+        timeout (float): Seconds to wait for each read.
+    """
+
+    def __init__(
+        self,
+        client: "AsyncHTTPClient",
+        key: PoolKey,
+        stream: _Stream,
+        method: str,
+        url: str,
+        timeout: float,
+    ) -> None:
+        self.__client = client
+        self.__key = key
+        self.__reader, self.__writer = stream
+        self.__method = method
+        self.__timeout = timeout
+        self.__closed = False
+        self.url = url
+        self.status = 0
+        self.reason = ""
+        self.headers: http.client.HTTPMessage = None
+        self.will_close = False
+        self.__remaining: Optional[int] = None
+        self.__chunked = False
+        self.__chunk_left = 0
+        self.__done = False
+
+    async def _begin(self) -> None:
+        """
+        Reads the status line and headers.
+
+        Raises:
+            ConnectionResetError: If the connection was closed before a response.
+            http.client.BadStatusLine: If the status line is invalid.
+        """
+        head = await self.__wait(self.__reader.readuntil(b"\r\n\r\n"))
+        status_line, _, header_block = head.partition(b"\r\n")
+        status_line = status_line.decode("iso-8859-1")
+        parts = status_line.split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise http.client.BadStatusLine(status_line)
+        if not parts[1].isdigit():
+            raise http.client.BadStatusLine(status_line)
+        self.status = int(parts[1])
+        self.reason = parts[2] if len(parts) > 2 else ""
+        self.headers = http.client.parse_headers(io.BytesIO(header_block))
+
+        connection = self.headers.get("Connection", "").lower()
+        self.will_close = connection == "close" or parts[0] == "HTTP/1.0"
+
+        if self.__method == "HEAD" or self.status in (204, 304, *range(100, 200)):
+            self.__remaining = 0
+        elif "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            self.__chunked = True
+        elif self.headers.get("Content-Length", "").isdigit():
+            self.__remaining = int(self.headers["Content-Length"])
+        else:
+            self.will_close = True
+        self.__done = self.__remaining == 0
+
+    async def __wait(self, awaitable):
+        """Awaits a stream operation with the response timeout."""
+        try:
+            return await asyncio.wait_for(awaitable, self.__timeout)
+        except asyncio.IncompleteReadError as error:
+            raise ConnectionResetError("connection closed by the server") from error
+
+    def getcode(self) -> int:
+        """Returns the HTTP status code."""
+        return self.status
+
+    def info(self) -> http.client.HTTPMessage:
+        """Returns the response headers."""
+        return self.headers
+
+    async def __read_chunk_size(self) -> int:
+        """Reads the next chunk size line of a chunked body."""
+        line = await self.__wait(self.__reader.readuntil(b"\r\n"))
+        return int(line.split(b";", 1)[0].strip() or b"0", 16)
+
+    async def __skip_trailers(self) -> None:
+        """Reads the trailer section that ends a chunked body."""
+        while await self.__wait(self.__reader.readuntil(b"\r\n")) != b"\r\n":
+            pass
+
+    async def read(self, amt: Optional[int] = None) -> bytes:
+        """
+        Reads up to amt bytes of the body, or all of it.
+
+        Args:
+            amt (int, optional): Maximum number of bytes to return.
+
+        Returns:
+            bytes: The data read, or b"" at the end of the body.
+        """
+        if amt is None:
+            parts = []
+            while data := await self.read(1024 * 1024):
+                parts.append(data)
+            return b"".join(parts)
+
+        if self.__done:
+            return b""
+
+        if self.__chunked:
+            if not self.__chunk_left:
+                self.__chunk_left = await self.__read_chunk_size()
+                if not self.__chunk_left:
+                    await self.__skip_trailers()
+                    self.__done = True
+                    return b""
+            size = min(amt, self.__chunk_left)
+            data = await self.__wait(self.__reader.read(size))
+            if not data:
+                raise http.client.IncompleteRead(b"")
+            self.__chunk_left -= len(data)
+            if not self.__chunk_left:
+                await self.__wait(self.__reader.readexactly(2))
+            return data
+
+        if self.__remaining is not None:
+            data = await self.__wait(self.__reader.read(min(amt, self.__remaining)))
+            if not data:
+                raise http.client.IncompleteRead(b"", self.__remaining)
+            self.__remaining -= len(data)
+            self.__done = not self.__remaining
+            return data
+
+        data = await self.__wait(self.__reader.read(amt))
+        self.__done = not data
+        return data
+
+    async def close(self) -> None:
+        """Closes the response and releases its connection."""
+        if self.__closed:
+            return
+        self.__closed = True
+        if self.__done and not self.will_close:
+            self.__client._release(self.__key, (self.__reader, self.__writer))
+        else:
+            self.__client._discard((self.__reader, self.__writer))
+
+    async def __aenter__(self) -> "AsyncResponse":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+class AsyncHTTPClient:
+    """
+    A small asyncio HTTP/1.1 client with keep-alive connections.
+
+    It only depends on the standard library. The number of open connections
+    is bounded, so a single event loop can drive many concurrent requests
+    with bounded memory.
+
+    Args:
+        max_connections (int, optional): Maximum responses open at the same time.
+        max_idle_per_host (int, optional): Idle connections kept per host.
+        timeout (float, optional): Default timeout in seconds for connect and reads.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_idle_per_host: int = 8,
+        timeout: float = 30.0,
+    ) -> None:
+        self.max_connections = max_connections
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        # Created on first use so it binds to the running event loop.
+        self.__slots: Optional[asyncio.Semaphore] = None
+        self.__idle: Dict[PoolKey, List[_Stream]] = {}
+        self.__ssl_context: Optional[ssl.SSLContext] = None
+
+    async def __connect(self, key: PoolKey, timeout: float) -> Tuple[_Stream, bool]:
+        """
+        Returns an idle connection for the key, or opens a new one.
+
+        Returns:
+            Tuple[_Stream, bool]: The connection and whether it was reused.
+        """
+        idle = self.__idle.get(key)
+        while idle:
+            stream = idle.pop()
+            if not stream[0].at_eof() and not stream[1].is_closing():
+                self.hits += 1
+                return stream, True
+            stream[1].close()
+
+        self.misses += 1
+        scheme, host, port = key
+        context = None
+        if scheme == "https":
+            if self.__ssl_context is None:
+                self.__ssl_context = ssl.create_default_context()
+            context = self.__ssl_context
+        stream = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context), timeout
+        )
+        return stream, False
+
+    def _release(self, key: PoolKey, stream: _Stream) -> None:
+        """Returns a connection to the pool and frees its slot."""
+        idle = self.__idle.setdefault(key, [])
+        if len(idle) < self.max_idle_per_host:
+            idle.append(stream)
+        else:
+            stream[1].close()
+        self.__slots.release()
+
+    def _discard(self, stream: _Stream) -> None:
+        """Closes a connection and frees its slot."""
+        stream[1].close()
+        self.__slots.release()
+
+    async def __send(
+        self,
+        key: PoolKey,
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        timeout: float,
+    ) -> AsyncResponse:
+        """
+        Sends a request, retrying once on a fresh connection if a reused one was stale.
+
+        Returns:
+            AsyncResponse: The response with its headers read.
+        """
+        parts = urlsplit(url)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        headers = dict(headers)
+        headers.setdefault("Host", parts.netloc)
+        request = f"{method} {target} HTTP/1.1\r\n" + "".join(
+            f"{name}: {value}\r\n" for name, value in headers.items()
+        )
+        payload = (request + "\r\n").encode("iso-8859-1")
+
+        for attempt in range(2):
+            stream, reused = await self.__connect(key, timeout)
+            response = AsyncResponse(self, key, stream, method, url, timeout)
+            try:
+                stream[1].write(payload)
+                await asyncio.wait_for(stream[1].drain(), timeout)
+                await response._begin()
+                return response
+            except (ConnectionError, http.client.BadStatusLine):
+                stream[1].close()
+                if not reused or attempt:
+                    raise
+            except BaseException:
+                stream[1].close()
+                raise
+
+    async def request(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_redirects: int = 5,
+    ) -> AsyncResponse:
+        """
+        Sends a request, following redirects.
+
+        Error statuses do not raise; callers check getcode().
+
+        Args:
+            url (str): The absolute http(s) URL.
+            method (str, optional): The HTTP method. Defaults to "GET".
+            headers (Dict[str, str], optional): Request headers.
+            timeout (float, optional): Timeout in seconds, defaults to the client timeout.
+            max_redirects (int, optional): Maximum redirects to follow.
+
+        Returns:
+            AsyncResponse: The response; close it to release the connection.
+
+        Raises:
+            ValueError: If the URL is not http(s) or there are too many redirects.
+            http.client.HTTPException, OSError, asyncio.TimeoutError: On network errors.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"Unsupported URL: {url}")
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            key = (parts.scheme, parts.hostname, port)
+
+            if self.__slots is None:
+                self.__slots = asyncio.Semaphore(self.max_connections)
+            await self.__slots.acquire()
+            try:
+                response = await self.__send(key, method, url, headers or {}, timeout)
+            except BaseException:
+                self.__slots.release()
+                raise
+
+            location = response.headers.get("Location")
+            if response.status not in REDIRECT_CODES or not location:
+                return response
+
+            async with response:
+                await response.read()
+            url = urljoin(url, location)
+            if response.status == 303 and method != "HEAD":
+                method = "GET"
+        raise ValueError(f"Too many redirects: {url}")
+
+    async def close(self) -> None:
+        """Closes every idle connection."""
+        for idle in self.__idle.values():
+            for _, writer in idle:
+                writer.close()
+        self.__idle.clear()
+
+    async def __aenter__(self) -> "AsyncHTTPClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
@@ -0,0 +1,421 @@
+import asyncio, os, time
+from uuid import uuid4
+from uqload_dl.async_http import AsyncHTTPClient, AsyncResponse
+from uqload_dl.download_journal import DownloadJournal
+from uqload_dl.extractor import extract_video_data
+from uqload_dl.file_downloader import (
+    JOURNAL_SAVE_INTERVAL,
+    build_headers,
+    find_destination,
+    read_metadata,
+    validate_file_url,
+)
+from uqload_dl.parallel_url_fetcher import PAGE_HEADERS, ContentDecoder
+from uqload_dl.progress_dispatcher import ProgressDispatcher
+from uqload_dl.rate_limiter import get_shared_bucket
+from uqload_dl.utils import (
+    format_embed_url,
+    get_video_id,
+    is_a_callback,
+    is_a_valid_directory,
+    parse_size,
+    remove_special_characters,
+    validate_output_file,
+)
+from typing import Callable, Dict, Optional, Tuple, Union
+
+# Bytes read from the socket per iteration.
+READ_SIZE = 64 * 1024
+
+# Bytes buffered before a write is handed to a worker thread.
+WRITE_SIZE = 1024 * 1024
+
+
+class AsyncFileDownloader:
+    """
+    Downloads a file from a given URL with asyncio.
+
+    The asyncio counterpart of FileDownloader: it writes to the same ".part"
+    file and resume journal, so a download started by one can be resumed by
+    the other. Disk writes are batched and run in a worker thread so they
+    never block the event loop.
+
+    Args:
+        url (str): The URL of the file to download.
+        filename (str, optional): Custom name for the output file.
+        output_dir (str, optional): Directory where file will be saved.
+        on_progress_callback (Callable, optional): Callback for download progress.
+        client (AsyncHTTPClient, optional): Client to send requests with. A
+            private one is created if omitted.
+        rate_limit (int, float, str, optional): Maximum transfer rate in bytes per
+            second, shared by every download of the process.
+        progress_interval (float, optional): Minimum seconds between two calls of
+            on_progress_callback. Defaults to 0.1.
+        resume_key (str, optional): Stable identity of the file, e.g. a video
+            id, that a partial file must match to be resumed. Defaults to the
+            URL path.
+
+    Raises:
+        ValueError: On invalid input arguments.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        filename: str = None,
+        output_dir: str = None,
+        on_progress_callback: Callable = None,
+        client: AsyncHTTPClient = None,
+        rate_limit: Union[int, float, str] = None,
+        progress_interval: float = 0.1,
+        resume_key: Optional[str] = None,
+    ) -> None:
+        self.url = validate_file_url(url)
+        self.headers = build_headers(url)
+        name, self.__extension = os.path.splitext(os.path.basename(url))
+        self.filename = name if filename is None else validate_output_file(filename)
+        self.output_dir = is_a_valid_directory(output_dir)
+        self.on_progress_callback = is_a_callback(on_progress_callback)
+        self.progress_interval = progress_interval
+        self.resume_key = resume_key or self.url
+        self.__rate_limiter = (
+            get_shared_bucket(parse_size(rate_limit)) if rate_limit else None
+        )
+        self.__owns_client = client is None
+        self.client = client or AsyncHTTPClient()
+        self.total_size = None
+        self.type = None
+        self.accepts_ranges = None
+        self.destination = None
+        self.bytes_downloaded = 0
+
+    @property
+    def partial_destination(self) -> str:
+        """Returns the path of the partial file used while downloading."""
+        return f"{self.destination}.part"
+
+    async def aclose(self) -> None:
+        """Closes the idle connections of a private client."""
+        if self.__owns_client:
+            await self.client.close()
+
+    async def fetch_metadata(self) -> None:
+        """
+        Retrieves file metadata (size and type) with a HEAD request.
+
+        Raises:
+            ValueError: On HTTP issues or missing metadata.
+        """
+        try:
+            async with await self.client.request(
+                self.url, method="HEAD", headers=self.headers
+            ) as response:
+                if response.getcode() != 200:
+                    raise ValueError("Received non-200 HTTP response")
+                self.total_size, self.type, self.accepts_ranges = read_metadata(
+                    response.getcode(), response.info()
+                )
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"AsyncFileDownloader error {self.url}: {e}") from e
+
+    async def __open_range(self, start: int, end: int) -> AsyncResponse:
+        """Sends a GET request for an inclusive byte range."""
+        headers = dict(self.headers, Range=f"bytes={start}-{end}")
+        return await self.client.request(self.url, headers=headers)
+
+    async def __probe(self) -> Optional[AsyncResponse]:
+        """
+        Retrieves file metadata with a "Range: bytes=0-0" GET request.
+
+        Returns:
+            The full body response if the server ignores Range, otherwise None.
+
+        Raises:
+            ValueError: On HTTP issues or missing metadata.
+        """
+        response = await self.__open_range(0, 0)
+        try:
+            if response.getcode() not in (200, 206):
+                raise ValueError("file cannot be downloaded")
+            self.total_size, self.type, self.accepts_ranges = read_metadata(
+                response.getcode(), response.info()
+            )
+        except BaseException:
+            await response.close()
+            raise
+
+        if response.getcode() == 200:
+            return response
+        async with response:
+            await response.read()
+        return None
+
+    async def __write_stream(self, response: AsyncResponse, file, offset: int) -> None:
+        """
+        Copies a response body into an open file at offset.
+
+        Reads are gathered in memory up to WRITE_SIZE, then written from a
+        worker thread, so memory stays bounded per download.
+        """
+        pending = bytearray()
+        file.seek(offset)
+        while chunk := await response.read(READ_SIZE):
+            pending += chunk
+            if len(pending) >= WRITE_SIZE:
+                await asyncio.to_thread(file.write, bytes(pending))
+                self.__record(offset, len(pending))
+                offset += len(pending)
+                pending.clear()
+            if self.__rate_limiter:
+                wait = self.__rate_limiter.reserve(len(chunk))
+                if wait:
+                    await asyncio.sleep(wait)
+        if pending:
+            await asyncio.to_thread(file.write, bytes(pending))
+            self.__record(offset, len(pending))
+
+    def __record(self, offset: int, size: int) -> None:
+        """Records written bytes in the journal and notifies progress."""
+        self.bytes_downloaded += size
+        self.__journal.add(offset, offset + size)
+        if time.monotonic() - self.__journal_saved_at > JOURNAL_SAVE_INTERVAL:
+            self.__journal.save()
+            self.__journal_saved_at = time.monotonic()
+        if self.__progress:
+            self.__progress.update(self.bytes_downloaded, self.total_size)
+
+    async def __transfer(self, response: Optional[AsyncResponse]) -> None:
+        """
+        Fetches the missing byte ranges into the partial file.
+
+        Args:
+            response (AsyncResponse, optional): A full body response to use.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+        """
+        mode = "r+b" if os.path.isfile(self.partial_destination) else "wb"
+        with open(self.partial_destination, mode) as file:
+            file.truncate(self.total_size)
+            if response is None and self.accepts_ranges:
+                for start, end in self.__journal.missing_ranges():
+                    response = await self.__open_range(start, end)
+                    async with response:
+                        if response.getcode() == 206:
+                            await self.__write_stream(response, file, start)
+                            continue
+                        if response.getcode() != 200:
+                            raise ValueError("file cannot be downloaded")
+                        await self.__restart(response, file)
+                        break
+            else:
+                if response is None:
+                    response = await self.client.request(
+                        self.url, headers=self.headers
+                    )
+                async with response:
+                    if response.getcode() != 200:
+                        raise ValueError("file cannot be downloaded")
+                    await self.__restart(response, file)
+
+    async def __restart(self, response: AsyncResponse, file) -> None:
+        """Writes a full body response from byte zero, forgetting any progress."""
+        self.__journal.reset()
+        self.bytes_downloaded = 0
+        await self.__write_stream(response, file, 0)
+
+    async def download(self) -> None:
+        """
+        Downloads the file from the URL.
+
+        Like FileDownloader.download(), the metadata comes from a one byte
+        probe, data goes to a ".part" file with a resume journal, and the file
+        is renamed once complete.
+
+        Raises:
+            ValueError: If the file cannot be downloaded or is incomplete.
+        """
+        self.__progress = None
+        if self.on_progress_callback:
+            self.__progress = ProgressDispatcher(
+                self.on_progress_callback, self.progress_interval
+            )
+
+        response = await self.__probe() if self.total_size is None else None
+
+        def can_resume(destination: str) -> bool:
+            journal = f"{destination}.part.json"
+            return DownloadJournal(journal, self.resume_key, self.total_size).loaded
+
+        self.destination = find_destination(
+            self.output_dir, self.filename, self.__extension, can_resume
+        )
+        self.__journal = DownloadJournal(
+            f"{self.partial_destination}.json", self.resume_key, self.total_size
+        )
+        if not os.path.isfile(self.partial_destination):
+            self.__journal.reset()
+        self.__journal_saved_at = time.monotonic()
+        self.bytes_downloaded = self.__journal.completed_bytes
+
+        try:
+            if response is not None or not self.__journal.is_complete:
+                await self.__transfer(response)
+        finally:
+            if self.__progress:
+                self.__progress.flush()
+            if os.path.isfile(self.partial_destination):
+                self.__journal.save()
+
+        if not self.__journal.is_complete:
+            raise ValueError(
+                f"download incomplete ({self.bytes_downloaded} of "
+                f"{self.total_size} bytes), run it again to resume"
+            )
+        os.replace(self.partial_destination, self.destination)
+        self.__journal.delete()
+
+
+class AsyncUQLoad:
+    """
+    Handles video information retrieval and downloading from UQload with asyncio.
+
+    Both pages are fetched concurrently on the event loop instead of one
+    thread per URL. Pass a shared AsyncHTTPClient to drive many instances
+    over the same bounded set of connections.
+
+    Args:
+        url (str): The UQload video URL or ID.
+        output_file (str, optional): Custom name for the output file.
+        output_dir (str, optional): Directory where the video will be saved.
+        on_progress_callback (Callable, optional): A function to report download progress.
+        client (AsyncHTTPClient, optional): Client to send requests with. A
+            private one is created if omitted.
+        rate_limit (Union[int, float, str], optional): Maximum download rate in bytes per second.
+
+    Raises:
+        ValueError: If the URL is invalid.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        output_file: str = None,
+        output_dir: str = None,
+        on_progress_callback: Callable = None,
+        client: AsyncHTTPClient = None,
+        rate_limit: Union[int, float, str] = None,
+    ) -> None:
+        self.__video_info: Dict[str, Union[str, None]] = {}
+        self.url = format_embed_url(url)
+        self.video_id = get_video_id(self.url)
+        self.output_dir = is_a_valid_directory(output_dir)
+        self.output_file = (
+            None if output_file is None else validate_output_file(output_file)
+        )
+        self.on_progress_callback = is_a_callback(on_progress_callback)
+        self.rate_limit = rate_limit
+        self.__owns_client = client is None
+        self.client = client or AsyncHTTPClient()
+        self.__downloader: Optional[AsyncFileDownloader] = None
+
+    async def aclose(self) -> None:
+        """Closes the idle connections of a private client."""
+        if self.__owns_client:
+            await self.client.close()
+
+    async def __aenter__(self) -> "AsyncUQLoad":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.aclose()
+
+    async def __fetch_page(self, url: str) -> Optional[str]:
+        """
+        Fetches a page and returns its text, or None on failure.
+
+        Args:
+            url (str): The page URL.
+
+        Returns:
+            Optional[str]: The page content decompressed and decoded as UTF-8.
+        """
+        try:
+            async with await self.client.request(
+                url, headers=PAGE_HEADERS, timeout=10
+            ) as response:
+                if response.getcode() != 200:
+                    return None
+                content = ContentDecoder(response.info().get("Content-Encoding"))
+                body = content.decompress(await response.read()) + content.flush()
+                return body.decode("utf-8", errors="replace")
+        except Exception as ex:
+            print("ERROR: AsyncUQLoad ", ex)
+            return None
+
+    async def __get_video(self) -> None:
+        """
+        Retrieves video data from UQload and prepares the downloader.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+        """
+        urls = (self.url, self.url.replace("embed-", ""))
+        responses: Tuple[Optional[str], ...] = await asyncio.gather(
+            *(self.__fetch_page(url) for url in urls)
+        )
+        data = extract_video_data(*responses)
+
+        final_title = remove_special_characters(data["title"])
+        if not self.output_file:
+            self.output_file = final_title or uuid4().hex
+
+        self.__downloader = AsyncFileDownloader(
+            url=data["video_url"],
+            filename=self.output_file,
+            output_dir=self.output_dir,
+            on_progress_callback=self.on_progress_callback,
+            client=self.client,
+            rate_limit=self.rate_limit,
+            resume_key=self.video_id,
+        )
+
+        self.__video_info = {
+            "url": data["video_url"],
+            "title": self.output_file,
+            "image_url": data["image_url"],
+            "resolution": data["resolution"],
+            "duration": data["duration"],
+            "size": None,
+            "type": None,
+        }
+
+    async def get_video_info(self) -> Dict[str, str]:
+        """
+        Returns detailed information about the video.
+
+        Returns:
+            Dict[str, Union[str, None]]: A dictionary containing video metadata.
+        """
+        if not self.__video_info:
+            await self.__get_video()
+        if self.__video_info["size"] is None:
+            await self.__downloader.fetch_metadata()
+            self.__video_info["size"] = self.__downloader.total_size
+            self.__video_info["type"] = self.__downloader.type
+        return self.__video_info
+
+    async def download(self) -> str:
+        """
+        Downloads the video to the specified output directory.
+
+        Returns:
+            str: The path of the downloaded file.
+        """
+        if not self.__video_info:
+            await self.__get_video()
+        await self.__downloader.download()
+        return self.__downloader.destination
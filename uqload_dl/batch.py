@@ -0,0 +1,480 @@
+import multiprocessing, os, queue, signal, sys, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import BoundedSemaphore, Lock, Thread
+from urllib.parse import urlsplit
+from uqload_dl.exceptions import VideoNotFound
+from uqload_dl.metadata_cache import MetadataCache
+from uqload_dl.parallel_url_fetcher import ParallelURLFetcher
+from uqload_dl.uqload import UQLoad
+from uqload_dl.utils import (
+    is_a_valid_directory,
+    parse_size,
+    sizeof_fmt,
+)
+from uqload_dl.write_pipeline import DEFAULT_BUFFER_MEMORY
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    Union,
+)
+
+# Seconds between two checks for dead worker processes while feeding jobs.
+POLL_INTERVAL = 0.5
+
+
+def iter_batch_input(
+    urls: Optional[List[str]] = None, input_file: Optional[str] = None
+) -> Iterator[str]:
+    """
+    Yields the URLs or IDs of a batch, one at a time.
+
+    The input file is read line by line, so huge lists use constant memory.
+    Blank lines and lines starting with "#" are ignored.
+
+    Args:
+        urls (List[str], optional): URLs or IDs given directly.
+        input_file (str, optional): Path of a file with one URL or ID per line,
+            or "-" to read from stdin.
+
+    Yields:
+        str: A URL or ID.
+    """
+    for url in urls or []:
+        if url.strip():
+            yield url.strip()
+
+    if input_file is None:
+        return
+
+    file = sys.stdin if input_file == "-" else open(input_file, encoding="utf-8")
+    try:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield line
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+
+class BatchSummary:
+    """
+    Counts the outcome of the jobs of a batch.
+
+    Jobs are "ok" when the video was downloaded, "skipped" when the video
+    was deleted or does not exist, and "failed" otherwise.
+    """
+
+    def __init__(self) -> None:
+        self.ok = 0
+        self.failed = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.__lock = Lock()
+
+    def add(self, status: str, size: int = 0) -> None:
+        """
+        Records the outcome of a job.
+
+        Args:
+            status (str): "ok", "failed" or "skipped".
+            size (int, optional): Bytes of the downloaded file.
+        """
+        with self.__lock:
+            setattr(self, status, getattr(self, status) + 1)
+            self.bytes += size
+
+    @property
+    def total(self) -> int:
+        """Returns the number of finished jobs."""
+        return self.ok + self.failed + self.skipped
+
+    @property
+    def elapsed(self) -> float:
+        """Returns the wall time of the batch in seconds."""
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """Returns the aggregate throughput in bytes per second."""
+        return self.bytes / self.elapsed if self.elapsed else 0.0
+
+    def format(self) -> str:
+        """Returns the summary as printable text."""
+        return (
+            f"jobs: {self.total} (ok: {self.ok}, failed: {self.failed}, "
+            f"skipped: {self.skipped})\n"
+            f"downloaded: {sizeof_fmt(self.bytes)} in {self.elapsed:.1f}s "
+            f"({sizeof_fmt(self.throughput)}/s)"
+        )
+
+
+class BatchDownloader:
+    """
+    Downloads many videos with bounded concurrency.
+
+    Jobs are dispatched to a pool of worker threads. At most `concurrency`
+    jobs run at once. At most `per_host` of them fetch the pages of the same
+    Uqload host, and at most `per_host` download from the same video host:
+    a job holds a page slot while its video is resolved and a slot of the
+    video host during the transfer. Inputs are pulled lazily, so only the
+    running jobs are held in memory.
+
+    Args:
+        concurrency (int, optional): Maximum jobs running at the same time.
+        per_host (int, optional): Maximum jobs fetching pages from, or
+            downloading from, the same host.
+        output_dir (str, optional): Directory where the videos will be saved.
+        connections (int, optional): Connections used by each download.
+        rate_limit (Union[int, float, str], optional): Maximum aggregate download rate.
+        cache (MetadataCache, optional): Cache where resolved videos are recorded.
+        mirrors (Sequence[str], optional): Uqload domains raced for each embed page.
+        on_metrics_callback (Callable, optional): Called with the metrics of
+            every job, e.g. a JsonLinesExporter. Must be thread-safe.
+        sink (str, optional): How each video file is written.
+        fsync (str, optional): When each video is forced to disk.
+        buffer_memory (Union[int, str], optional): Write buffer ceiling of each
+            download.
+
+    Raises:
+        ValueError: On invalid arguments.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        per_host: int = 2,
+        output_dir: str = None,
+        connections: int = 1,
+        rate_limit: Union[int, float, str] = None,
+        cache: Optional[MetadataCache] = None,
+        mirrors: Optional[Sequence[str]] = None,
+        on_metrics_callback: Optional[Callable] = None,
+        sink: str = "pwrite",
+        fsync: str = "complete",
+        buffer_memory: Union[int, str] = DEFAULT_BUFFER_MEMORY,
+    ) -> None:
+        if type(concurrency) is not int or concurrency < 1:
+            raise ValueError("concurrency must be a positive integer")
+        if type(per_host) is not int or per_host < 1:
+            raise ValueError("per_host must be a positive integer")
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.output_dir = is_a_valid_directory(output_dir)
+        self.connections = connections
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.mirrors = mirrors
+        self.on_metrics_callback = on_metrics_callback
+        self.sink = sink
+        self.fsync = fsync
+        self.buffer_memory = buffer_memory
+        self.__fetcher = ParallelURLFetcher()
+        self.__host_slots: Dict[str, BoundedSemaphore] = {}
+        self.__lock = Lock()
+
+    @contextmanager
+    def __host_slot(self, host: str):
+        """Holds one of the per-host slots of a host."""
+        with self.__lock:
+            slot = self.__host_slots.setdefault(host, BoundedSemaphore(self.per_host))
+        with slot:
+            yield
+
+    def _download(self, url: str) -> Optional[str]:
+        """
+        Downloads one video.
+
+        Args:
+            url (str): The video URL or ID.
+
+        Returns:
+            Optional[str]: The path of the downloaded file, or None.
+        """
+        uqload = UQLoad(
+            url=url,
+            output_dir=self.output_dir,
+            connections=self.connections,
+            rate_limit=self.rate_limit,
+            cache=self.cache,
+            fetcher=self.__fetcher,
+            mirrors=self.mirrors,
+            on_metrics_callback=self.on_metrics_callback,
+            sink=self.sink,
+            fsync=self.fsync,
+            buffer_memory=self.buffer_memory,
+        )
+        with self.__host_slot(urlsplit(uqload.url).hostname):
+            video_url = uqload.get_video_url()
+        with self.__host_slot(urlsplit(video_url).hostname):
+            uqload.download()
+        return uqload.destination
+
+    def __run_job(self, url: str, summary: BatchSummary) -> None:
+        """Runs one job and records its outcome."""
+        try:
+            destination = self._download(url)
+            size = os.path.getsize(destination)
+            summary.add("ok", size)
+            print(f"[ok] {url} -> {destination} ({sizeof_fmt(size)})")
+        except VideoNotFound as ex:
+            summary.add("skipped")
+            print(f"[skipped] {url}: {ex}")
+        except Exception as ex:
+            summary.add("failed")
+            print(f"[failed] {url}: {ex}")
+
+    def run(
+        self, urls: Iterable[str], summary: Optional[BatchSummary] = None
+    ) -> BatchSummary:
+        """
+        Downloads every video of the batch.
+
+        Args:
+            urls (Iterable[str]): The video URLs or IDs, consumed lazily.
+            summary (BatchSummary, optional): Where the outcomes are recorded.
+                Defaults to a new summary.
+
+        Returns:
+            BatchSummary: The outcome of the batch.
+        """
+        summary = summary or BatchSummary()
+        in_flight = BoundedSemaphore(self.concurrency)
+
+        def job(url: str) -> None:
+            try:
+                self.__run_job(url, summary)
+            finally:
+                in_flight.release()
+
+        executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        try:
+            for url in urls:
+                in_flight.acquire()
+                executor.submit(job, url)
+        except BaseException:
+            # Jobs not started yet are dropped; running ones are let to finish.
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+        executor.shutdown(wait=True)
+        summary.finished_at = time.monotonic()
+        return summary
+
+
+# Queues of the worker process, set by __init_worker.
+_jobs: Optional["multiprocessing.Queue"] = None
+_events: Optional["multiprocessing.Queue"] = None
+
+
+class _ForwardingSummary(BatchSummary):
+    """A summary that also sends each outcome to the parent process."""
+
+    def add(self, status: str, size: int = 0) -> None:
+        super().add(status, size)
+        _events.put(("result", status, size))
+
+
+def _init_worker(jobs: "multiprocessing.Queue", events: "multiprocessing.Queue"):
+    """Keeps the queues of a worker process. Ctrl-C is left to the parent."""
+    global _jobs, _events
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _jobs, _events = jobs, events
+
+
+def _run_worker(
+    worker_class: Type[BatchDownloader],
+    options: Dict[str, Any],
+    cache_options: Optional[tuple],
+    forward_metrics: bool,
+) -> None:
+    """
+    Runs a batch over the shared job queue, inside a worker process.
+
+    Args:
+        worker_class (Type[BatchDownloader]): The batch class run by the worker.
+        options (Dict[str, Any]): Its constructor arguments.
+        cache_options (tuple, optional): Path and TTLs of the metadata cache.
+        forward_metrics (bool): Send the metrics of each job to the parent.
+    """
+    batch = worker_class(
+        cache=MetadataCache(*cache_options) if cache_options else None,
+        on_metrics_callback=(
+            (lambda metrics: _events.put(("metrics", metrics)))
+            if forward_metrics
+            else None
+        ),
+        **options,
+    )
+    batch.run(iter(_jobs.get, None), _ForwardingSummary())
+    # A worker that raised is accounted for by the parent instead.
+    _events.put(("exit",))
+
+
+class ProcessBatchDownloader(BatchDownloader):
+    """
+    Downloads many videos over several processes.
+
+    A single process tops out at one core of TLS decryption and per-chunk
+    work. This batch shards the jobs across a ProcessPoolExecutor: each
+    worker process runs its own BatchDownloader, with its own `concurrency`
+    and `per_host` limits, and pulls jobs from a shared bounded queue, so
+    busy workers take fewer jobs. Outcomes and metrics come back to the
+    parent over a queue, where the summary is kept and on_metrics_callback
+    is called.
+
+    The rate limit is split evenly between the processes. On Ctrl-C, jobs
+    not started yet are dropped and running ones are let to finish.
+
+    Args:
+        processes (int, optional): Worker processes. Defaults to the number
+            of CPUs.
+        **kwargs: The arguments of BatchDownloader, applied per process.
+
+    Raises:
+        ValueError: On invalid arguments.
+    """
+
+    # The batch class run inside each worker process.
+    worker_class: Type[BatchDownloader] = BatchDownloader
+
+    def __init__(self, processes: Optional[int] = None, **kwargs) -> None:
+        super().__init__(**kwargs)
+        if processes is None:
+            processes = os.cpu_count() or 1
+        if type(processes) is not int or processes < 1:
+            raise ValueError("processes must be a positive integer")
+        self.processes = processes
+
+    def __worker_options(self) -> Dict[str, Any]:
+        """Returns the constructor arguments of the batch of each worker."""
+        rate_limit = self.rate_limit
+        if rate_limit:
+            rate_limit = parse_size(rate_limit) / self.processes
+        return {
+            "concurrency": self.concurrency,
+            "per_host": self.per_host,
+            "output_dir": self.output_dir,
+            "connections": self.connections,
+            "rate_limit": rate_limit,
+            "mirrors": self.mirrors,
+            "sink": self.sink,
+            "fsync": self.fsync,
+            "buffer_memory": self.buffer_memory,
+        }
+
+    def __consume(self, events: "multiprocessing.Queue", summary: BatchSummary):
+        """Records the events of the workers until every worker has exited."""
+        exited = 0
+        while exited < self.processes:
+            kind, *payload = events.get()
+            if kind == "result":
+                summary.add(*payload)
+            elif kind == "metrics":
+                try:
+                    self.on_metrics_callback(payload[0])
+                except Exception as ex:
+                    print(f"metrics callback failed: {ex}")
+            else:
+                exited += 1
+
+    def __feed(self, jobs: "multiprocessing.Queue", url: str, futures) -> None:
+        """Queues a job, raising if a worker process died meanwhile."""
+        while True:
+            try:
+                jobs.put(url, timeout=POLL_INTERVAL)
+                return
+            except queue.Full:
+                for future in futures:
+                    if future.done():
+                        future.result()
+
+    def __stop(self, jobs: "multiprocessing.Queue", futures) -> None:
+        """Queues an end marker for each running worker, unless all of them died."""
+        markers = sum(not future.done() for future in futures)
+        while markers:
+            try:
+                jobs.put(None, timeout=POLL_INTERVAL)
+                markers -= 1
+            except queue.Full:
+                # Running workers drain the queue; dead ones never will.
+                if all(future.done() for future in futures):
+                    return
+
+    def run(
+        self, urls: Iterable[str], summary: Optional[BatchSummary] = None
+    ) -> BatchSummary:
+        """
+        Downloads every video of the batch.
+
+        Args:
+            urls (Iterable[str]): The video URLs or IDs, consumed lazily.
+            summary (BatchSummary, optional): Where the outcomes are recorded.
+                Defaults to a new summary.
+
+        Returns:
+            BatchSummary: The outcome of the batch.
+
+        Raises:
+            BrokenProcessPool: If a worker process died.
+        """
+        summary = summary or BatchSummary()
+        context = multiprocessing.get_context("spawn")
+        jobs = context.Queue(maxsize=self.processes * self.concurrency)
+        events = context.Queue()
+        consumer = Thread(target=self.__consume, args=(events, summary), daemon=True)
+        consumer.start()
+        cache_options = None
+        if self.cache is not None:
+            cache = self.cache
+            cache_options = (cache.path, cache.ttl, cache.negative_ttl)
+
+        with ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(jobs, events),
+        ) as executor:
+            futures = [
+                executor.submit(
+                    _run_worker,
+                    self.worker_class,
+                    self.__worker_options(),
+                    cache_options,
+                    self.on_metrics_callback is not None,
+                )
+                for _ in range(self.processes)
+            ]
+            try:
+                for url in urls:
+                    self.__feed(jobs, url, futures)
+            except BaseException:
+                # Jobs not started yet are dropped; running ones are let to finish.
+                try:
+                    while True:
+                        jobs.get_nowait()
+                except queue.Empty:
+                    pass
+                raise
+            finally:
+                self.__stop(jobs, futures)
+                for future in futures:
+                    if future.exception() is not None:
+                        # A failed worker never says it exited.
+                        events.put(("exit",))
+                consumer.join()
+
+        for future in futures:
+            # A worker that died once every job was queued.
+            future.result()
+        summary.finished_at = time.monotonic()
+        return summary
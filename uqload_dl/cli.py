@@ -1,10 +1,15 @@
-import argparse
+import argparse, math, os, sys
+from contextlib import redirect_stdout
+from uqload_dl.constants import DEFAULT_MIRRORS, FSYNC_POLICIES, SINK_NAMES
 from uqload_dl.progress_bar import ProgressBar
 from uqload_dl.version import __version__
-from uqload_dl.uqload import UQLoad
-from typing import Dict
+from typing import Callable, Dict, List, Optional, Tuple
 from uqload_dl.utils import sizeof_fmt
 
+# The download stack (UQLoad, the HTTP pool, the batch executors, the cache
+# and the exporters) is imported inside the functions that use it, so that
+# --help, --version and argument errors exit without loading it.
+
 
 def print_video_info(video_info: Dict[str, str]) -> None:
     """
@@ -25,20 +30,340 @@ def print_video_info(video_info: Dict[str, str]) -> None:
     print("-" * bar_length)
 
     for key, value in video_info.items():
-        row = f"{key} : {sizeof_fmt(value)}" if key == "size" else f"{key} : {value}"
-        print(f"{row}")
+        if key == "size":
+            value = sizeof_fmt(value)
+        elif key == "bitrate" and value:
+            value = f"{value / 1000:.0f} kb/s"
+        print(f"{key} : {value}")
 
     print("-" * bar_length)
 
 
-def main() -> None:
-    """Main function."""
+def make_progress_callback() -> Callable[[int, int], None]:
+    """
+    Creates a progress callback that draws a single progress bar.
+
+    Returns:
+        Callable[[int, int], None]: A callback taking (downloaded, total).
+    """
+    progress_bar = None
+
+    def on_progress(downloaded: int, total: int) -> None:
+        nonlocal progress_bar
+        if progress_bar is None or progress_bar.total != total:
+            progress_bar = ProgressBar(total)
+        progress_bar.update(downloaded)
+
+    return on_progress
+
+
+def parse_mirrors(mirrors: Optional[str]) -> Optional[List[str]]:
+    """
+    Splits the comma-separated mirrors given on the command line.
+
+    Args:
+        mirrors (str, optional): e.g. "uqload.cx,uqload.io".
+
+    Returns:
+        Optional[List[str]]: The mirror domains, or None when mirror mode is off.
+    """
+    if not mirrors:
+        return None
+    return [mirror for mirror in mirrors.split(",") if mirror.strip()]
+
+
+def parse_time(value: str) -> float:
+    """
+    Parses a time given as seconds or as [hh:]mm:ss[.ms].
+
+    Args:
+        value (str): e.g. "90", "1:30" or "00:01:30.5".
+
+    Returns:
+        float: The time in seconds.
+
+    Raises:
+        argparse.ArgumentTypeError: If the time is invalid.
+    """
+    parts = value.strip().split(":")
+    try:
+        if len(parts) > 3 or not all(parts):
+            raise ValueError
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time: {value}")
+    if not math.isfinite(seconds) or seconds < 0:
+        raise argparse.ArgumentTypeError(f"invalid time: {value}")
+    return seconds
+
+
+def parse_clip(value: str) -> Tuple[float, float]:
+    """
+    Parses the START-END interval of --clip.
+
+    Args:
+        value (str): e.g. "1:30-2:00" or "90-120".
+
+    Returns:
+        Tuple[float, float]: The start and end times, in seconds.
+
+    Raises:
+        argparse.ArgumentTypeError: If the interval is invalid.
+    """
+    try:
+        start, end = value.split("-")
+        start, end = parse_time(start), parse_time(end)
+    except (ValueError, argparse.ArgumentTypeError):
+        raise argparse.ArgumentTypeError(f"invalid clip {value!r}, use START-END")
+    if end <= start:
+        raise argparse.ArgumentTypeError("the clip must end after it starts")
+    return start, end
+
+
+def make_metrics_callback(
+    args: argparse.Namespace,
+) -> Optional[Callable[[Dict], None]]:
+    """
+    Creates the metrics exporters asked for on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        Optional[Callable[[Dict], None]]: A callback feeding every exporter, or
+        None if no exporter was asked for.
+    """
+    from uqload_dl.metrics import JsonLinesExporter, PrometheusTextfileExporter
+
+    exporters = []
+    if args.metrics_jsonl:
+        exporters.append(JsonLinesExporter(args.metrics_jsonl))
+    if args.metrics_prom:
+        exporters.append(PrometheusTextfileExporter(args.metrics_prom))
+    if not exporters:
+        return None
+
+    def on_metrics(metrics: Dict) -> None:
+        for exporter in exporters:
+            exporter(metrics)
+
+    return on_metrics
+
+
+def run_batch(args: argparse.Namespace) -> int:
+    """
+    Downloads every video given with -u or --input-file and prints a summary.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        int: The exit code, non-zero if any download failed.
+    """
+    from uqload_dl.batch import (
+        BatchDownloader,
+        ProcessBatchDownloader,
+        iter_batch_input,
+    )
+    from uqload_dl.metadata_cache import MetadataCache
+
+    options = dict(
+        concurrency=args.jobs,
+        per_host=args.per_host,
+        output_dir=args.outdir,
+        connections=args.connections,
+        rate_limit=args.rate_limit,
+        cache=None if args.no_cache else MetadataCache(),
+        mirrors=parse_mirrors(args.mirrors),
+        on_metrics_callback=make_metrics_callback(args),
+        sink=args.sink,
+        fsync=args.fsync,
+        buffer_memory=args.buffer_memory,
+    )
+    if args.processes > 1:
+        batch = ProcessBatchDownloader(processes=args.processes, **options)
+    else:
+        batch = BatchDownloader(**options)
+    try:
+        summary = batch.run(iter_batch_input(args.url, args.input_file))
+    except KeyboardInterrupt:
+        print("\nBatch cancelled by user.")
+        return 130
+
+    print("-" * 60)
+    print(summary.format())
+    return 1 if summary.failed else 0
+
+
+def stream_to_stdout(args: argparse.Namespace) -> int:
+    """
+    Streams one video to stdout, for pipes into ffmpeg and the like.
+
+    Nothing is written to disk. Messages and the progress bar go to stderr
+    so they do not mix with the video.
+
+    Args:
+        args (argparse.Namespace): The parsed command line arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    from uqload_dl.exceptions import DownloadError
+    from uqload_dl.metadata_cache import MetadataCache
+    from uqload_dl.uqload import UQLoad
+
+    output = sys.stdout.buffer
+    with redirect_stdout(sys.stderr):
+        try:
+            UQLoad(
+                url=args.url[0],
+                on_progress_callback=make_progress_callback(),
+                rate_limit=args.rate_limit,
+                cache=None if args.no_cache else MetadataCache(),
+                mirrors=parse_mirrors(args.mirrors),
+                on_metrics_callback=make_metrics_callback(args),
+                buffer_memory=args.buffer_memory,
+                # The title names files only, so the video page is not needed.
+                video_page=False,
+            ).stream_to(output)
+        except KeyboardInterrupt:
+            print("\nDownload cancelled by user.")
+            return 130
+        except DownloadError as ex:
+            if isinstance(ex.__cause__, BrokenPipeError):
+                # The reader went away: keep Python from failing to flush at exit.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), output.fileno())
+            print(str(ex).upper())
+            return 1
+        except Exception as ex:
+            print(str(ex).upper())
+            return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Main function.
+
+    Args:
+        argv (List[str], optional): Command line arguments, defaults to sys.argv.
+
+    Returns:
+        int: The exit code.
+    """
     parser = argparse.ArgumentParser(
         description="Simple script to download video from Uqload"
     )
-    parser.add_argument("-u", "--url", required=True, help="The url or id of the video")
-    parser.add_argument("-o", "--outdir", help="Folder where the file will be saved")
+    parser.add_argument(
+        "-u",
+        "--url",
+        action="append",
+        help="The url or id of the video, repeat it to download several videos",
+    )
+    parser.add_argument(
+        "-i",
+        "--input-file",
+        help="File with one url or id per line to download in batch, - for stdin",
+    )
+    parser.add_argument(
+        "-o",
+        "--outdir",
+        help="Folder where the file will be saved, - to stream the video to stdout",
+    )
     parser.add_argument("-n", "--name", help="Video name")
+    parser.add_argument(
+        "-c",
+        "--connections",
+        type=int,
+        default=1,
+        help="Number of parallel connections used to download the video",
+    )
+    parser.add_argument(
+        "-r",
+        "--rate-limit",
+        help="Maximum download rate in bytes per second, e.g. 500K or 2M",
+    )
+    parser.add_argument(
+        "--sink",
+        choices=SINK_NAMES,
+        default="pwrite",
+        help="How the video file is written, preallocated in every case "
+        "(default: pwrite)",
+    )
+    parser.add_argument(
+        "--fsync",
+        choices=FSYNC_POLICIES,
+        default="complete",
+        help="Force the data to disk once complete, also periodically while "
+        "downloading, or never (default: complete)",
+    )
+    parser.add_argument(
+        "--buffer-memory",
+        default="16M",
+        help="Memory for data read but not yet written to disk, the network "
+        "reads wait beyond it (default: 16M)",
+    )
+    parser.add_argument(
+        "--clip",
+        metavar="START-END",
+        type=parse_clip,
+        help="Download only this part of the video, e.g. 1:30-2:00, from the "
+        "keyframe at or before START",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=4,
+        help="Maximum videos downloaded at the same time in batch mode",
+    )
+    parser.add_argument(
+        "--per-host",
+        type=int,
+        default=2,
+        help="Maximum videos resolved or downloaded from the same host in batch mode",
+    )
+    parser.add_argument(
+        "-p",
+        "--processes",
+        type=int,
+        default=1,
+        help="Worker processes of the batch mode, each running --jobs downloads "
+        "(default: 1)",
+    )
+    parser.add_argument(
+        "-m",
+        "--mirrors",
+        nargs="?",
+        const=",".join(DEFAULT_MIRRORS),
+        help="Race the embed page across Uqload mirrors, e.g. uqload.cx,uqload.io "
+        f"(defaults to {', '.join(DEFAULT_MIRRORS)})",
+    )
+    parser.add_argument(
+        "--no-video-page",
+        action="store_true",
+        help="Resolve the video from the embed page alone, skipping the video "
+        "page and its title",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the cache of resolved videos",
+    )
+    parser.add_argument(
+        "--metrics-jsonl",
+        metavar="FILE",
+        help="Append the timings, bytes, retries and status of each download "
+        "to FILE as JSON lines",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        metavar="FILE",
+        help="Write per-phase histograms of the downloads to FILE, a Prometheus "
+        "textfile. The totals already in FILE are carried on",
+    )
     parser.add_argument(
         "-y",
         "--yes",
@@ -49,40 +374,77 @@ def main() -> None:
         "-v", "--version", action="version", version="%(prog)s " + __version__
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if args.clip and (
+        args.input_file or (args.url and len(args.url) > 1) or args.outdir == "-"
+    ):
+        print("A clip is downloaded from a single video to a file.", file=sys.stderr)
+        return 2
+
+    if args.input_file or (args.url and len(args.url) > 1):
+        if args.outdir == "-":
+            print("Only one video can be streamed to stdout.", file=sys.stderr)
+            return 2
+        return run_batch(args)
+
+    if args.url and args.outdir == "-":
+        return stream_to_stdout(args)
 
     try:
         if args.url:
+            from uqload_dl.metadata_cache import MetadataCache
+            from uqload_dl.uqload import UQLoad
+
             uqload_instance = UQLoad(
-                url=args.url,
+                url=args.url[0],
                 output_file=args.name,
                 output_dir=args.outdir,
-                on_progress_callback=lambda downloaded, total: ProgressBar(
-                    total
-                ).update(downloaded),
+                on_progress_callback=make_progress_callback(),
+                connections=args.connections,
+                rate_limit=args.rate_limit,
+                cache=None if args.no_cache else MetadataCache(),
+                mirrors=parse_mirrors(args.mirrors),
+                on_metrics_callback=make_metrics_callback(args),
+                sink=args.sink,
+                fsync=args.fsync,
+                buffer_memory=args.buffer_memory,
+                video_page=not args.no_video_page,
             )
 
+            def download() -> None:
+                if args.clip:
+                    uqload_instance.download_clip(*args.clip)
+                else:
+                    uqload_instance.download()
+
             print_video_info(uqload_instance.get_video_info())
             print()
 
             if not args.yes:
                 a = input(f"Do you want to download the video? (yes/[no]): ")
                 if a.lower() == "yes" or a.lower() == "y":
-                    uqload_instance.download()
+                    download()
                     print("The video has been downloaded successfully")
                 else:
                     print(f"The download has been cancelled")
             else:
-                uqload_instance.download()
+                download()
                 print("The video has been downloaded successfully")
         else:
             print("No action specified. Use -h or --help for available options.")
+            return 2
+    except KeyboardInterrupt:
+        print("\nDownload cancelled by user.")
+        return 130
     except Exception as ex:
         print(str(ex).upper())
+        return 1
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 # https://uqload.io/embed-0zmi1ulf0d60.html
 # https://uqload.io/embed-h63yfu9dkw1r.html
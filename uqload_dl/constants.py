@@ -0,0 +1,14 @@
+# Option values shared by the command line and the download stack. This module
+# imports nothing, so the CLI can build its arguments without loading the
+# modules that use them.
+
+# Output backends of FileDownloader, see file_sink.SINKS.
+SINK_NAMES = ("pwrite", "mmap", "buffered")
+
+# When the data of the partial file is forced to disk: never, once before the
+# file is renamed, or also each time the resume journal is saved, so the journal
+# never records ranges that a crash could lose.
+FSYNC_POLICIES = ("never", "complete", "periodic")
+
+# Uqload domains raced by default in mirror mode.
+DEFAULT_MIRRORS = ("uqload.cx", "uqload.io", "uqload.co", "uqload.net")
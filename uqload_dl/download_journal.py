@@ -0,0 +1,150 @@
+import json, os
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+
+def resume_key(identity: str) -> str:
+    """
+    Returns the identity a journal is matched on.
+
+    A URL is reduced to its path: the signed query and the CDN host of a
+    video link may change each time the same video is resolved.
+
+    Args:
+        identity (str): A URL, or a stable identity such as a video id.
+
+    Returns:
+        str: The identity to record in the journal.
+    """
+    parsed = urlparse(identity)
+    return parsed.path if parsed.scheme and parsed.netloc else identity
+
+
+class DownloadJournal:
+    """
+    Keeps track of the byte ranges already written to a partial file.
+
+    The journal is stored as a small JSON sidecar next to the ".part" file so an
+    interrupted download can be resumed from the recorded ranges.
+
+    Args:
+        path (str): Path of the JSON sidecar file.
+        key (str): Identity of the file being downloaded: its URL, or a
+            stable id such as the video id (see resume_key).
+        total_size (int): Expected size of the complete file.
+    """
+
+    def __init__(self, path: str, key: str, total_size: int) -> None:
+        self.path = path
+        self.key = resume_key(key)
+        self.total_size = total_size
+        # True once a journal of this very file has been read from disk.
+        self.loaded = False
+        self.__ranges: List[List[int]] = self.__load()
+
+    def __load(self) -> List[List[int]]:
+        """
+        Loads the completed ranges recorded on disk.
+
+        A journal written for another file, or for a file of a different
+        size, is ignored, since the partial data does not belong to this one.
+
+        Returns:
+            List[List[int]]: The completed [start, end) ranges.
+        """
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("key") != self.key or data.get("total_size") != self.total_size:
+                return []
+            ranges = [
+                [int(start), int(end)]
+                for start, end in data.get("ranges", [])
+                if 0 <= int(start) < int(end) <= self.total_size
+            ]
+            self.loaded = True
+            return ranges
+        except (OSError, ValueError, TypeError, AttributeError):
+            return []
+
+    @property
+    def completed_bytes(self) -> int:
+        """Returns the number of bytes already written."""
+        return sum(end - start for start, end in self.__ranges)
+
+    @property
+    def is_complete(self) -> bool:
+        """Returns True if every byte of the file has been written."""
+        return self.completed_bytes == self.total_size
+
+    def add(self, start: int, end: int) -> None:
+        """
+        Records the [start, end) range as written, merging adjacent ranges.
+
+        Args:
+            start (int): First byte written.
+            end (int): One past the last byte written.
+        """
+        ranges = []
+        for current in self.__ranges:
+            if current[1] < start or current[0] > end:
+                ranges.append(current)
+            else:
+                start, end = min(start, current[0]), max(end, current[1])
+        ranges.append([start, end])
+        self.__ranges = sorted(ranges)
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        """
+        Returns the gaps that still need to be downloaded.
+
+        Returns:
+            List[Tuple[int, int]]: The missing inclusive (start, end) byte ranges.
+        """
+        missing, position = [], 0
+        for start, end in self.__ranges:
+            if start > position:
+                missing.append((position, start - 1))
+            position = max(position, end)
+        if position < self.total_size:
+            missing.append((position, self.total_size - 1))
+        return missing
+
+    def first_missing(self, start: int, end: int) -> Optional[int]:
+        """
+        Returns the first byte of an inclusive range that is not written yet.
+
+        Args:
+            start (int): First byte of the range.
+            end (int): Last byte of the range.
+
+        Returns:
+            Optional[int]: The first missing byte, or None if the range is complete.
+        """
+        for current_start, current_end in self.__ranges:
+            if current_start <= start < current_end:
+                start = current_end
+        return start if start <= end else None
+
+    def reset(self) -> None:
+        """Forgets every recorded range."""
+        self.__ranges = []
+
+    def save(self) -> None:
+        """Atomically writes the journal to disk."""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "key": self.key,
+                    "total_size": self.total_size,
+                    "ranges": self.__ranges,
+                },
+                file,
+            )
+        os.replace(temp_path, self.path)
+
+    def delete(self) -> None:
+        """Deletes the journal file if it exists."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -1,2 +1,23 @@
 class VideoNotFound(Exception):
     pass
+
+
+class DownloadError(Exception):
+    """
+    Raised when a download stops before the file is complete.
+
+    The partial file and its journal are kept, so running the download again
+    resumes it.
+
+    Args:
+        message (str): What went wrong.
+        bytes_downloaded (int, optional): Bytes of the file written so far.
+        total_size (int, optional): Expected size of the file.
+    """
+
+    def __init__(
+        self, message: str, bytes_downloaded: int = 0, total_size: int = None
+    ) -> None:
+        super().__init__(message)
+        self.bytes_downloaded = bytes_downloaded
+        self.total_size = total_size
@@ -0,0 +1,207 @@
+import re
+from uqload_dl.exceptions import VideoNotFound
+from uqload_dl.utils import remove_special_characters
+from typing import Dict, List, Optional, Pattern, Sequence
+
+# A URL runs until whitespace, a quote or a tag delimiter, so a match can
+# never run across attributes or backtrack over the rest of a minified line.
+_URL = r"https?://[^\s\"'<>]+"
+_VIDEO_URL = _URL + r"/v\.mp4"
+_IMAGE_URL = _URL + r"?\.jpg"
+_TITLE = r'title:\s*"(?P<title>[^"]+)"'
+_DELETED = r"File was deleted"
+_ERROR_CLASS = r"class\s*=\s*['\"]err['\"]"
+_RESOLUTION = r"\[(\d+x\d+)\, ((?:\d+:)*\d+)\]"
+
+# Embed page: the video and thumbnail links and the player title.
+VIDEO_URL_PATTERN = re.compile(_VIDEO_URL)
+IMAGE_URL_PATTERN = re.compile(_IMAGE_URL)
+TITLE_PATTERN = re.compile(_TITLE)
+DELETED_PATTERN = re.compile(_DELETED)
+
+# Plain page: the error notice, and the "[1920x1080, 01:23]" share text.
+ERROR_CLASS_PATTERN = re.compile(_ERROR_CLASS)
+RESOLUTION_PATTERN = re.compile(_RESOLUTION)
+
+# Every field of a page in one alternation, so each page is scanned once. Each
+# branch starts with a literal, and links are matched as whole URL tokens
+# that are classified afterwards, which keeps the scan close to the speed of a
+# plain substring search.
+EMBED_PAGE_PATTERN = re.compile(f"(?P<url>{_URL})|{_TITLE}|(?P<deleted>{_DELETED})")
+VIDEO_PAGE_PATTERN = re.compile(
+    r"<(?:h1[^>]*>(?P<h1>.*?)</h1>|textarea[^>]*>(?P<textarea>.*?)</textarea>)"
+    f"|(?P<error>{_ERROR_CLASS})",
+    re.DOTALL,
+)
+
+
+def is_embed_page(text: str) -> bool:
+    """
+    Tells whether a page is a real embed page, with a video or a deleted notice.
+
+    Args:
+        text (str): The page, or the part of it read.
+
+    Returns:
+        bool: False for error pages, parked domains and the like.
+    """
+    return bool(VIDEO_URL_PATTERN.search(text) or DELETED_PATTERN.search(text))
+
+
+def extract_video_data(
+    embed_page: Optional[str], page: Optional[str]
+) -> Dict[str, Optional[str]]:
+    """
+    Extracts the video data from the embed page and the plain page.
+
+    Each page is scanned once with a precompiled pattern and the first match
+    of every field wins. The embed page scan stops as soon as the video link,
+    thumbnail and title are known.
+
+    Args:
+        embed_page (Optional[str]): HTML of the embed page.
+        page (Optional[str]): HTML of the plain (non-embed) page, optional.
+
+    Returns:
+        Dict[str, Optional[str]]: The video_url, image_url, title, resolution
+        and duration. Image, resolution and duration may be None.
+
+    Raises:
+        ValueError: If network content is missing.
+        VideoNotFound: If the video has been deleted or not found.
+    """
+    if embed_page is None:
+        raise ValueError("No content")
+
+    video_url = image_url = title = None
+    for match in EMBED_PAGE_PATTERN.finditer(embed_page):
+        if match.lastgroup == "deleted":
+            raise VideoNotFound("The video has been deleted or does not exist")
+        if match.lastgroup == "title":
+            title = title or match.group("title")
+        else:
+            url = match.group("url")
+            if video_url is None and "/v.mp4" in url:
+                video_url = url[: url.rindex("/v.mp4") + len("/v.mp4")]
+            if image_url is None and ".jpg" in url:
+                image_url = url[: url.index(".jpg") + len(".jpg")]
+        if video_url and image_url and title:
+            break
+
+    if video_url is None:
+        raise VideoNotFound("The video has been deleted or does not exist")
+
+    # NOTE: sometimes the duration and resolution may not be available.
+
+    title = title or "video"
+    heading = resolution = duration = None
+    for match in VIDEO_PAGE_PATTERN.finditer(page or ""):
+        # The error class may also sit in the attributes of a heading or textarea.
+        if match.lastgroup == "error" or ERROR_CLASS_PATTERN.search(match.group()):
+            heading = resolution = duration = None
+            break
+        if match.lastgroup == "h1" and heading is None:
+            heading = match.group("h1")
+        elif match.lastgroup == "textarea" and resolution is None:
+            share = RESOLUTION_PATTERN.search(match.group("textarea"))
+            if share:
+                resolution, duration = share.groups()
+
+    if heading is not None:
+        title = remove_special_characters(" ".join(heading.split()))
+
+    return {
+        "video_url": video_url,
+        "image_url": image_url,
+        "title": title,
+        "resolution": resolution,
+        "duration": duration,
+    }
+
+
+class PageScanner:
+    """
+    Accumulates a page while it is downloaded and tells when to stop reading.
+
+    Text is fed in chunks as it arrives. Only complete lines are scanned, so a
+    greedy match cannot be cut short by a chunk boundary, and each line is
+    scanned once, so a large page costs one pass: patterns must match within
+    a line. Reading can stop once every required pattern has matched or any
+    terminal pattern has, and the text read so far then extracts the same
+    data as the whole page. Without required patterns, only a terminal pattern
+    stops the reading.
+
+    Args:
+        required (Sequence[Pattern[str]]): Patterns that must all match.
+        terminal (Sequence[Pattern[str]], optional): Patterns that end the scan
+            on their own, e.g. an error marker.
+    """
+
+    def __init__(
+        self,
+        required: Sequence[Pattern[str]],
+        terminal: Sequence[Pattern[str]] = (),
+    ) -> None:
+        self.__required = list(required)
+        self.__terminal = list(terminal)
+        self.reset()
+
+    def reset(self) -> None:
+        """Forgets the text fed so far, e.g. before the page is fetched again."""
+        self.__pending = list(self.__required)
+        # The complete lines scanned, then the chunks of the line not ended yet.
+        self.__lines: List[str] = []
+        self.__partial: List[str] = []
+        self.done = False
+
+    @property
+    def text(self) -> str:
+        """Returns the text fed so far."""
+        return "".join(self.__lines + self.__partial)
+
+    def feed(self, text: str) -> bool:
+        """
+        Adds a chunk of the page.
+
+        Args:
+            text (str): The decoded chunk.
+
+        Returns:
+            bool: True once the rest of the page is not needed.
+        """
+        if self.done or "\n" not in text:
+            self.__partial.append(text)
+            return self.done
+
+        end = text.rfind("\n") + 1
+        lines = "".join(self.__partial) + text[:end]
+        self.__partial = [text[end:]]
+        self.__lines.append(lines)
+        if any(pattern.search(lines) for pattern in self.__terminal):
+            self.done = True
+        else:
+            self.__pending = [
+                pattern for pattern in self.__pending if not pattern.search(lines)
+            ]
+            self.done = bool(self.__required) and not self.__pending
+        return self.done
+
+
+def embed_page_scanner() -> PageScanner:
+    """
+    Returns a scanner that stops once the embed page gave the video link,
+    thumbnail and title, or said the video was deleted.
+    """
+    return PageScanner(
+        required=(VIDEO_URL_PATTERN, IMAGE_URL_PATTERN, TITLE_PATTERN),
+        terminal=(DELETED_PATTERN,),
+    )
+
+
+def video_page_scanner() -> PageScanner:
+    """
+    Returns a scanner that stops only once the plain page turned out to be an
+    error page: the error notice may follow the heading and the share text,
+    so the page is otherwise read to the end.
+    """
+    return PageScanner(required=(), terminal=(ERROR_CLASS_PATTERN,))
@@ -1,11 +1,201 @@
-import re, os, urllib
-from uqload_dl.utils import is_a_callback, is_a_valid_directory, validate_output_file
+import re, os, errno, glob, random, socket, ssl, time, http.client
+from uqload_dl import http_pool
+from uqload_dl.exceptions import DownloadError
+from uqload_dl.file_sink import FSYNC_POLICIES, SINKS, open_sink, sync_directory
+from uqload_dl.http_pool import RETRY_STATUSES
+from uqload_dl.metrics import JobMetrics, report_metrics
+from uqload_dl.mp4 import HEAD_SIZE, Clip, Movie, plan_clip, probe, read_moov
+from uqload_dl.download_journal import DownloadJournal
+from uqload_dl.progress_dispatcher import ProgressDispatcher
+from uqload_dl.rate_limiter import get_shared_bucket
+from uqload_dl.write_pipeline import DEFAULT_BUFFER_MEMORY, WritePipeline
+from uqload_dl.utils import (
+    is_a_callback,
+    is_a_valid_directory,
+    parse_size,
+    sizeof_fmt,
+    validate_output_file,
+)
+from bisect import bisect_right
 from urllib.parse import urlparse
-from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from threading import Event, Lock
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 from uuid import uuid4
 
 # Test: https://sampletestfile.com/wp-content/uploads/2023/07/15MB-MP4.mp4
 
+# Smallest byte range worth opening a dedicated connection for.
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+# Seconds between two writes of the resume journal while downloading.
+JOURNAL_SAVE_INTERVAL = 1.0
+
+# Bounds of the adaptive read size used by the transfer loop.
+MIN_CHUNK_SIZE = 8 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+
+# Read duration the chunk size is tuned towards, in seconds.
+TARGET_READ_TIME = 0.05
+
+# Longest wait between two reconnections, in seconds.
+MAX_RETRY_BACKOFF = 30.0
+
+# Errors of the connection itself, worth reconnecting for. Disk errors are not.
+NETWORK_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    socket.timeout,
+    socket.gaierror,
+    ssl.SSLError,
+    http.client.HTTPException,
+)
+NETWORK_ERRNOS = (errno.ENETDOWN, errno.ENETUNREACH, errno.EHOSTUNREACH)
+
+
+def validate_file_url(url: str) -> str:
+    """
+    Validates the URL of a file to download.
+
+    Args:
+        url (str): A string representing the URL.
+
+    Returns:
+        str: The validated URL.
+
+    Raises:
+        ValueError: If the URL is invalid.
+    """
+    if url is None or not isinstance(url, str) or not len(url):
+        raise ValueError("URL must be a non-empty string.")
+
+    pattern = r"^https?://.+\.\w+$"
+    if not re.match(pattern, url):
+        raise ValueError("Invalid URL: URL does not contain a file extension")
+    return url
+
+
+def build_headers(url: str) -> Dict[str, str]:
+    """
+    Builds the request headers used to download a file.
+
+    Args:
+        url (str): The URL of the file.
+
+    Returns:
+        Dict[str, str]: The request headers.
+    """
+    parsed = urlparse(url)
+    return {
+        "User-Agent": (
+            "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 OPR/120.0.0.0"
+        ),
+        "Accept": (
+            "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+            "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
+        ),
+        "Referer": f"{parsed.scheme}://{parsed.netloc}",
+        "Accept-Language": "en-US,en;q=0.9",
+        # Byte ranges and Content-Length must refer to the file itself.
+        "Accept-Encoding": "identity",
+    }
+
+
+def is_network_error(error: BaseException) -> bool:
+    """
+    Tells whether an error comes from the connection rather than the disk.
+
+    Args:
+        error (BaseException): The error raised during a transfer.
+
+    Returns:
+        bool: True if reconnecting may fix it.
+    """
+    if isinstance(error, NETWORK_ERRORS):
+        return True
+    return isinstance(error, OSError) and error.errno in NETWORK_ERRNOS
+
+
+def read_metadata(status: int, headers) -> Tuple[int, str, bool]:
+    """
+    Reads the file size, type and range support from response headers.
+
+    Args:
+        status (int): The HTTP status code (200 or 206).
+        headers: The response headers.
+
+    Returns:
+        Tuple[int, str, bool]: The total size, the content type and whether
+        the server accepts byte ranges.
+
+    Raises:
+        ValueError: If the size of the file is missing.
+    """
+    if status == 206:
+        match = re.match(r"bytes\s+\d+-\d+/(\d+)", headers.get("Content-Range", ""))
+        total_size = int(match.group(1)) if match else 0
+        accepts_ranges = True
+    else:
+        total_size = int(headers.get("Content-Length", 0))
+        accepts_ranges = headers.get("Accept-Ranges", "").lower() != "none"
+
+    if not total_size:
+        raise ValueError("Missing Content-Length in response")
+
+    return total_size, headers.get("Content-Type", ""), accepts_ranges
+
+
+def find_destination(
+    output_dir: str,
+    filename: str,
+    extension: str,
+    can_resume: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """
+    Builds the output path, avoiding overwriting an existing file.
+
+    An unfinished download of the same file is reused so it can be resumed.
+    The partial file of another download is never reused, and so never
+    overwritten: a new name is picked instead.
+
+    Args:
+        output_dir (str): Directory where the file will be saved.
+        filename (str): The file name, without extension.
+        extension (str): The file extension, including the dot.
+        can_resume (Callable[[str], bool], optional): Tells whether the partial
+            file of a destination belongs to this download. Defaults to any.
+
+    Returns:
+        str: The path where the file will be saved.
+    """
+    can_resume = can_resume or (lambda destination: True)
+    destination = os.path.join(output_dir, f"{filename}{extension}")
+    partial = f"{destination}.part"
+    if not os.path.exists(destination) and not os.path.exists(partial):
+        return destination
+    if os.path.isfile(partial) and can_resume(destination):
+        return destination
+
+    pattern = glob.escape(os.path.join(output_dir, f"{filename}_"))
+    for partial in sorted(glob.glob(f"{pattern}*{extension}.part")):
+        if can_resume(partial[: -len(".part")]):
+            return partial[: -len(".part")]
+
+    # Avoid overwrite
+    return os.path.join(output_dir, f"{filename}_{uuid4().hex}{extension}")
+
 
 class FileDownloader:
     """
@@ -16,6 +206,32 @@ class FileDownloader:
         filename (str, optional): Custom name for the output file.
         output_dir (str, optional): Directory where file will be saved.
         on_progress_callback (Callable, optional): Callback for download progress.
+        connections (int, optional): Number of parallel connections used to fetch
+            the file in byte ranges. Defaults to 1 (single stream).
+        rate_limit (int, float, str, optional): Maximum transfer rate in bytes per
+            second (e.g. 2097152 or "2M"). The limit is shared by every
+            concurrent download of the process.
+        progress_interval (float, optional): Minimum seconds between two calls of
+            on_progress_callback. The final call is always made. Defaults to 0.1.
+        retries (int, optional): Reconnections allowed in a row, without any
+            progress in between, when the connection drops. Defaults to 5.
+        retry_backoff (float, optional): Seconds before the first reconnection,
+            doubled after each one. Defaults to 1.0.
+        on_metrics_callback (Callable, optional): Called with the job metrics
+            (see JobMetrics.to_dict) once download() ends, whatever the outcome.
+        metrics (JobMetrics, optional): Metrics of the job this download is part
+            of, e.g. shared with UQLoad. Defaults to new metrics.
+        sink (str, optional): How the file is written: "pwrite", "mmap" or
+            "buffered". The file is preallocated in every case. Defaults to "pwrite".
+        fsync (str, optional): When the data is forced to disk: "never",
+            "complete" (before the final rename) or "periodic" (also before each
+            journal save). Defaults to "complete".
+        buffer_memory (int, str, optional): Ceiling of the memory held by data
+            read from the network but not written yet (e.g. "64M"). Reads wait
+            when it is reached. Defaults to 16 MiB.
+        resume_key (str, optional): Stable identity of the file, e.g. a video
+            id, that a partial file must match to be resumed. Defaults to the
+            URL path.
 
     Raises:
         ValueError: On invalid input arguments or download issues.
@@ -27,14 +243,69 @@ class FileDownloader:
         filename: str = None,
         output_dir: str = None,
         on_progress_callback: Callable = None,
+        connections: int = 1,
+        rate_limit: Union[int, float, str] = None,
+        progress_interval: float = 0.1,
+        retries: int = 5,
+        retry_backoff: float = 1.0,
+        on_metrics_callback: Callable = None,
+        metrics: Optional[JobMetrics] = None,
+        sink: str = "pwrite",
+        fsync: str = "complete",
+        buffer_memory: Union[int, str] = DEFAULT_BUFFER_MEMORY,
+        resume_key: Optional[str] = None,
     ) -> None:
         self.url = self.__validate_url(url)
         self.__filename = self.__validate_output_file(filename)
         self.output_dir = is_a_valid_directory(output_dir)
         self.on_progress_callback = is_a_callback(on_progress_callback)
-        self.__get_metadata()
+        self.progress_interval = progress_interval
+        self.connections = self.__validate_connections(connections)
+        if type(retries) is not int or retries < 0:
+            raise ValueError("retries must be a non-negative integer")
+        if type(retry_backoff) not in (int, float) or retry_backoff < 0:
+            raise ValueError("retry_backoff must be a non-negative number")
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        if sink not in SINKS:
+            raise ValueError(f"sink must be one of {', '.join(SINKS)}")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.sink = sink
+        self.fsync = fsync
+        self.buffer_memory = parse_size(buffer_memory)
+        if self.buffer_memory < 2 * MIN_CHUNK_SIZE:
+            raise ValueError(f"buffer_memory must be at least {2 * MIN_CHUNK_SIZE}")
+        self.resume_key = resume_key or self.url
+        self.on_metrics_callback = is_a_callback(on_metrics_callback)
+        self.metrics = metrics or JobMetrics(self.url)
+        self.__rate_limiter = (
+            get_shared_bucket(parse_size(rate_limit)) if rate_limit else None
+        )
+        self.total_size = None
+        self.type = None
+        self.accepts_ranges = None
         self.destination = None
         self.bytes_downloaded = 0
+        self.__progress_lock = Lock()
+        self.__cancelled = Event()
+
+    def __validate_connections(self, connections: int) -> int:
+        """
+        Validates the number of parallel connections.
+
+        Args:
+            connections (int): Number of connections to open.
+
+        Returns:
+            int: The validated number of connections.
+
+        Raises:
+            ValueError: If connections is not a positive integer.
+        """
+        if type(connections) is not int or connections < 1:
+            raise ValueError("connections must be a positive integer")
+        return connections
 
     def __validate_output_file(self, filename: str = None) -> str:
         """
@@ -69,110 +340,898 @@ class FileDownloader:
         Raises:
             ValueError: If the URL is invalid.
         """
-        if url is None or not isinstance(url, str) or not len(url):
-            raise ValueError("URL must be a non-empty string.")
-
-        pattern = r"^https?://.+\.\w+$"
-        if not re.match(pattern, url):
-            raise ValueError("Invalid URL: URL does not contain a file extension")
-
-        parsed = urlparse(url)
-        self.headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 OPR/120.0.0.0"
-            ),
-            "Accept": (
-                "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
-                "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
-            ),
-            "Referer": f"{parsed.scheme}://{parsed.netloc}",
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept-Encoding": "gzip, deflate",
-        }
-
+        url = validate_file_url(url)
+        self.headers = build_headers(url)
         self.name, self.__extension = os.path.splitext(os.path.basename(url))
-
         return url
 
-    def __get_metadata(self) -> None:
+    def __read_metadata(self, response) -> None:
         """
-        Retrieves file metadata (size and type).
+        Reads the file metadata (size, type and range support) from response headers.
+
+        Args:
+            response: A HEAD, GET or "Range: bytes=0-0" probe response.
+
+        Raises:
+            ValueError: If the size of the file is missing.
+        """
+        self.total_size, self.type, self.accepts_ranges = read_metadata(
+            response.getcode(), response.info()
+        )
+
+    def fetch_metadata(self) -> None:
+        """
+        Retrieves file metadata (size and type) with a HEAD request.
+
+        Only needed to get the file info without downloading it, since
+        download() reads the metadata from its own response.
 
         Raises:
             ValueError: On HTTP issues or missing metadata.
         """
         try:
-            request = urllib.request.Request(
-                self.url, headers=self.headers, method="HEAD"
-            )
-            with urllib.request.urlopen(request) as response:
+            with self.metrics.phase("head"), http_pool.urlopen(
+                self.url, method="HEAD", headers=self.headers
+            ) as response:
+                self.__record_timings(response)
                 if response.getcode() != 200:
                     raise ValueError("Received non-200 HTTP response")
+                self.__read_metadata(response)
+        except http.client.HTTPException as e:
+            raise ValueError(f"FileDownloader HTTPError {self.url}: {e}") from e
+        except OSError as e:
+            raise ValueError(f"FileDownloader URLError {self.url}: {e}") from e
+        except Exception as e:
+            raise ValueError(f"FileDownloader Unexpected error {self.url}: {e}") from e
 
-                self.total_size = int(response.info().get("Content-Length", 0))
+    def probe_container(self) -> Dict[str, Any]:
+        """
+        Reads the file metadata and the MP4 properties with small Range requests.
 
-                if not self.total_size:
-                    raise ValueError("Missing Content-Length in response")
+        The first request asks for the first HEAD_SIZE bytes: its headers give
+        the size and type of the file, and its body the moov box of a fast
+        start file. Otherwise the moov box headers take another request.
 
-                self.type = response.info().get("Content-Type", "")
-        except urllib.error.HTTPError as e:
-            raise ValueError(f"FileDownloader HTTPErrpr {self.url}: {e}") from e
-        except urllib.error.URLError as e:
-            raise ValueError(f"FileDownloader URLErrpr {self.url}: {e}") from e
-        except Exception as e:
-            raise ValueError(f"FileDownloader Unexpected error {self.url}: {e}") from e
+        Returns:
+            Dict[str, Any]: The duration, width, height, codec and bitrate of
+            the video, as returned by mp4.probe.
+
+        Raises:
+            ValueError: If the file is not an MP4 file or cannot be read.
+        """
+        try:
+            with self.metrics.phase("head"):
+                with self.__open_range(0, HEAD_SIZE - 1) as response:
+                    if response.getcode() not in (200, 206):
+                        raise ValueError("file cannot be downloaded")
+                    self.__read_metadata(response)
+                    if response.getcode() != 206:
+                        raise ValueError("the server does not accept Range requests")
+                    head = response.read()
+                return probe(self.__read_range, self.total_size, head)
+        except http.client.HTTPException as e:
+            raise ValueError(f"FileDownloader HTTPError {self.url}: {e}") from e
+        except OSError as e:
+            raise ValueError(f"FileDownloader URLError {self.url}: {e}") from e
+
+    def __probe(self):
+        """
+        Retrieves file metadata with a "Range: bytes=0-0" GET request.
+
+        The one byte body is consumed so the connection goes back to the pool
+        and is reused by the transfer. If the server ignores the Range header,
+        the full response is returned so it can be used as the transfer itself.
+
+        Returns:
+            The full body response, or None if the server supports ranges.
+
+        Raises:
+            ValueError: On HTTP issues or missing metadata.
+        """
+        with self.metrics.phase("head"):
+            response = self.__open_range(0, 0)
+        try:
+            if response.getcode() not in (200, 206):
+                raise ValueError("file cannot be downloaded")
+            self.__read_metadata(response)
+        except BaseException:
+            response.close()
+            raise
+
+        if response.getcode() == 200:
+            return response
+        with response:
+            response.read()
+        return None
 
     @property
     def filename(self) -> str:
         """Returns the output filename."""
         return self.__filename
 
+    @property
+    def partial_destination(self) -> str:
+        """Returns the path of the partial file used while downloading."""
+        return f"{self.destination}.part"
+
     def delete_file(self) -> None:
-        """Deletes the downloaded file if it exists."""
-        if os.path.exists(self.destination):
-            print(f"deleted : {self.destination}")
-            os.remove(self.destination)
+        """Deletes the downloaded file, or its partial state, if it exists."""
+        for path in (
+            self.destination,
+            self.partial_destination,
+            f"{self.partial_destination}.json",
+        ):
+            if os.path.exists(path):
+                print(f"deleted : {path}")
+                os.remove(path)
+
+    def __get_destination(self, filename: str) -> str:
+        """
+        Builds the output path, avoiding overwriting an existing file.
+
+        A partial file is resumed only if its journal was written for this
+        file, at this size.
+
+        Args:
+            filename (str): The file name, without extension.
+
+        Returns:
+            str: The path where the file will be saved.
+        """
+
+        def can_resume(destination: str) -> bool:
+            journal = f"{destination}.part.json"
+            return DownloadJournal(journal, self.resume_key, self.total_size).loaded
+
+        return find_destination(
+            self.output_dir, filename, self.__extension, can_resume
+        )
+
+    def __split_ranges(self, missing: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Splits the missing byte ranges into pieces, one per connection.
+
+        Args:
+            missing (List[Tuple[int, int]]): The inclusive byte ranges still missing.
+
+        Returns:
+            List[Tuple[int, int]]: The (start, end) byte ranges to fetch.
+        """
+        remaining = sum(end - start + 1 for start, end in missing)
+        step = max(MIN_SEGMENT_SIZE, -(-remaining // self.connections))
+        return [
+            (position, min(position + step - 1, end))
+            for start, end in missing
+            for position in range(start, end + 1, step)
+        ]
+
+    def __open_range(self, start: int, end: int):
+        """
+        Sends a GET request for an inclusive byte range.
+
+        Args:
+            start (int): First byte of the range.
+            end (int): Last byte of the range.
+
+        Returns:
+            The HTTP response.
+        """
+        return self.__open(dict(self.headers, Range=f"bytes={start}-{end}"))
+
+    def __open(self, headers: Dict[str, str]):
+        """
+        Sends a GET request for the file and records its connection timings.
+
+        Args:
+            headers (Dict[str, str]): The request headers.
+
+        Returns:
+            The HTTP response.
+        """
+        response = http_pool.urlopen(self.url, headers=headers)
+        self.__record_timings(response)
+        return response
+
+    def __record_timings(self, response) -> None:
+        """Adds the connect and time to first byte of a response to the metrics."""
+        timings = getattr(response, "timings", {})
+        for phase in ("connect", "ttfb"):
+            self.metrics.add(phase, timings.get(phase, 0.0))
+
+    def __check_status(self, response, expected: Tuple[int, ...]) -> None:
+        """
+        Checks the status of a download response.
+
+        Args:
+            response: The HTTP response.
+            expected (Tuple[int, ...]): The acceptable status codes.
+
+        Raises:
+            http.client.HTTPException: If the server is temporarily failing,
+                so the request is retried.
+            ValueError: If the file cannot be downloaded.
+        """
+        status = response.getcode()
+        if status in RETRY_STATUSES:
+            raise http.client.HTTPException(f"server returned HTTP {status}")
+        if status not in expected:
+            if expected == (206,):
+                raise ValueError("server did not return the requested range")
+            raise ValueError("file cannot be downloaded")
+
+    def __retry_or_raise(self, error: BaseException) -> None:
+        """
+        Waits before reconnecting after a network error, within the retry budget.
+
+        The budget counts retries in a row without progress, so a long
+        transfer over a lossy link is not given up while it keeps advancing.
+        The wait grows exponentially, with jitter, up to MAX_RETRY_BACKOFF.
+
+        Args:
+            error (BaseException): The error that interrupted the transfer.
+
+        Raises:
+            DownloadError: If the retry budget is spent.
+            KeyboardInterrupt: If the download was cancelled meanwhile.
+        """
+        with self.__progress_lock:
+            if self.bytes_downloaded > self.__retry_mark:
+                self.__attempts = 0
+            self.__retry_mark = self.bytes_downloaded
+            self.__attempts += 1
+            attempt = self.__attempts
+
+        if attempt > self.retries:
+            raise DownloadError(
+                f"download failed after {self.retries} retries ({error}), "
+                f"{self.bytes_downloaded} of {self.total_size} bytes kept, "
+                "run it again to resume",
+                self.bytes_downloaded,
+                self.total_size,
+            ) from error
+
+        delay = min(self.retry_backoff * 2 ** (attempt - 1), MAX_RETRY_BACKOFF)
+        print(f"\nConnection lost ({error}), retry {attempt} of {self.retries}")
+        self.metrics.add_retry()
+        with self.metrics.phase("retry_wait"):
+            cancelled = self.__cancelled.wait(random.uniform(delay / 2, delay))
+        if cancelled:
+            raise KeyboardInterrupt()
+
+    def __report_progress(self, offset: int, size: int) -> None:
+        """
+        Records written bytes and notifies the progress dispatcher.
+
+        The journal is flushed to disk at most once per JOURNAL_SAVE_INTERVAL,
+        after the data it records when the fsync policy is "periodic".
+
+        Args:
+            offset (int): Position of the bytes just written.
+            size (int): Number of bytes just written.
+        """
+        with self.__progress_lock:
+            self.bytes_downloaded += size
+            self.metrics.add_bytes(size)
+            self.__journal.add(offset, offset + size)
+            if time.monotonic() - self.__journal_saved_at > JOURNAL_SAVE_INTERVAL:
+                if self.fsync == "periodic":
+                    self.__sink.sync()
+                self.__journal.save()
+                self.__journal_saved_at = time.monotonic()
+            if self.__progress:
+                self.__progress.update(self.bytes_downloaded, self.total_size)
+
+    def __next_chunk_size(self, chunk_size: int, size: int, elapsed: float) -> int:
+        """
+        Adapts the read size to the measured throughput.
+
+        The chunk grows while full reads complete well under TARGET_READ_TIME
+        and shrinks when a read takes longer than twice that target.
+
+        Args:
+            chunk_size (int): The size that was requested.
+            size (int): The number of bytes actually read.
+            elapsed (float): Seconds spent in the read.
+
+        Returns:
+            int: The size to request next.
+        """
+        if size == chunk_size and elapsed < TARGET_READ_TIME / 2:
+            return min(chunk_size * 2, MAX_CHUNK_SIZE)
+        if elapsed > TARGET_READ_TIME * 2:
+            return max(chunk_size // 2, MIN_CHUNK_SIZE)
+        return chunk_size
+
+    def __write_stream(self, response, offset: int) -> None:
+        """
+        Reads a response body and hands it to the write pipeline.
+
+        The body is read with readinto() into buffers recycled by the write
+        pipeline, so no bytes object is allocated per chunk, and the socket
+        keeps being read while the writer thread waits on the disk. When a
+        rate limit is set, each chunk is paid for in the shared token bucket.
+
+        Args:
+            response: The HTTP response to read from.
+            offset (int): Position where the body starts in the file.
+
+        Raises:
+            KeyboardInterrupt: If another segment was cancelled.
+        """
+        pipeline = self.__pipeline
+        chunk_size = min(MIN_CHUNK_SIZE, pipeline.buffer_size)
+        while True:
+            buffer = pipeline.acquire()
+            started = time.perf_counter()
+            try:
+                size = response.readinto(memoryview(buffer)[:chunk_size])
+            except BaseException:
+                pipeline.release(buffer)
+                raise
+            if not size or self.__cancelled.is_set():
+                pipeline.release(buffer)
+                if not size:
+                    break
+                raise KeyboardInterrupt()
+            pipeline.submit(offset, buffer, size)
+            offset += size
+            chunk_size = min(
+                self.__next_chunk_size(chunk_size, size, time.perf_counter() - started),
+                pipeline.buffer_size,
+            )
+            if self.__rate_limiter:
+                self.__rate_limiter.consume(size)
+
+    def __download_segment(
+        self, start: int, end: int, shift: int = 0, response=None
+    ) -> None:
+        """
+        Downloads a byte range and writes it in place.
+
+        If the connection drops, the rest of the range is requested again
+        from the first byte not written yet.
+
+        Args:
+            start (int): First byte of the range in the output file.
+            end (int): Last byte of the range in the output file.
+            shift (int, optional): Distance from the output position to the
+                position of the same bytes in the remote file, for clips.
+            response (optional): An already opened response for this range.
+
+        Raises:
+            ValueError: If the server does not return the requested range.
+            DownloadError: If the retry budget is spent.
+        """
+        while True:
+            try:
+                response = response or self.__open_range(start + shift, end + shift)
+                with response:
+                    self.__check_status(response, (206,))
+                    self.__write_stream(response, start)
+                error = ConnectionError("connection closed before the end of the range")
+            except Exception as ex:
+                if not is_network_error(ex):
+                    raise
+                error = ex
+            # Bytes still queued for the disk are not in the journal yet.
+            self.__pipeline.drain()
+            with self.__progress_lock:
+                start = self.__journal.first_missing(start, end)
+            if start is None:
+                return
+            response = None
+            self.__retry_or_raise(error)
+
+    def __download_segments(
+        self, ranges: List[Tuple[int, int, int]], response=None
+    ) -> None:
+        """
+        Downloads every byte range over parallel connections.
+
+        Args:
+            ranges (List[Tuple[int, int, int]]): The (start, end, shift) byte
+                ranges to fetch, as taken by __download_segment.
+            response (optional): An already opened response for the first range.
+        """
+        workers = min(self.connections, len(ranges))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(self.__download_segment, *ranges[0], response=response)
+            ]
+            futures += [
+                executor.submit(self.__download_segment, *segment)
+                for segment in ranges[1:]
+            ]
+            try:
+                # The first failure cancels the other segments and is raised.
+                for future in as_completed(futures):
+                    future.result()
+            except BaseException:
+                self.__cancelled.set()
+                raise
+
+    def __finalize(self) -> None:
+        """
+        Renames the partial file once every byte has been written.
+
+        Raises:
+            DownloadError: If the download is incomplete.
+        """
+        if not self.__journal.is_complete:
+            raise DownloadError(
+                f"download incomplete ({self.bytes_downloaded} of "
+                f"{self.total_size} bytes), run it again to resume",
+                self.bytes_downloaded,
+                self.total_size,
+            )
+        os.replace(self.partial_destination, self.destination)
+        if self.fsync != "never":
+            sync_directory(self.destination)
+        self.__journal.delete()
+
+    def __fetch_missing(self, response=None) -> None:
+        """
+        Fetches the missing byte ranges into the partial file, in one attempt.
+
+        Args:
+            response (optional): An already opened response for the full body.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+        """
+        missing = self.__journal.missing_ranges()
+        ranges = self.__split_ranges(missing) if self.accepts_ranges else []
+
+        if response is None:
+            if not ranges or ranges == [(0, self.total_size - 1)]:
+                response = self.__open(self.headers)
+            else:
+                response = self.__open_range(*ranges[0])
+
+        with response:
+            self.__check_status(response, (200, 206))
+
+            if response.getcode() == 206:
+                self.__download_segments(
+                    [(start, end, 0) for start, end in ranges], response
+                )
+            else:
+                self.__journal.reset()
+                self.bytes_downloaded = 0
+                self.__write_stream(response, 0)
+
+    def __fetch_clip(self, clip: Clip) -> None:
+        """
+        Fetches the missing parts of a clip into the partial file, in one attempt.
+
+        The clip header is written first, then the sample data is copied from
+        the byte ranges of the source that the clip plan maps to it.
+
+        Args:
+            clip (Clip): The plan of the clip.
+        """
+        if self.__journal.first_missing(0, len(clip.header) - 1) is not None:
+            self.__sink.write(0, clip.header)
+            self.__report_progress(0, len(clip.header))
+
+        # Output spans with the shift to their source bytes, by output position.
+        spans = [
+            (offset, offset + last - first, first - offset)
+            for first, last, offset in clip.ranges
+        ]
+        starts = [start for start, _, _ in spans]
+        # Missing bytes, cut where the spans meet since their shifts differ.
+        missing = [
+            (max(start, span_start), min(end, span_end))
+            for start, end in self.__journal.missing_ranges()
+            for span_start, span_end, _ in spans
+            if span_start <= end and start <= span_end
+        ]
+        if not missing:
+            return
+        self.__download_segments(
+            [
+                (start, end, spans[bisect_right(starts, start) - 1][2])
+                for start, end in self.__split_ranges(missing)
+            ]
+        )
+
+    def __transfer(self, response=None, clip: Optional[Clip] = None) -> None:
+        """
+        Fetches the missing byte ranges into the partial file.
+
+        The partial file is preallocated to its full size first, after a
+        check of the free disk space. Network reads and disk writes run on
+        separate threads, joined by a WritePipeline that holds at most
+        buffer_memory bytes. When the connection drops, the download
+        reconnects and resumes with a Range request from the first missing
+        byte, or starts over if the server does not accept ranges.
+
+        Args:
+            response (optional): An already opened response for the full body.
+            clip (Clip, optional): The plan of a clip to write instead of the
+                whole file.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+            DownloadError: If the retry budget is spent or the disk is too small.
+        """
+        self.__sink = open_sink(self.sink, self.partial_destination, self.total_size)
+        self.__pipeline = WritePipeline(
+            self.__sink.write,
+            self.__report_progress,
+            self.buffer_memory,
+            MAX_CHUNK_SIZE,
+        )
+        try:
+            while True:
+                error = None
+                try:
+                    with self.metrics.phase("transfer"):
+                        if clip:
+                            self.__fetch_clip(clip)
+                        else:
+                            self.__fetch_missing(response)
+                except Exception as ex:
+                    if not is_network_error(ex):
+                        raise
+                    error = ex
+                # Bytes still queued for the disk are not in the journal yet.
+                with self.metrics.phase("transfer"):
+                    self.__pipeline.drain()
+                if self.__journal.is_complete:
+                    return
+                error = error or ConnectionError(
+                    "connection closed before the end of file"
+                )
+                response = None
+                self.__retry_or_raise(error)
+        finally:
+            self.__pipeline.close()
+            if self.__progress:
+                self.__progress.flush()
+            complete = self.__journal.is_complete
+            self.__sink.close(
+                sync=self.fsync == "periodic" or (complete and self.fsync == "complete")
+            )
+            self.__journal.save()
 
     def download(self) -> None:
         """
         Downloads the file from the URL.
 
+        The file metadata is read from the download responses themselves: if
+        it is not known yet, a one byte "Range: bytes=0-0" probe is sent over
+        the same pooled connection used by the transfer.
+
+        Data is written to a ".part" file next to the destination, along with
+        a JSON journal of the completed byte ranges. Running the download
+        again resumes from the journal with Range requests, and the file is
+        renamed to its final name only once it is complete.
+
+        When more than one connection is requested, the file is fetched in
+        byte ranges over parallel connections. If the server ignores the
+        Range header, the download falls back to a single stream.
+
+        A dropped connection is reopened from the last byte written, up to
+        `retries` times in a row, before the download gives up.
+
+        Whatever the outcome, the job metrics are handed to
+        on_metrics_callback when the download ends.
+
         Raises:
+            DownloadError: If the download stopped before the file was complete.
+                The partial file is kept so the download can be resumed.
+            ValueError: If the file cannot be downloaded, e.g. on an HTTP 404.
+            http.client.HTTPException: On an HTTP error of the server.
+            KeyboardInterrupt: If the download was cancelled. The partial file
+                is kept as well.
+        """
+        self.__run(self.__download)
+
+    def download_clip(self, start: float, end: float) -> None:
+        """
+        Downloads the part of an MP4 video between two times.
+
+        The moov box, the index of the samples, is read with small Range
+        requests from the start or the end of the file. The clip begins on the
+        keyframe at or before `start`, so it plays from its first frame, and
+        only the byte ranges of its samples are downloaded. They are written
+        after a new moov box that indexes them, so the clip is a valid MP4
+        that plays while it downloads.
+
+        The download resumes, retries and reports its metrics like download().
+        Once it starts, total_size is the size of the clip.
+
+        Args:
+            start (float): Start time, in seconds.
+            end (float): End time, in seconds.
+
+        Raises:
+            DownloadError: If the download stopped before the clip was complete.
+            KeyboardInterrupt: If the download was cancelled.
+        """
+        self.__run(lambda: self.__download_clip(start, end))
+
+    def __run(self, job: Callable[[], None]) -> None:
+        """
+        Runs a download job, then hands its metrics to on_metrics_callback.
+
+        A cancellation or any failure is raised once its metrics are reported,
+        so the caller can tell the file was not saved.
+
+        Args:
+            job (Callable[[], None]): Downloads the file to its destination.
+
+        Raises:
+            DownloadError: If the download stopped before the file was complete.
             ValueError: If the file cannot be downloaded.
-            KeyboardInterrupt: If interrupted by user.
-            Exception: For other errors.
+            http.client.HTTPException: On an HTTP error of the server.
+            KeyboardInterrupt: If the download was cancelled.
         """
-        try:
-            request = urllib.request.Request(self.url, headers=self.headers)
-            with urllib.request.urlopen(request) as response:
-                if response.getcode() != 200:
-                    raise ValueError("file cannot be downloaded")
+        self.__progress = None
+        if self.on_progress_callback:
+            self.__progress = ProgressDispatcher(
+                self.on_progress_callback, self.progress_interval
+            )
 
-                self.destination = os.path.join(
-                    self.output_dir, f"{self.__filename}{self.__extension}"
-                )
+        self.__cancelled.clear()
+        status, error = "failed", None
+        try:
+            job()
+            status = "ok"
+            print(f"\nFile saved as: {self.destination}")
 
-                # Avoid overwrite
-                if os.path.isfile(self.destination):
-                    self.destination = os.path.join(
-                        self.output_dir,
-                        f"{self.__filename}_{uuid4().hex}{self.__extension}",
-                    )
-
-                with open(self.destination, "wb") as file:
-                    while chunk := response.read(8192):
-                        file.write(chunk)
-                        self.bytes_downloaded += len(chunk)
-                        if self.on_progress_callback:
-                            self.on_progress_callback(
-                                self.bytes_downloaded, self.total_size
-                            )
-                print(f"\nFile saved as: {self.destination}")
-
-        except urllib.error.HTTPError as error:
-            print(f"\nHTTP ERROR: {str(error)}")
         except KeyboardInterrupt:
-            print("\nDownload cancelled by user.")
+            status = "cancelled"
+            raise
         except Exception as ex:
-            print(f"\nUnexpected error: {ex}")
+            error = ex
+            raise
+        finally:
+            report_metrics(self.metrics, self.on_metrics_callback, status, error)
+
+    def __open_journal(self, filename: str) -> None:
+        """
+        Picks the destination and loads the journal of its partial file.
+
+        Args:
+            filename (str): The file name, without extension.
+        """
+        self.destination = self.__get_destination(filename)
+        self.__journal = DownloadJournal(
+            f"{self.partial_destination}.json", self.resume_key, self.total_size
+        )
+        if not os.path.isfile(self.partial_destination):
+            self.__journal.reset()
+        self.__journal_saved_at = time.monotonic()
+        self.bytes_downloaded = self.__journal.completed_bytes
+        self.__attempts, self.__retry_mark = 0, self.bytes_downloaded
+
+        if self.bytes_downloaded:
+            print(f"Resuming download from byte {self.bytes_downloaded}")
+
+    def __download(self) -> None:
+        """Downloads the whole file."""
+        response = self.__probe() if self.total_size is None else None
+        self.__open_journal(self.__filename)
+        if response is not None or not self.__journal.is_complete:
+            self.__transfer(response)
+        self.__finalize()
+
+    def __read_range(self, start: int, end: int) -> bytes:
+        """
+        Reads an inclusive byte range of the file into memory.
+
+        Args:
+            start (int): First byte of the range.
+            end (int): Last byte of the range.
+
+        Returns:
+            bytes: The content of the range.
+        """
+        with self.__open_range(start, end) as response:
+            self.__check_status(response, (206,))
+            return response.read()
+
+    def __download_clip(self, start: float, end: float) -> None:
+        """
+        Downloads the part of an MP4 video between two times.
+
+        Args:
+            start (float): Start time, in seconds.
+            end (float): End time, in seconds.
+
+        Raises:
+            ValueError: If the file is not a seekable MP4 or the times are invalid.
+        """
+        response = self.__probe()
+        if response is not None:
+            response.close()
+        if not self.accepts_ranges:
+            raise ValueError("the server does not accept Range requests")
+        source_size = self.total_size
+        with self.metrics.phase("head"):
+            ftyp, moov = read_moov(self.__read_range, source_size)
+            clip = plan_clip(Movie(moov, ftyp), start, end)
+        print(
+            f"Clip from {clip.start:.3f}s to {clip.end:.3f}s: "
+            f"{sizeof_fmt(clip.size)} of {sizeof_fmt(source_size)}"
+        )
+
+        self.total_size = clip.size
+        self.__open_journal(f"{self.__filename}_clip_{start:g}-{end:g}")
+        if not self.__journal.is_complete:
+            self.__transfer(clip=clip)
+        self.__finalize()
+
+    @contextmanager
+    def __stream_job(self):
+        """Runs a streaming transfer and reports its metrics when it ends."""
+        self.__progress = None
+        if self.on_progress_callback:
+            self.__progress = ProgressDispatcher(
+                self.on_progress_callback, self.progress_interval
+            )
+        self.__cancelled.clear()
+        self.bytes_downloaded = 0
+        self.__attempts, self.__retry_mark = 0, 0
+        status, error = "failed", None
+        try:
+            with self.metrics.phase("transfer"):
+                yield
+            status = "ok"
+        except (KeyboardInterrupt, GeneratorExit):
+            status = "cancelled"
+            raise
+        except Exception as ex:
+            error = ex
+            raise
+        finally:
+            if self.__progress:
+                self.__progress.flush()
+            report_metrics(self.metrics, self.on_metrics_callback, status, error)
+
+    def __iter_body(
+        self, acquire: Callable[[], bytearray], release: Callable[[bytearray], None]
+    ) -> Iterator[Tuple[bytearray, int]]:
+        """
+        Reads the body of the file in order, as it arrives.
+
+        The first request carries no Range header, so the first bytes arrive
+        one round trip after the request and the metadata is read from that
+        response. When the connection drops, the rest of the file is asked
+        for again with a Range request, within the retry budget.
+
+        Args:
+            acquire (Callable): Returns the buffer of the next read.
+            release (Callable): Takes back a buffer that was not yielded.
+
+        Yields:
+            Tuple[bytearray, int]: A buffer and the number of bytes read into
+            it. The buffer belongs to the caller.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+            DownloadError: If the retry budget is spent, or if the connection
+                dropped and the server does not accept ranges.
+        """
+        offset = 0
+        while True:
+            try:
+                if offset:
+                    response = self.__open_range(offset, self.total_size - 1)
+                else:
+                    response = self.__open(self.headers)
+                with response:
+                    self.__check_status(response, (206,) if offset else (200,))
+                    if not offset:
+                        self.__read_metadata(response)
+                    chunk_size = MIN_CHUNK_SIZE
+                    while True:
+                        buffer = acquire()
+                        started = time.perf_counter()
+                        try:
+                            size = response.readinto(memoryview(buffer)[:chunk_size])
+                        except BaseException:
+                            release(buffer)
+                            raise
+                        if not size:
+                            release(buffer)
+                            break
+                        offset += size
+                        with self.__progress_lock:
+                            self.bytes_downloaded += size
+                            self.metrics.add_bytes(size)
+                            if self.__progress:
+                                self.__progress.update(
+                                    self.bytes_downloaded, self.total_size
+                                )
+                        yield buffer, size
+                        chunk_size = self.__next_chunk_size(
+                            chunk_size, size, time.perf_counter() - started
+                        )
+                        if self.__rate_limiter:
+                            self.__rate_limiter.consume(size)
+                error = ConnectionError("connection closed before the end of file")
+            except Exception as ex:
+                if not is_network_error(ex):
+                    raise
+                error = ex
+            if self.total_size is not None and offset >= self.total_size:
+                return
+            if offset and not self.accepts_ranges:
+                raise DownloadError(
+                    f"connection lost ({error}) and the server does not accept "
+                    "ranges, the stream cannot be resumed",
+                    self.bytes_downloaded,
+                    self.total_size,
+                ) from error
+            self.__retry_or_raise(error)
+
+    def iter_content(self) -> Iterator[bytes]:
+        """
+        Yields the file body in chunks as it arrives, without touching the disk.
+
+        Reads happen when the next chunk is asked for, so a slow consumer
+        slows the transfer down instead of filling memory: at most one chunk
+        (1 MiB) is held. Dropped connections are resumed as in download().
+
+        Yields:
+            bytes: The next chunk of the file.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+            DownloadError: If the stream stopped before the end of the file.
+        """
+        reused = bytearray(MAX_CHUNK_SIZE)
+        with self.__stream_job():
+            for buffer, size in self.__iter_body(lambda: reused, lambda b: None):
+                yield bytes(memoryview(buffer)[:size])
+
+    def stream_to(self, file: BinaryIO) -> None:
+        """
+        Writes the file body to a binary file-like object as it arrives.
+
+        Made for pipes, e.g. sys.stdout.buffer into a transcoder: nothing is
+        written to disk and the consumer starts one round trip after the
+        request. Writes run on a WritePipeline thread, so the socket keeps
+        being read while the consumer is busy, up to buffer_memory bytes;
+        beyond that the reads wait. Dropped connections are resumed as in
+        download().
+
+        Args:
+            file (BinaryIO): The output, with a write() method. It is flushed
+                at the end, not closed.
+
+        Raises:
+            ValueError: If the file cannot be downloaded.
+            DownloadError: If the stream stopped before the end of the file,
+                or the output could not be written.
+        """
+
+        def write(offset: int, data) -> None:
+            try:
+                file.write(data)
+                if offset + len(data) == self.total_size and hasattr(file, "flush"):
+                    file.flush()
+            except OSError as ex:
+                raise DownloadError(
+                    f"cannot write the output: {ex}",
+                    self.bytes_downloaded,
+                    self.total_size,
+                ) from ex
+
+        with self.__stream_job():
+            pipeline = WritePipeline(
+                write, lambda offset, size: None, self.buffer_memory, MAX_CHUNK_SIZE
+            )
+            body = self.__iter_body(pipeline.acquire, pipeline.release)
+            try:
+                offset = 0
+                for buffer, size in body:
+                    pipeline.submit(offset, buffer, size)
+                    offset += size
+                pipeline.drain()
+            finally:
+                pipeline.close()
@@ -0,0 +1,265 @@
+import errno, mmap, os, shutil
+from abc import ABC, abstractmethod
+from uqload_dl.constants import FSYNC_POLICIES
+from uqload_dl.exceptions import DownloadError
+from uqload_dl.utils import sizeof_fmt
+from threading import Lock
+from typing import Dict, Type
+
+
+def allocated_size(path: str) -> int:
+    """
+    Returns the bytes already allocated on disk to a file.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        int: The allocated bytes, 0 if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    blocks = getattr(stat, "st_blocks", None)
+    return stat.st_size if blocks is None else min(stat.st_size, blocks * 512)
+
+
+def check_free_space(path: str, size: int) -> None:
+    """
+    Checks that the disk can hold a file of the given size.
+
+    Args:
+        path (str): Path of the file, existing or not.
+        size (int): The final size of the file.
+
+    Raises:
+        DownloadError: If the free space is not enough.
+    """
+    needed = size - allocated_size(path)
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(path))).free
+    if needed > free:
+        raise DownloadError(
+            f"not enough disk space for {path}: {sizeof_fmt(needed)} needed, "
+            f"{sizeof_fmt(free)} free",
+            total_size=size,
+        )
+
+
+def sync_directory(path: str) -> None:
+    """
+    Forces a rename or creation inside the directory of a file to disk.
+
+    Args:
+        path (str): Path of the file, whose directory is synced. Ignored on
+            platforms that cannot open directories.
+    """
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileSink(ABC):
+    """
+    Writes a file of known size at arbitrary offsets, from any thread.
+
+    The file is created if needed and its whole size is allocated up front
+    with posix_fallocate where available, so it is not fragmented as it
+    grows and running out of space fails before the download starts.
+    Subclasses implement write().
+
+    Args:
+        path (str): Path of the file.
+        size (int): Final size of the file in bytes.
+
+    Raises:
+        DownloadError: If the disk does not have enough free space.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        check_free_space(path, size)
+        self.path = path
+        self.size = size
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0)
+        self.fd = os.open(path, flags, 0o666)
+        try:
+            self.__preallocate()
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def __preallocate(self) -> None:
+        """Sets the file size and reserves its blocks when the platform allows it."""
+        if os.fstat(self.fd).st_size != self.size:
+            os.ftruncate(self.fd, self.size)
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self.fd, 0, self.size)
+            except OSError as ex:
+                # Filesystems without fallocate support keep a sparse file.
+                if ex.errno not in (errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+
+    @abstractmethod
+    def write(self, offset: int, data) -> None:
+        """
+        Writes bytes at a position of the file.
+
+        Args:
+            offset (int): Position of the first byte.
+            data: A bytes-like object.
+        """
+
+    def sync(self) -> None:
+        """Forces the written data to disk."""
+        os.fsync(self.fd)
+
+    def close(self, sync: bool = False) -> None:
+        """
+        Closes the file.
+
+        Args:
+            sync (bool, optional): Force the data to disk first.
+        """
+        if self.fd < 0:
+            return
+        try:
+            if sync:
+                self.sync()
+        finally:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self) -> "FileSink":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class PwriteSink(FileSink):
+    """
+    Writes with os.pwrite, straight from the caller's buffer.
+
+    Positional writes need no seek and no lock, so parallel segments never
+    wait for each other. Where pwrite is missing (Windows), writes fall back
+    to a seek and a write under a lock.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        super().__init__(path, size)
+        self.__lock = Lock()
+
+    def write(self, offset: int, data) -> None:
+        view = memoryview(data)
+        while view:
+            if hasattr(os, "pwrite"):
+                written = os.pwrite(self.fd, view, offset)
+            else:
+                with self.__lock:
+                    os.lseek(self.fd, offset, os.SEEK_SET)
+                    written = os.write(self.fd, view)
+            view = view[written:]
+            offset += written
+
+
+class MmapSink(FileSink):
+    """
+    Writes into a memory map of the whole file.
+
+    Data is copied into the page cache without a system call per chunk, and
+    the kernel writes it back on its own schedule or on sync().
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        super().__init__(path, size)
+        try:
+            self.__map = mmap.mmap(self.fd, size)
+        except BaseException:
+            super().close()
+            raise
+
+    def write(self, offset: int, data) -> None:
+        self.__map[offset : offset + len(data)] = data
+
+    def sync(self) -> None:
+        self.__map.flush()
+        super().sync()
+
+    def close(self, sync: bool = False) -> None:
+        if self.fd < 0:
+            return
+        try:
+            if sync:
+                self.sync()
+        finally:
+            self.__map.close()
+            super().close()
+
+
+class BufferedSink(FileSink):
+    """
+    Writes through one buffered file object, seeking under a lock.
+
+    This is how downloads used to be written. It is kept as a baseline for
+    the benchmarks and for platforms where the other backends misbehave.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        super().__init__(path, size)
+        self.__file = open(self.fd, "r+b", closefd=False)
+        self.__lock = Lock()
+
+    def write(self, offset: int, data) -> None:
+        with self.__lock:
+            if self.__file.tell() != offset:
+                self.__file.seek(offset)
+            self.__file.write(data)
+
+    def sync(self) -> None:
+        with self.__lock:
+            self.__file.flush()
+        super().sync()
+
+    def close(self, sync: bool = False) -> None:
+        if self.fd < 0:
+            return
+        try:
+            if sync:
+                self.sync()
+        finally:
+            self.__file.close()
+            super().close()
+
+
+# Output backends of FileDownloader, by name.
+SINKS: Dict[str, Type[FileSink]] = {
+    "pwrite": PwriteSink,
+    "mmap": MmapSink,
+    "buffered": BufferedSink,
+}
+
+
+def open_sink(kind: str, path: str, size: int) -> FileSink:
+    """
+    Opens a file sink.
+
+    Args:
+        kind (str): The backend, one of SINKS.
+        path (str): Path of the file.
+        size (int): Final size of the file in bytes.
+
+    Returns:
+        FileSink: The open sink.
+
+    Raises:
+        ValueError: If the backend is unknown.
+        DownloadError: If the disk does not have enough free space.
+    """
+    if kind not in SINKS:
+        raise ValueError(f"Invalid sink: {kind}, expected one of {', '.join(SINKS)}")
+    return SINKS[kind](path, size)
@@ -0,0 +1,373 @@
+import http.client, socket, ssl, time
+from threading import Lock
+from urllib.parse import urljoin, urlsplit
+from typing import Dict, List, Optional, Tuple
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Statuses worth retrying: the server is overloaded or temporarily failing.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+PoolKey = Tuple[str, str, int]
+
+
+class PooledResponse:
+    """
+    Wraps an http.client response and hands its connection back to the pool.
+
+    The connection is reused only if the body was read to the end and the
+    server did not ask to close it; otherwise it is closed.
+
+    Args:
+        pool (ConnectionPool): The pool that owns the connection.
+        key (PoolKey): The (scheme, host, port) of the connection.
+        connection (http.client.HTTPConnection): The connection used.
+        response (http.client.HTTPResponse): The response received.
+        url (str): The URL that produced this response.
+        timings (Dict[str, float], optional): Seconds spent opening connections
+            ("connect", DNS, TCP and TLS included) and waiting for the response
+            headers once the request was sent ("ttfb"), over every redirect.
+    """
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        key: PoolKey,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str,
+        timings: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.__pool = pool
+        self.__key = key
+        self.__connection = connection
+        self.__response = response
+        self.url = url
+        self.status = response.status
+        self.headers = response.headers
+        self.timings = timings or {"connect": 0.0, "ttfb": 0.0}
+
+    def getcode(self) -> int:
+        """Returns the HTTP status code."""
+        return self.status
+
+    def info(self) -> http.client.HTTPMessage:
+        """Returns the response headers."""
+        return self.headers
+
+    def geturl(self) -> str:
+        """Returns the final URL, after redirects."""
+        return self.url
+
+    @property
+    def length(self) -> Optional[int]:
+        """Returns the number of body bytes left to read, or None if unknown."""
+        return self.__response.length
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        """Reads up to amt bytes of the body, or all of it."""
+        return self.__response.read(amt)
+
+    def readinto(self, buffer) -> int:
+        """Reads the body into a pre-allocated writable buffer."""
+        return self.__response.readinto(buffer)
+
+    def close(self) -> None:
+        """Closes the response and releases its connection."""
+        if self.__connection is None:
+            return
+        response, connection = self.__response, self.__connection
+        self.__connection = None
+        reusable = not response.will_close and (
+            response.isclosed() or response.length == 0
+        )
+        response.close()
+        if reusable:
+            self.__pool.release(self.__key, connection)
+        else:
+            connection.close()
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Keeps persistent HTTP/1.1 connections per (scheme, host, port).
+
+    Idle connections are reused by later requests to the same host, so batch
+    runs stop paying the TCP and TLS handshake on every request.
+
+    Args:
+        max_idle_per_host (int, optional): Idle connections kept per host.
+        max_idle_time (float, optional): Seconds before an idle connection is evicted.
+        timeout (float, optional): Default socket timeout in seconds.
+
+    Attributes:
+        resolve (Dict[Tuple[str, int], Tuple[str, int]]): Addresses to connect to
+            instead of resolving a (host, port), like curl's --resolve. The Host
+            header and TLS server name still use the original host, so local
+            stand-in servers can answer for real domains.
+    """
+
+    def __init__(
+        self,
+        max_idle_per_host: int = 8,
+        max_idle_time: float = 60.0,
+        timeout: float = 30.0,
+    ) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self.max_idle_time = max_idle_time
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.resolve: Dict[Tuple[str, int], Tuple[str, int]] = {}
+        self.__idle: Dict[PoolKey, List[Tuple[float, http.client.HTTPConnection]]] = {}
+        self.__lock = Lock()
+        self.__ssl_context: Optional[ssl.SSLContext] = None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """Returns the pool counters."""
+        with self.__lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "idle": sum(len(idle) for idle in self.__idle.values()),
+            }
+
+    def __new_connection(
+        self, key: PoolKey, timeout: float
+    ) -> http.client.HTTPConnection:
+        """
+        Opens a new connection for the given key.
+
+        Args:
+            key (PoolKey): The (scheme, host, port) to connect to.
+            timeout (float): Socket timeout in seconds.
+
+        Returns:
+            http.client.HTTPConnection: A connection (not yet connected).
+        """
+        scheme, host, port = key
+        if scheme == "https":
+            if self.__ssl_context is None:
+                self.__ssl_context = ssl.create_default_context()
+            connection = http.client.HTTPSConnection(
+                host, port, timeout=timeout, context=self.__ssl_context
+            )
+        else:
+            connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+        address = self.resolve.get((host, port))
+        if address is not None:
+            connection._create_connection = (
+                lambda _, *args: socket.create_connection(address, *args)
+            )
+        return connection
+
+    def __evict_expired(self, now: float) -> None:
+        """Closes connections idle for longer than max_idle_time. Lock must be held."""
+        for key in list(self.__idle):
+            idle = self.__idle[key]
+            fresh = [item for item in idle if now - item[0] <= self.max_idle_time]
+            for _, connection in idle[: len(idle) - len(fresh)]:
+                connection.close()
+                self.evictions += 1
+            if fresh:
+                self.__idle[key] = fresh
+            else:
+                del self.__idle[key]
+
+    def acquire(
+        self, key: PoolKey, timeout: float
+    ) -> Tuple[http.client.HTTPConnection, bool]:
+        """
+        Returns an idle connection for the key, or a new one.
+
+        Args:
+            key (PoolKey): The (scheme, host, port) to connect to.
+            timeout (float): Socket timeout in seconds.
+
+        Returns:
+            Tuple[http.client.HTTPConnection, bool]: The connection and whether it was reused.
+        """
+        with self.__lock:
+            self.__evict_expired(time.monotonic())
+            idle = self.__idle.get(key)
+            if idle:
+                _, connection = idle.pop()
+                self.hits += 1
+                connection.timeout = timeout
+                if connection.sock is not None:
+                    connection.sock.settimeout(timeout)
+                return connection, True
+            self.misses += 1
+        return self.__new_connection(key, timeout), False
+
+    def release(self, key: PoolKey, connection: http.client.HTTPConnection) -> None:
+        """
+        Returns a connection to the pool, closing it if the host is full.
+
+        Args:
+            key (PoolKey): The (scheme, host, port) of the connection.
+            connection (http.client.HTTPConnection): The idle connection.
+        """
+        with self.__lock:
+            idle = self.__idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((time.monotonic(), connection))
+                return
+        connection.close()
+
+    def clear(self) -> None:
+        """Closes every idle connection."""
+        with self.__lock:
+            for idle in self.__idle.values():
+                for _, connection in idle:
+                    connection.close()
+            self.__idle.clear()
+
+    def __exchange(
+        self,
+        connection: http.client.HTTPConnection,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        timings: Dict[str, float],
+    ) -> http.client.HTTPResponse:
+        """Sends a request and reads the response headers, timing both steps."""
+        if connection.sock is None:
+            started = time.perf_counter()
+            connection.connect()
+            timings["connect"] += time.perf_counter() - started
+        started = time.perf_counter()
+        connection.request(method, target, headers=headers)
+        response = connection.getresponse()
+        timings["ttfb"] += time.perf_counter() - started
+        return response
+
+    def __send(
+        self,
+        key: PoolKey,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        timeout: float,
+        timings: Dict[str, float],
+    ) -> Tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        """
+        Sends a request, retrying once on a fresh connection if a reused one was stale.
+
+        Returns:
+            Tuple[http.client.HTTPConnection, http.client.HTTPResponse]: The connection and response.
+        """
+        connection, reused = self.acquire(key, timeout)
+        try:
+            return connection, self.__exchange(
+                connection, method, target, headers, timings
+            )
+        except (ConnectionError, http.client.BadStatusLine):
+            connection.close()
+            if not reused:
+                raise
+        except BaseException:
+            connection.close()
+            raise
+
+        connection = self.__new_connection(key, timeout)
+        try:
+            return connection, self.__exchange(
+                connection, method, target, headers, timings
+            )
+        except BaseException:
+            connection.close()
+            raise
+
+    def urlopen(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        max_redirects: int = 5,
+    ) -> PooledResponse:
+        """
+        Sends a request over a pooled connection, following redirects.
+
+        Unlike urllib, error statuses do not raise; callers check getcode().
+
+        Args:
+            url (str): The absolute http(s) URL.
+            method (str, optional): The HTTP method. Defaults to "GET".
+            headers (Dict[str, str], optional): Request headers.
+            timeout (float, optional): Socket timeout, defaults to the pool timeout.
+            max_redirects (int, optional): Maximum redirects to follow.
+
+        Returns:
+            PooledResponse: The response; close it to release the connection.
+
+        Raises:
+            ValueError: If the URL is not http(s) or there are too many redirects.
+            http.client.HTTPException, OSError: On network errors.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        timings = {"connect": 0.0, "ttfb": 0.0}
+        for _ in range(max_redirects + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https") or not parts.hostname:
+                raise ValueError(f"Unsupported URL: {url}")
+            port = parts.port or (443 if parts.scheme == "https" else 80)
+            key = (parts.scheme, parts.hostname, port)
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+
+            connection, response = self.__send(
+                key, method, target, dict(headers or {}), timeout, timings
+            )
+            pooled = PooledResponse(self, key, connection, response, url, timings)
+            location = response.getheader("Location")
+            if response.status not in REDIRECT_CODES or not location:
+                return pooled
+
+            with pooled:
+                if method != "HEAD":
+                    pooled.read()
+            url = urljoin(url, location)
+            if response.status == 303 and method != "HEAD":
+                method = "GET"
+        raise ValueError(f"Too many redirects: {url}")
+
+
+_default_pool = ConnectionPool()
+
+
+def get_default_pool() -> ConnectionPool:
+    """Returns the pool shared by every request of the process."""
+    return _default_pool
+
+
+def urlopen(
+    url: str,
+    method: str = "GET",
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
+) -> PooledResponse:
+    """
+    Sends a request through the shared connection pool.
+
+    Args:
+        url (str): The absolute http(s) URL.
+        method (str, optional): The HTTP method. Defaults to "GET".
+        headers (Dict[str, str], optional): Request headers.
+        timeout (float, optional): Socket timeout in seconds.
+
+    Returns:
+        PooledResponse: The response; close it to release the connection.
+    """
+    return _default_pool.urlopen(url, method=method, headers=headers, timeout=timeout)
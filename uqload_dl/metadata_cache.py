@@ -0,0 +1,165 @@
+import json, os, sqlite3, time
+from threading import Lock
+from uqload_dl.exceptions import VideoNotFound
+from typing import Any, Dict, Optional
+
+# Video links are signed and expire, so positive entries are kept for a few hours.
+DEFAULT_TTL = 6 * 3600
+# Deleted videos rarely come back, but keep the window short in case of errors.
+DEFAULT_NEGATIVE_TTL = 3600
+
+
+def default_cache_dir() -> str:
+    """
+    Returns the directory where uqload-dl keeps its cache.
+
+    It is $UQLOAD_DL_CACHE_DIR if set, otherwise "uqload-dl" inside
+    $XDG_CACHE_HOME or ~/.cache.
+
+    Returns:
+        str: The cache directory, which may not exist yet.
+    """
+    if os.environ.get("UQLOAD_DL_CACHE_DIR"):
+        return os.environ["UQLOAD_DL_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join("~", ".cache")
+    return os.path.join(os.path.expanduser(base), "uqload-dl")
+
+
+class MetadataCache:
+    """
+    An on-disk cache of resolved video metadata, keyed by video ID.
+
+    Entries live in a small sqlite database. Deleted videos are stored as
+    negative entries with their own TTL. If the database cannot be opened
+    the cache silently behaves as if it were empty.
+
+    Args:
+        path (str, optional): Path of the sqlite database. Defaults to
+            "metadata.sqlite3" inside default_cache_dir().
+        ttl (float, optional): Seconds a resolved video is kept.
+        negative_ttl (float, optional): Seconds a deleted video is kept.
+
+    Raises:
+        ValueError: If a TTL is negative.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl: float = DEFAULT_TTL,
+        negative_ttl: float = DEFAULT_NEGATIVE_TTL,
+    ) -> None:
+        if type(ttl) not in (int, float) or ttl < 0:
+            raise ValueError("ttl must be a non-negative number")
+        if type(negative_ttl) not in (int, float) or negative_ttl < 0:
+            raise ValueError("negative_ttl must be a non-negative number")
+        self.path = path or os.path.join(default_cache_dir(), "metadata.sqlite3")
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.__connection: Optional[sqlite3.Connection] = None
+        self.__broken = False
+        self.__lock = Lock()
+
+    def __connect(self) -> Optional[sqlite3.Connection]:
+        """
+        Opens the database on first use.
+
+        Returns:
+            Optional[sqlite3.Connection]: The connection, or None if unavailable.
+        """
+        if self.__connection is None and not self.__broken:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS videos ("
+                    "video_id TEXT PRIMARY KEY, info TEXT, expires_at REAL NOT NULL)"
+                )
+                connection.commit()
+                self.__connection = connection
+            except (OSError, sqlite3.Error):
+                self.__broken = True
+        return self.__connection
+
+    def __execute(self, query: str, params: tuple = ()) -> list:
+        """Runs a query and returns its rows, or [] if the cache is unavailable."""
+        with self.__lock:
+            connection = self.__connect()
+            if connection is None:
+                return []
+            try:
+                with connection:
+                    return connection.execute(query, params).fetchall()
+            except sqlite3.Error:
+                return []
+
+    def get(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the fresh metadata of a video.
+
+        Args:
+            video_id (str): The 12 character video ID.
+
+        Returns:
+            Optional[Dict[str, Any]]: The cached metadata, or None on a miss.
+
+        Raises:
+            VideoNotFound: If the video is cached as deleted.
+        """
+        rows = self.__execute(
+            "SELECT info FROM videos WHERE video_id = ? AND expires_at > ?",
+            (video_id, time.time()),
+        )
+        if not rows:
+            return None
+        if rows[0][0] is None:
+            raise VideoNotFound("The video has been deleted or does not exist")
+        try:
+            return json.loads(rows[0][0])
+        except ValueError:
+            return None
+
+    def put(self, video_id: str, info: Dict[str, Any]) -> None:
+        """
+        Stores the metadata of a video.
+
+        Args:
+            video_id (str): The 12 character video ID.
+            info (Dict[str, Any]): JSON serializable metadata.
+        """
+        self.__execute(
+            "INSERT OR REPLACE INTO videos VALUES (?, ?, ?)",
+            (video_id, json.dumps(info), time.time() + self.ttl),
+        )
+
+    def put_missing(self, video_id: str) -> None:
+        """
+        Records a video as deleted.
+
+        Args:
+            video_id (str): The 12 character video ID.
+        """
+        self.__execute(
+            "INSERT OR REPLACE INTO videos VALUES (?, NULL, ?)",
+            (video_id, time.time() + self.negative_ttl),
+        )
+
+    def invalidate(self, video_id: str) -> None:
+        """
+        Removes the entry of a video.
+
+        Args:
+            video_id (str): The 12 character video ID.
+        """
+        self.__execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+
+    def purge(self) -> None:
+        """Removes every expired entry."""
+        self.__execute("DELETE FROM videos WHERE expires_at <= ?", (time.time(),))
+
+    def close(self) -> None:
+        """Closes the database."""
+        with self.__lock:
+            if self.__connection is not None:
+                self.__connection.close()
+                self.__connection = None
@@ -0,0 +1,313 @@
+import json, os, re, time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Phases timed for each job, in the order they happen.
+PHASES = ("page_fetch", "head", "connect", "ttfb", "transfer", "retry_wait")
+
+# Upper bounds, in seconds, of the Prometheus histogram buckets.
+HISTOGRAM_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    900.0,
+    3600.0,
+)
+
+# A sample line of the text exposition format: name, labels and value.
+SAMPLE_PATTERN = re.compile(r"^(\w+)(?:\{(.*)\})? (\S+)$")
+LABEL_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+
+class JobMetrics:
+    """
+    Records where the time of one download job went.
+
+    Each phase accumulates the seconds spent in it. Connect and time to first
+    byte are summed over every request of the job, including the ones of
+    parallel connections and reconnections. Updates are thread-safe.
+
+    Phases:
+        page_fetch: fetching and parsing the Uqload pages.
+        head: retrieving the file metadata (HEAD or one byte Range probe).
+        connect: opening connections, DNS, TCP and TLS included.
+        ttfb: waiting for response headers once a request was sent.
+        transfer: reading the file body, from the first request to the last byte.
+        retry_wait: backing off before reconnections.
+
+    Args:
+        job (str): What the job downloads, e.g. a video ID or a URL.
+    """
+
+    def __init__(self, job: str) -> None:
+        self.job = job
+        self.started_at = time.time()
+        self.phases: Dict[str, float] = {}
+        self.bytes = 0
+        self.retries = 0
+        self.status: Optional[str] = None
+        self.error: Optional[str] = None
+        self.duration: Optional[float] = None
+        self.__started = time.perf_counter()
+        self.__lock = Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        """
+        Adds time to a phase.
+
+        Args:
+            phase (str): The phase name, one of PHASES.
+            seconds (float): The time spent.
+        """
+        with self.__lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + float(seconds)
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        """Times the enclosed block as part of a phase, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started)
+
+    def add_bytes(self, size: int) -> None:
+        """Counts bytes received for the file."""
+        with self.__lock:
+            self.bytes += size
+
+    def add_retry(self) -> None:
+        """Counts a reconnection."""
+        with self.__lock:
+            self.retries += 1
+
+    def finish(self, status: str, error: Optional[BaseException] = None) -> Dict:
+        """
+        Records the final status of the job.
+
+        Args:
+            status (str): "ok", "failed" or "cancelled".
+            error (BaseException, optional): The error that ended the job.
+
+        Returns:
+            Dict: The metrics, see to_dict().
+        """
+        with self.__lock:
+            self.status = status
+            self.error = None if error is None else f"{type(error).__name__}: {error}"
+            self.duration = time.perf_counter() - self.__started
+        return self.to_dict()
+
+    def to_dict(self) -> Dict:
+        """
+        Returns the metrics as a JSON serializable dict.
+
+        Returns:
+            Dict: job, started_at (a timestamp), duration, phases (seconds per
+            phase), bytes, retries, status and error.
+        """
+        with self.__lock:
+            return {
+                "job": self.job,
+                "started_at": self.started_at,
+                "duration": self.duration,
+                "phases": dict(self.phases),
+                "bytes": self.bytes,
+                "retries": self.retries,
+                "status": self.status,
+                "error": self.error,
+            }
+
+
+def report_metrics(
+    metrics: JobMetrics,
+    callback: Optional[Callable[[Dict], None]],
+    status: str,
+    error: Optional[BaseException] = None,
+) -> None:
+    """
+    Finishes the metrics of a job and hands them to a callback.
+
+    A failing callback is reported but never changes the outcome of the job.
+
+    Args:
+        metrics (JobMetrics): The metrics of the job.
+        callback (Callable, optional): Called with the metrics dict.
+        status (str): "ok", "failed" or "cancelled".
+        error (BaseException, optional): The error that ended the job.
+    """
+    result = metrics.finish(status, error)
+    if callback is None:
+        return
+    try:
+        callback(result)
+    except Exception as ex:
+        print(f"\nMetrics callback error: {ex}")
+
+
+class JsonLinesExporter:
+    """
+    Appends the metrics of every finished job to a file, one JSON per line.
+
+    Instances are callables, so they can be used as on_metrics_callback and
+    shared by concurrent jobs.
+
+    Args:
+        path (str): Path of the file, created if needed.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.__lock = Lock()
+
+    def __call__(self, metrics: Dict) -> None:
+        line = json.dumps(metrics, separators=(",", ":"))
+        with self.__lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(f"{line}\n")
+
+
+class PrometheusTextfileExporter:
+    """
+    Keeps histograms of the finished jobs in a Prometheus textfile.
+
+    The file is rewritten atomically after every job, in the text format read
+    by node_exporter's textfile collector, so dashboards can compute p50/p99
+    per phase with histogram_quantile(). Instances are callables, so they can
+    be used as on_metrics_callback and shared by concurrent jobs.
+
+    The samples of an existing textfile are loaded first and carried on, so
+    the counters keep growing across runs of the CLI instead of restarting
+    from the jobs of the last run. One process at a time should write a file.
+
+    Exposed metrics:
+        uqload_dl_phase_seconds: histogram of each phase, labeled by phase.
+        uqload_dl_job_seconds: histogram of the job durations.
+        uqload_dl_jobs_total: jobs, labeled by status.
+        uqload_dl_bytes_total: bytes received.
+        uqload_dl_retries_total: reconnections.
+
+    Args:
+        path (str): Path of the textfile, usually ending in ".prom".
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.__lock = Lock()
+        self.__histograms: Dict[str, List[float]] = {}
+        self.__jobs: Dict[str, int] = {}
+        self.__bytes = 0
+        self.__retries = 0
+        self.__load()
+
+    def __load(self) -> None:
+        """Resumes from the samples of the textfile left by an earlier run."""
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                lines = file.read().splitlines()
+        except FileNotFoundError:
+            return
+        buckets = {str(bound): index for index, bound in enumerate(HISTOGRAM_BUCKETS)}
+        for line in lines:
+            match = SAMPLE_PATTERN.match(line)
+            if match is None:
+                continue
+            name, labels, value = match.groups()
+            labels = dict(LABEL_PATTERN.findall(labels or ""))
+            try:
+                value = float(value)
+            except ValueError:
+                continue
+            if name == "uqload_dl_jobs_total":
+                self.__jobs[labels.get("status", "unknown")] = int(value)
+            elif name == "uqload_dl_bytes_total":
+                self.__bytes = int(value)
+            elif name == "uqload_dl_retries_total":
+                self.__retries = int(value)
+            for prefix, key in (
+                ("uqload_dl_phase_seconds_", labels.get("phase")),
+                ("uqload_dl_job_seconds_", ""),
+            ):
+                if key is None or not name.startswith(prefix):
+                    continue
+                histogram = self.__histograms.setdefault(
+                    key, [0.0] * (len(HISTOGRAM_BUCKETS) + 2)
+                )
+                suffix = name[len(prefix) :]
+                if suffix == "bucket" and labels.get("le") in buckets:
+                    histogram[buckets[labels["le"]]] = value
+                elif suffix == "count":
+                    histogram[-2] = value
+                elif suffix == "sum":
+                    histogram[-1] = value
+
+    def __observe(self, name: str, seconds: float) -> None:
+        """Adds a sample to a histogram: bucket counts, then count and sum."""
+        histogram = self.__histograms.setdefault(
+            name, [0.0] * (len(HISTOGRAM_BUCKETS) + 2)
+        )
+        for index, bound in enumerate(HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                histogram[index] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+    def __call__(self, metrics: Dict) -> None:
+        with self.__lock:
+            for phase, seconds in metrics["phases"].items():
+                self.__observe(phase, seconds)
+            if metrics["duration"] is not None:
+                self.__observe("", metrics["duration"])
+            status = metrics["status"] or "unknown"
+            self.__jobs[status] = self.__jobs.get(status, 0) + 1
+            self.__bytes += metrics["bytes"]
+            self.__retries += metrics["retries"]
+            self.__write()
+
+    def __histogram_lines(self, name: str, labels: Tuple[str, ...]) -> List[str]:
+        """Formats the histograms whose key is in labels as exposition lines."""
+        lines = [f"# TYPE {name} histogram"]
+        for key in labels:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                continue
+            label = f'phase="{key}",' if key else ""
+            for bound, count in zip(HISTOGRAM_BUCKETS, histogram):
+                lines.append(f'{name}_bucket{{{label}le="{bound}"}} {count:g}')
+            lines.append(f'{name}_bucket{{{label}le="+Inf"}} {histogram[-2]:g}')
+            label = f"{{{label[:-1]}}}" if label else ""
+            lines.append(f"{name}_count{label} {histogram[-2]:g}")
+            lines.append(f"{name}_sum{label} {histogram[-1]:.6f}")
+        return lines
+
+    def __write(self) -> None:
+        """Atomically rewrites the textfile. Lock must be held."""
+        phases = PHASES + tuple(
+            key for key in self.__histograms if key and key not in PHASES
+        )
+        lines = self.__histogram_lines("uqload_dl_phase_seconds", phases)
+        lines += self.__histogram_lines("uqload_dl_job_seconds", ("",))
+        lines.append("# TYPE uqload_dl_jobs_total counter")
+        for status, count in sorted(self.__jobs.items()):
+            lines.append(f'uqload_dl_jobs_total{{status="{status}"}} {count}')
+        lines.append("# TYPE uqload_dl_bytes_total counter")
+        lines.append(f"uqload_dl_bytes_total {self.__bytes}")
+        lines.append("# TYPE uqload_dl_retries_total counter")
+        lines.append(f"uqload_dl_retries_total {self.__retries}")
+
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
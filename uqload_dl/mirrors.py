@@ -0,0 +1,152 @@
+import json, os, time
+from threading import Lock
+from uqload_dl.metadata_cache import default_cache_dir
+from uqload_dl.utils import is_uqload_url
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Weight of the newest sample in the moving average of a mirror's latency.
+LATENCY_WEIGHT = 0.3
+# Seconds a failed mirror is moved to the back of the line.
+FAILURE_COOLDOWN = 300.0
+# Seconds the next mirror waits for the previous ones before joining the race.
+RACE_STAGGER = 0.25
+
+
+def normalize_mirror(mirror: str) -> str:
+    """
+    Returns the domain of a mirror given as "uqload.io" or "https://uqload.io/".
+
+    Args:
+        mirror (str): The mirror.
+
+    Returns:
+        str: The lowercase domain.
+
+    Raises:
+        ValueError: If the mirror is not a Uqload domain.
+    """
+    if not isinstance(mirror, str):
+        raise ValueError(f"Invalid mirror: {mirror}")
+    domain = mirror.strip().lower().split("://", 1)[-1].strip("/")
+    if not is_uqload_url(f"https://{domain}/embed-000000000000.html"):
+        raise ValueError(f"Invalid mirror: {mirror}")
+    return domain
+
+
+class MirrorStats:
+    """
+    Remembers how fast and how healthy each mirror has been.
+
+    Stats are kept in a small JSON file so later runs try the fastest
+    healthy mirror first. Writes are atomic and errors are ignored: the
+    stats only order the mirrors.
+
+    Args:
+        path (str, optional): Path of the JSON file. Defaults to "mirrors.json"
+            inside the cache directory.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = path or os.path.join(default_cache_dir(), "mirrors.json")
+        self.__lock = Lock()
+        self.__stats: Dict[str, Dict[str, float]] = self.__load()
+
+    def __load(self) -> Dict[str, Dict[str, float]]:
+        """Loads the stats recorded on disk."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            return {
+                str(mirror): {key: float(value) for key, value in stats.items()}
+                for mirror, stats in data.items()
+            }
+        except (OSError, ValueError, TypeError, AttributeError):
+            return {}
+
+    def get(self, mirror: str) -> Dict[str, float]:
+        """
+        Returns the stats of a mirror.
+
+        Args:
+            mirror (str): The mirror domain.
+
+        Returns:
+            Dict[str, float]: latency (moving average in seconds, if known),
+            successes, failures (in a row) and failed_at (a timestamp).
+        """
+        with self.__lock:
+            return dict(self.__stats.get(mirror, {}))
+
+    def record(self, mirror: str, latency: Optional[float]) -> None:
+        """
+        Records the outcome of a request to a mirror.
+
+        Args:
+            mirror (str): The mirror domain.
+            latency (float, optional): Seconds the request took, or None if it failed.
+        """
+        with self.__lock:
+            stats = self.__stats.setdefault(mirror, {"successes": 0, "failures": 0})
+            if latency is None:
+                stats["failures"] += 1
+                stats["failed_at"] = time.time()
+                return
+            stats["successes"] += 1
+            stats["failures"] = 0
+            previous = stats.get("latency")
+            stats["latency"] = (
+                latency
+                if previous is None
+                else previous + LATENCY_WEIGHT * (latency - previous)
+            )
+
+    def rank(self, mirrors: Sequence[str]) -> List[str]:
+        """
+        Orders mirrors from the most to the least promising.
+
+        Healthy mirrors come first by latency, then mirrors never measured in
+        their given order, then mirrors that failed recently.
+
+        Args:
+            mirrors (Sequence[str]): The mirror domains.
+
+        Returns:
+            List[str]: The same mirrors, reordered.
+        """
+        now = time.time()
+
+        def key(item: Tuple[int, str]) -> Tuple[int, float, int]:
+            position, mirror = item
+            stats = self.get(mirror)
+            if stats.get("failures") and now - stats["failed_at"] < FAILURE_COOLDOWN:
+                return (2, stats["failed_at"], position)
+            if "latency" in stats:
+                return (0, stats["latency"], position)
+            return (1, 0.0, position)
+
+        return [mirror for _, mirror in sorted(enumerate(mirrors), key=key)]
+
+    def save(self) -> None:
+        """Atomically writes the stats to disk, ignoring errors."""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with self.__lock:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(temp_path, "w", encoding="utf-8") as file:
+                    json.dump(self.__stats, file)
+                os.replace(temp_path, self.path)
+            except OSError:
+                pass
+
+
+_default_stats: Optional[MirrorStats] = None
+_default_lock = Lock()
+
+
+def get_default_stats() -> MirrorStats:
+    """Returns the mirror stats shared by every download of the process."""
+    global _default_stats
+    with _default_lock:
+        if _default_stats is None:
+            _default_stats = MirrorStats()
+        return _default_stats
@@ -0,0 +1,751 @@
+import struct
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Bytes read at once while walking the top-level boxes of a remote file.
+HEAD_SIZE = 64 * 1024
+
+# Largest hole between two selected samples that is fetched along with them,
+# so a clip takes a few Range requests instead of one per sample.
+MERGE_GAP = 256 * 1024
+
+# Top-level boxes an MP4 file may start with.
+FIRST_BOXES = ("ftyp", "styp", "moov", "mdat", "free", "skip", "wide", "pdin")
+
+# File type of a clip when the one of the source was not read.
+DEFAULT_FTYP = struct.pack(
+    ">I4s4sI4s4s4s", 28, b"ftyp", b"isom", 512, b"isom", b"iso2", b"mp41"
+)
+
+# Largest value of the 32-bit size and offset fields.
+MAX_UINT32 = 0xFFFFFFFF
+
+# A box found in a buffer: (offset, header size, total size).
+Box = Tuple[int, int, int]
+
+
+def iter_boxes(
+    data: bytes, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[str, Box]]:
+    """
+    Walks the boxes stored one after the other in data[start:end].
+
+    Args:
+        data (bytes): The buffer.
+        start (int, optional): Offset of the first box.
+        end (int, optional): End of the last box. Defaults to the buffer end.
+
+    Yields:
+        Tuple[str, Box]: The box type and its (offset, header size, size).
+
+    Raises:
+        ValueError: If a box size is invalid.
+    """
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, position)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from(">Q", data, position + 8)[0], 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            raise ValueError("invalid MP4 box size")
+        yield kind.decode("latin-1"), (position, header, size)
+        position += size
+
+
+def children(data: bytes, box: Box) -> Dict[str, Box]:
+    """
+    Returns the first child box of each type inside a container box.
+
+    Args:
+        data (bytes): The buffer holding the box.
+        box (Box): The container.
+
+    Returns:
+        Dict[str, Box]: The child boxes by type.
+    """
+    offset, header, size = box
+    found: Dict[str, Box] = {}
+    for kind, child in iter_boxes(data, offset + header, offset + size):
+        found.setdefault(kind, child)
+    return found
+
+
+def make_box(kind: str, *payloads: bytes) -> bytes:
+    """Builds a box from its type and payload."""
+    payload = b"".join(payloads)
+    return struct.pack(">I4s", 8 + len(payload), kind.encode("latin-1")) + payload
+
+
+def make_full_box(kind: str, version: int, *payloads: bytes) -> bytes:
+    """Builds a box with a version and zero flags."""
+    return make_box(kind, struct.pack(">I", version << 24), *payloads)
+
+
+class RemoteFile:
+    """
+    Reads a remote file through Range requests, HEAD_SIZE bytes at a time.
+
+    The last window read is kept, so walking the box headers of a region
+    takes one request.
+
+    Args:
+        read_range (Callable[[int, int], bytes]): Returns the bytes of an
+            inclusive range of the file.
+        total_size (int): Size of the file.
+        head (bytes, optional): Bytes already read from the start of the file.
+    """
+
+    def __init__(
+        self, read_range: Callable[[int, int], bytes], total_size: int, head=b""
+    ) -> None:
+        self.read_range = read_range
+        self.total_size = total_size
+        self.__start = 0
+        self.__window = bytes(head)
+
+    def read(self, offset: int, size: int) -> bytes:
+        """
+        Returns up to size bytes from an offset, fetching them if needed.
+
+        Args:
+            offset (int): Position of the first byte.
+            size (int): Number of bytes, cut at the end of the file.
+
+        Returns:
+            bytes: The bytes read.
+        """
+        end = min(offset + size, self.total_size)
+        if offset < self.__start or end > self.__start + len(self.__window):
+            self.__start = offset
+            last = min(offset + max(size, HEAD_SIZE), self.total_size) - 1
+            self.__window = self.read_range(offset, last)
+        local = offset - self.__start
+        return self.__window[local : local + end - offset]
+
+    def boxes(self, start: int, end: int) -> Iterator[Tuple[str, Box]]:
+        """
+        Walks the boxes stored one after the other between two offsets.
+
+        Only the box headers are read.
+
+        Args:
+            start (int): Offset of the first box.
+            end (int): End of the last box.
+
+        Yields:
+            Tuple[str, Box]: The box type and its (offset, header size, size).
+
+        Raises:
+            ValueError: If a box size is invalid.
+        """
+        position = start
+        while position + 8 <= end:
+            header = self.read(position, 16)
+            size, kind = struct.unpack_from(">I4s", header)
+            header_size = 8
+            if size == 1 and len(header) == 16:
+                size, header_size = struct.unpack_from(">Q", header, 8)[0], 16
+            elif size == 0:
+                size = end - position
+            if size < header_size or position + size > end:
+                raise ValueError("invalid MP4 box size")
+            yield kind.decode("latin-1"), (position, header_size, size)
+            position += size
+
+    def find(self, box: Box, *kinds: str) -> Dict[str, Box]:
+        """
+        Finds child boxes, walking the headers only until they are all found.
+
+        Args:
+            box (Box): The parent box.
+            *kinds (str): The types of the children.
+
+        Returns:
+            Dict[str, Box]: The first child of each type found.
+        """
+        found: Dict[str, Box] = {}
+        for kind, child in self.boxes(box[0] + box[1], box[0] + box[2]):
+            if kind in kinds and kind not in found:
+                found[kind] = child
+                if len(found) == len(kinds):
+                    break
+        return found
+
+    def payload(self, box: Box, size: int) -> bytes:
+        """Returns the first bytes of the payload of a box."""
+        return self.read(box[0] + box[1], min(size, box[2] - box[1]))
+
+
+def _find_moov(file: RemoteFile) -> Tuple[Optional[bytes], Box]:
+    """
+    Walks the top-level boxes of a remote MP4 file up to its moov box.
+
+    Args:
+        file (RemoteFile): The remote file.
+
+    Returns:
+        Tuple[Optional[bytes], Box]: The ftyp box if any, and the moov box.
+
+    Raises:
+        ValueError: If the file is not a regular MP4 file.
+    """
+    ftyp = None
+    for kind, box in file.boxes(0, file.total_size):
+        if box[0] == 0 and kind not in FIRST_BOXES:
+            break
+        if kind == "moov":
+            return ftyp, box
+        if kind == "moof":
+            raise ValueError("fragmented MP4 files are not supported")
+        if kind == "ftyp":
+            ftyp = file.read(box[0], box[2])
+    if ftyp is None:
+        raise ValueError("the file is not an MP4 file")
+    raise ValueError("the MP4 file has no moov box")
+
+
+def read_moov(
+    read_range: Callable[[int, int], bytes], total_size: int, head: bytes = b""
+) -> Tuple[Optional[bytes], bytes]:
+    """
+    Fetches the ftyp and moov boxes of a remote MP4 file.
+
+    The top-level boxes are walked from the start of the file, reading
+    HEAD_SIZE bytes at a time only where a box header is needed: the moov
+    box takes one request when it is at the front (fast start), and two when
+    it follows the media data.
+
+    Args:
+        read_range (Callable[[int, int], bytes]): Returns the bytes of an
+            inclusive range of the file.
+        total_size (int): Size of the file.
+        head (bytes, optional): Bytes already read from the start of the file.
+
+    Returns:
+        Tuple[Optional[bytes], bytes]: The ftyp box if it was read, and the
+        moov box.
+
+    Raises:
+        ValueError: If the file is not a regular MP4 file.
+    """
+    file = RemoteFile(read_range, total_size, head)
+    ftyp, moov = _find_moov(file)
+    return ftyp, file.read(moov[0], moov[2])
+
+
+def probe(
+    read_range: Callable[[int, int], bytes], total_size: int, head: bytes = b""
+) -> Dict[str, Any]:
+    """
+    Reads the duration, resolution and codecs of a remote MP4 file.
+
+    Unlike read_moov, only the headers on the way to these fields are read,
+    not the sample tables, which are most of the moov box of a long video.
+    That is one request for a fast start file whose head was already read,
+    plus one for each track beyond the first window.
+
+    Args:
+        read_range (Callable[[int, int], bytes]): Returns the bytes of an
+            inclusive range of the file.
+        total_size (int): Size of the file.
+        head (bytes, optional): Bytes already read from the start of the file.
+
+    Returns:
+        Dict[str, Any]: The duration in seconds, the width and height of the
+        video (None without a video track), the codecs of the tracks (e.g.
+        "avc1,mp4a") and the average bitrate in bits per second.
+
+    Raises:
+        ValueError: If the file is not a regular MP4 file.
+    """
+    file = RemoteFile(read_range, total_size, head)
+    _, moov = _find_moov(file)
+    width = height = None
+    duration, codecs = 0.0, []
+    try:
+        for kind, box in file.boxes(moov[0] + moov[1], moov[0] + moov[2]):
+            if kind == "mvhd":
+                payload = file.payload(box, 32)
+                fields = ">4xQQIQ" if payload[0] == 1 else ">4xIIII"
+                timescale, length = struct.unpack_from(fields, payload)[2:]
+                duration = max(duration, length / timescale if timescale else 0.0)
+            elif kind == "trak":
+                handler, codec, size = _probe_trak(file, box)
+                if handler == "vide" and width is None and size:
+                    width, height = size
+                if codec:
+                    codecs.append(codec)
+    except (struct.error, IndexError) as ex:
+        raise ValueError(f"invalid MP4 index: {ex}") from ex
+    if not duration:
+        raise ValueError("the MP4 file has no duration")
+    return {
+        "duration": duration,
+        "width": width,
+        "height": height,
+        "codec": ",".join(codecs) or None,
+        "bitrate": round(total_size * 8 / duration),
+    }
+
+
+def _probe_trak(
+    file: RemoteFile, trak: Box
+) -> Tuple[Optional[str], Optional[str], Optional[Tuple[int, int]]]:
+    """Reads the handler, codec and display size of a track, headers only."""
+    boxes = file.find(trak, "tkhd", "mdia")
+    size = None
+    if "tkhd" in boxes:
+        payload = file.payload(boxes["tkhd"], 96)
+        width, height = struct.unpack_from(">II", payload, 88 if payload[0] else 76)
+        if width and height:
+            size = (width >> 16, height >> 16)
+    if "mdia" not in boxes:
+        return None, None, size
+    mdia = file.find(boxes["mdia"], "hdlr", "minf")
+    handler = codec = None
+    if "hdlr" in mdia:
+        handler = file.payload(mdia["hdlr"], 12)[8:12].decode("latin-1")
+    stbl = file.find(mdia["minf"], "stbl") if "minf" in mdia else {}
+    stsd = file.find(stbl["stbl"], "stsd") if stbl else {}
+    if stsd:
+        codec = file.payload(stsd["stsd"], 16)[12:16].decode("latin-1") or None
+    return handler, codec, size
+
+
+def _unpack_table(data: bytes, box: Box, fields: str) -> List[tuple]:
+    """Reads the entries of a sample table box: version, count, then entries."""
+    offset, header, _ = box
+    count = struct.unpack_from(">I", data, offset + header + 4)[0]
+    entry = struct.Struct(">" + fields)
+    start = offset + header + 8
+    return [entry.unpack_from(data, start + i * entry.size) for i in range(count)]
+
+
+def _version(data: bytes, box: Box) -> int:
+    """Returns the version of a full box."""
+    return data[box[0] + box[1]]
+
+
+def _run_lengths(values: List[int]) -> List[Tuple[int, int]]:
+    """Compresses values into (count, value) runs."""
+    runs: List[List[int]] = []
+    for value in values:
+        if runs and runs[-1][1] == value:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value])
+    return [(count, value) for count, value in runs]
+
+
+class Track:
+    """
+    A track of an MP4 file and its sample table.
+
+    Args:
+        data (bytes): The moov box.
+        trak (Box): The trak box inside it.
+
+    Raises:
+        ValueError: If the track lacks a required box.
+    """
+
+    def __init__(self, data: bytes, trak: Box) -> None:
+        self.data = data
+        self.trak = trak
+        try:
+            boxes = children(data, trak)
+            self.tkhd = boxes["tkhd"]
+            self.mdia = boxes["mdia"]
+            mdia = children(data, self.mdia)
+            self.mdhd, self.hdlr, self.minf = mdia["mdhd"], mdia["hdlr"], mdia["minf"]
+            self.stbl = children(data, self.minf)["stbl"]
+            self.tables = children(data, self.stbl)
+            self.stsd = self.tables["stsd"]
+        except KeyError as ex:
+            raise ValueError(f"MP4 track without {ex.args[0]} box") from ex
+
+        tkhd = self.tkhd[0] + self.tkhd[1]
+        if _version(data, self.tkhd) == 1:
+            self.track_id = struct.unpack_from(">I", data, tkhd + 20)[0]
+            dimensions = tkhd + 88
+        else:
+            self.track_id = struct.unpack_from(">I", data, tkhd + 12)[0]
+            dimensions = tkhd + 76
+        width, height = struct.unpack_from(">II", data, dimensions)
+        self.width, self.height = width >> 16, height >> 16
+
+        mdhd = self.mdhd[0] + self.mdhd[1]
+        if _version(data, self.mdhd) == 1:
+            self.timescale = struct.unpack_from(">I", data, mdhd + 20)[0]
+        else:
+            self.timescale = struct.unpack_from(">I", data, mdhd + 12)[0]
+        if not self.timescale:
+            raise ValueError("MP4 track with a zero timescale")
+        handler = self.hdlr[0] + self.hdlr[1] + 8
+        self.handler = data[handler : handler + 4].decode("latin-1")
+        entry = self.stsd[0] + self.stsd[1] + 8
+        self.codec = data[entry + 4 : entry + 8].decode("latin-1")
+
+        self.__read_samples()
+
+    def __read_samples(self) -> None:
+        """Expands the sample table into per-sample lists."""
+        data, tables = self.data, self.tables
+        if "stsz" in tables:
+            offset = tables["stsz"][0] + tables["stsz"][1]
+            uniform, count = struct.unpack_from(">II", data, offset + 4)
+            if uniform:
+                self.sizes = [uniform] * count
+            else:
+                self.sizes = list(struct.unpack_from(f">{count}I", data, offset + 12))
+        elif "stz2" in tables:
+            offset = tables["stz2"][0] + tables["stz2"][1]
+            field, count = struct.unpack_from(">xxxBI", data, offset + 4)
+            packed = data[offset + 12 : offset + 12 + (count * field + 7) // 8]
+            if field == 4:
+                nibbles = [n for byte in packed for n in (byte >> 4, byte & 15)]
+                self.sizes = nibbles[:count]
+            else:
+                code = {8: "B", 16: "H"}[field]
+                self.sizes = list(struct.unpack(f">{count}{code}", packed))
+        else:
+            raise ValueError("MP4 track without sample sizes")
+        count = len(self.sizes)
+
+        self.durations = [
+            delta
+            for run, delta in _unpack_table(data, tables["stts"], "II")
+            for _ in range(run)
+        ][:count]
+        if len(self.durations) != count:
+            raise ValueError("MP4 track with an inconsistent time table")
+        self.times = list(accumulate(self.durations, initial=0))
+
+        self.ctts_version = None
+        self.composition: Optional[List[int]] = None
+        if "ctts" in tables:
+            self.ctts_version = _version(data, tables["ctts"])
+            self.composition = [
+                offset
+                for run, offset in _unpack_table(data, tables["ctts"], "II")
+                for _ in range(run)
+            ][:count]
+
+        self.sync: Optional[List[int]] = None
+        if "stss" in tables:
+            stss = _unpack_table(data, tables["stss"], "I")
+            self.sync = sorted(number - 1 for (number,) in stss)
+
+        if "stco" in tables:
+            chunks = [offset for (offset,) in _unpack_table(data, tables["stco"], "I")]
+        else:
+            chunks = [offset for (offset,) in _unpack_table(data, tables["co64"], "Q")]
+        stsc = _unpack_table(data, tables["stsc"], "III")
+        self.offsets: List[int] = []
+        self.descriptions: List[int] = []
+        for index, (first, per_chunk, description) in enumerate(stsc):
+            last = stsc[index + 1][0] - 1 if index + 1 < len(stsc) else len(chunks)
+            for chunk in range(first - 1, min(last, len(chunks))):
+                position = chunks[chunk]
+                for _ in range(per_chunk):
+                    if len(self.offsets) == count:
+                        break
+                    self.offsets.append(position)
+                    self.descriptions.append(description)
+                    position += self.sizes[len(self.offsets) - 1]
+        if len(self.offsets) != count:
+            raise ValueError("MP4 track with an inconsistent chunk table")
+
+    @property
+    def duration(self) -> float:
+        """Returns the duration of the track in seconds."""
+        return self.times[-1] / self.timescale
+
+    def sync_before(self, time: int) -> int:
+        """Returns the last sync sample starting at or before a media time."""
+        index = max(bisect_right(self.times, time, 0, len(self.sizes)) - 1, 0)
+        if self.sync is None:
+            return index
+        position = bisect_right(self.sync, index) - 1
+        return self.sync[position] if position >= 0 else 0
+
+    def index_at(self, time: int) -> int:
+        """Returns the first sample starting at or after a media time."""
+        return bisect_left(self.times, time, 0, len(self.sizes))
+
+
+class Movie:
+    """
+    The index of an MP4 file, read from its moov box.
+
+    Args:
+        moov (bytes): The moov box.
+        ftyp (bytes, optional): The ftyp box.
+
+    Raises:
+        ValueError: If the index cannot be read.
+    """
+
+    def __init__(self, moov: bytes, ftyp: Optional[bytes] = None) -> None:
+        self.moov = moov
+        self.ftyp = ftyp
+        root = (0, 8, len(moov))
+        if len(moov) >= 16 and struct.unpack_from(">I", moov)[0] == 1:
+            root = (0, 16, len(moov))
+        try:
+            self.mvhd = children(moov, root)["mvhd"]
+            offset = self.mvhd[0] + self.mvhd[1]
+            if _version(moov, self.mvhd) == 1:
+                self.timescale = struct.unpack_from(">I", moov, offset + 20)[0]
+            else:
+                self.timescale = struct.unpack_from(">I", moov, offset + 12)[0]
+            self.tracks = [
+                Track(moov, box)
+                for kind, box in iter_boxes(moov, root[1], len(moov))
+                if kind == "trak"
+            ]
+        except (KeyError, struct.error, IndexError) as ex:
+            raise ValueError(f"invalid MP4 index: {ex}") from ex
+        self.tracks = [track for track in self.tracks if track.sizes]
+        if not self.tracks or not self.timescale:
+            raise ValueError("the MP4 file has no playable track")
+
+    @property
+    def duration(self) -> float:
+        """Returns the duration of the movie in seconds."""
+        return max(track.duration for track in self.tracks)
+
+    @property
+    def video(self) -> Optional[Track]:
+        """Returns the first video track, if any."""
+        for track in self.tracks:
+            if track.handler == "vide":
+                return track
+        return None
+
+
+class Clip:
+    """
+    The plan of an MP4 clip.
+
+    The clip is its header (ftyp, moov and the mdat header), followed by byte
+    ranges copied from the source file.
+
+    Args:
+        header (bytes): The start of the clip file.
+        ranges (List[Tuple[int, int, int]]): Inclusive (start, end) byte ranges
+            of the source, with the offset of their copy in the clip.
+        start (float): Time of the first frame in the source, in seconds.
+        end (float): Time where the clip ends in the source, in seconds.
+    """
+
+    def __init__(
+        self,
+        header: bytes,
+        ranges: List[Tuple[int, int, int]],
+        start: float,
+        end: float,
+    ) -> None:
+        self.header = header
+        self.ranges = ranges
+        self.start = start
+        self.end = end
+        self.size = len(header) + sum(last - first + 1 for first, last, _ in ranges)
+
+
+def _patch_duration(data: bytes, box: Box, duration: int, v1: int, v0: int) -> bytes:
+    """Copies a header box with a new duration field."""
+    offset, header, size = box
+    copy = bytearray(data[offset : offset + size])
+    if copy[header] == 1:
+        struct.pack_into(">Q", copy, header + v1, duration)
+    else:
+        struct.pack_into(">I", copy, header + v0, min(duration, MAX_UINT32))
+    return bytes(copy)
+
+
+def _copy(data: bytes, box: Box) -> bytes:
+    """Copies a box."""
+    return data[box[0] : box[0] + box[2]]
+
+
+def _make_table(kind: str, entry: str, entries: List[tuple], version: int = 0) -> bytes:
+    """Builds a sample table box: version, entry count, then the entries."""
+    packer = struct.Struct(">" + entry)
+    count = struct.pack(">I", len(entries))
+    return make_full_box(kind, version, count, *(packer.pack(*e) for e in entries))
+
+
+def _build_stbl(
+    track: Track, first: int, last: int, offsets: List[int], co64: bool
+) -> bytes:
+    """Builds the sample table of the samples [first, last) at new offsets."""
+    sizes = track.sizes[first:last]
+    tables = [
+        _copy(track.data, track.stsd),
+        _make_table("stts", "II", _run_lengths(track.durations[first:last])),
+    ]
+    if track.composition is not None:
+        ctts = _run_lengths(track.composition[first:last])
+        tables.append(_make_table("ctts", "II", ctts, track.ctts_version))
+    if track.sync is not None:
+        lower, upper = bisect_left(track.sync, first), bisect_left(track.sync, last)
+        stss = [(i - first + 1,) for i in track.sync[lower:upper]]
+        tables.append(_make_table("stss", "I", stss))
+
+    # Samples that follow each other in the clip share a chunk.
+    chunks: List[int] = []
+    runs: List[List[int]] = []
+    end = None
+    for index, offset in enumerate(offsets):
+        description = track.descriptions[first + index]
+        if offset != end or runs[-1][1] != description:
+            chunks.append(offset)
+            runs.append([0, description])
+        runs[-1][0] += 1
+        end = offset + sizes[index]
+    stsc: List[Tuple[int, int, int]] = []
+    for chunk, (count, description) in enumerate(runs, 1):
+        if not stsc or stsc[-1][1:] != (count, description):
+            stsc.append((chunk, count, description))
+    tables.append(_make_table("stsc", "III", stsc))
+
+    if len(set(sizes)) == 1:
+        stsz = struct.pack(">II", sizes[0], len(sizes))
+    else:
+        stsz = struct.pack(f">II{len(sizes)}I", 0, len(sizes), *sizes)
+    tables.append(make_full_box("stsz", 0, stsz))
+    if co64:
+        tables.append(_make_table("co64", "Q", [(chunk,) for chunk in chunks]))
+    else:
+        tables.append(_make_table("stco", "I", [(chunk,) for chunk in chunks]))
+    return make_box("stbl", *tables)
+
+
+def _build_trak(
+    movie: Movie,
+    track: Track,
+    first: int,
+    last: int,
+    offsets: List[int],
+    co64: bool,
+) -> Tuple[bytes, int]:
+    """Builds the trak box of a clipped track, and its duration in movie units."""
+    data = track.data
+    media_duration = track.times[last] - track.times[first]
+    duration = media_duration * movie.timescale // track.timescale
+
+    offset, header, size = track.minf
+    minf = [
+        _copy(data, box)
+        for kind, box in iter_boxes(data, offset + header, offset + size)
+        if kind != "stbl"
+    ]
+    minf.append(_build_stbl(track, first, last, offsets, co64))
+    mdia = make_box(
+        "mdia",
+        _patch_duration(data, track.mdhd, media_duration, 24, 16),
+        _copy(data, track.hdlr),
+        make_box("minf", *minf),
+    )
+    # Edit lists and sample groups index the source timeline and are dropped.
+    trak = make_box("trak", _patch_duration(data, track.tkhd, duration, 28, 20), mdia)
+    return trak, duration
+
+
+def plan_clip(movie: Movie, start: float, end: float) -> Clip:
+    """
+    Plans an MP4 clip between two times.
+
+    The clip starts at the last video keyframe at or before `start`, so it
+    decodes from its first frame, and ends before the first video frame at
+    or after `end`. The other tracks keep their samples in that interval.
+    The clip index is placed before its media data, so it plays while it is
+    being downloaded.
+
+    Args:
+        movie (Movie): The index of the source file.
+        start (float): Start time in seconds.
+        end (float): End time in seconds.
+
+    Returns:
+        Clip: The clip header and the byte ranges to copy after it.
+
+    Raises:
+        ValueError: If the interval is invalid or holds no sample.
+    """
+    if start < 0 or end <= start:
+        raise ValueError("the clip must end after it starts")
+    if start >= movie.duration:
+        raise ValueError(
+            f"the clip starts after the end of the video ({movie.duration:.2f}s)"
+        )
+    reference = movie.video or movie.tracks[0]
+    first = reference.sync_before(round(start * reference.timescale))
+    last = reference.index_at(round(end * reference.timescale))
+    if last <= first:
+        raise ValueError(f"the clip is empty, the video lasts {movie.duration:.2f}s")
+    clip_start = reference.times[first] / reference.timescale
+    clip_end = reference.times[last] / reference.timescale
+
+    selection: List[Tuple[Track, int, int]] = []
+    for track in movie.tracks:
+        if track is reference:
+            selection.append((track, first, last))
+            continue
+        a = track.index_at(round(clip_start * track.timescale))
+        b = track.index_at(round(clip_end * track.timescale))
+        if b > a:
+            selection.append((track, a, b))
+
+    # Selected samples are copied in runs of the source, holes included.
+    pieces = sorted(
+        (track.offsets[i], track.offsets[i] + track.sizes[i])
+        for track, a, b in selection
+        for i in range(a, b)
+    )
+    spans: List[List[int]] = []
+    for piece_start, piece_end in pieces:
+        if spans and piece_start <= spans[-1][1] + MERGE_GAP:
+            spans[-1][1] = max(spans[-1][1], piece_end)
+        else:
+            spans.append([piece_start, piece_end])
+    span_starts = [span_start for span_start, _ in spans]
+    positions = list(accumulate((e - s for s, e in spans), initial=0))
+    payload = positions[-1]
+
+    large = payload + 8 > MAX_UINT32
+    mdat_header = (
+        struct.pack(">I4sQ", 1, b"mdat", payload + 16)
+        if large
+        else struct.pack(">I4s", payload + 8, b"mdat")
+    )
+    ftyp = movie.ftyp or DEFAULT_FTYP
+
+    def build_moov(base: int, co64: bool) -> bytes:
+        traks, duration = [], 0
+        for track, a, b in selection:
+            offsets = []
+            for i in range(a, b):
+                span = bisect_right(span_starts, track.offsets[i]) - 1
+                shift = base + positions[span] - spans[span][0]
+                offsets.append(track.offsets[i] + shift)
+            trak, track_duration = _build_trak(movie, track, a, b, offsets, co64)
+            traks.append(trak)
+            duration = max(duration, track_duration)
+        mvhd = _patch_duration(movie.moov, movie.mvhd, duration, 24, 16)
+        return make_box("moov", mvhd, *traks)
+
+    # The moov size does not depend on the offsets, only on their width.
+    size = len(build_moov(0, False))
+    co64 = len(ftyp) + size + len(mdat_header) + payload > MAX_UINT32
+    base = len(ftyp) + len(build_moov(0, co64)) + len(mdat_header)
+    header = ftyp + build_moov(base, co64) + mdat_header
+
+    ranges = [(s, e - 1, base + positions[i]) for i, (s, e) in enumerate(spans)]
+    return Clip(header, ranges, clip_start, clip_end)
@@ -1,28 +1,170 @@
-import urllib.request
-from threading import Thread
-from typing import List, Optional, Tuple
+import codecs, http.client, random, time, zlib
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from threading import Event, Lock
+from uqload_dl import http_pool
+from uqload_dl.http_pool import RETRY_STATUSES
+from uqload_dl.extractor import PageScanner
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+PAGE_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 OPR/120.0.0.0"
+    ),
+    "Accept": (
+        "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
+        "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
+    ),
+    "Referer": "https://www.google.com",
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# Worker threads of the executor shared by every fetcher of the process.
+DEFAULT_MAX_WORKERS = 8
+# Bytes read at a time when a page is scanned while it downloads.
+READ_SIZE = 16 * 1024
+# After an early stop, a rest of the body this small is drained so the
+# connection can be reused; a larger one is cheaper to drop.
+DRAIN_LIMIT = 64 * 1024
+
+
+class ContentDecoder:
+    """
+    Decompresses a gzip or deflate response body chunk by chunk.
+
+    Other encodings were not asked for and are passed through unchanged.
+
+    Args:
+        encoding (str, optional): The Content-Encoding header of the response.
+    """
+
+    def __init__(self, encoding: Optional[str] = None) -> None:
+        encoding = encoding.strip().lower() if isinstance(encoding, str) else ""
+        self.__zlib = None
+        # Some servers send raw deflate data instead of the zlib format.
+        self.__try_raw = encoding == "deflate"
+        if encoding in ("gzip", "x-gzip"):
+            self.__zlib = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            self.__zlib = zlib.decompressobj()
+
+    def decompress(self, data: bytes) -> bytes:
+        """
+        Decompresses the next chunk of the body.
+
+        Args:
+            data (bytes): The chunk as received.
+
+        Returns:
+            bytes: The decompressed bytes available so far.
+
+        Raises:
+            zlib.error: If the body is not valid compressed data.
+        """
+        if self.__zlib is None:
+            return data
+        try:
+            decompressed = self.__zlib.decompress(data)
+        except zlib.error:
+            if not self.__try_raw:
+                raise
+            self.__zlib = zlib.decompressobj(-zlib.MAX_WBITS)
+            decompressed = self.__zlib.decompress(data)
+        self.__try_raw = False
+        return decompressed
+
+    def flush(self) -> bytes:
+        """Returns the bytes left once the whole body has been decompressed."""
+        return self.__zlib.flush() if self.__zlib is not None else b""
+
+
+_shared_executor: Optional[ThreadPoolExecutor] = None
+_shared_lock = Lock()
+
+
+def get_shared_executor() -> ThreadPoolExecutor:
+    """
+    Returns the executor shared by every fetcher of the process.
+
+    It is created on first use with DEFAULT_MAX_WORKERS threads, so the
+    number of threads stays bounded however many pages are fetched.
+
+    Returns:
+        ThreadPoolExecutor: The shared executor.
+    """
+    global _shared_executor
+    with _shared_lock:
+        if _shared_executor is None:
+            _shared_executor = ThreadPoolExecutor(
+                max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix="uqload-fetch"
+            )
+        return _shared_executor
 
 
 class ParallelURLFetcher:
     """
-    Fetches multiple URLs concurrently using threads.
+    Fetches multiple URLs concurrently on a bounded pool of threads.
 
     This class is designed to send parallel HTTP GET requests to a list of URLs,
-    and collect their response content (decoded as UTF-8 text).
+    and collect their response content (decoded as UTF-8 text, with invalid
+    bytes replaced). Pages are requested compressed and decompressed as they
+    arrive. Requests go through the shared keep-alive connection pool.
+    Network errors and temporary server errors are retried with jittered
+    exponential backoff. Pages given a PageScanner are scanned while they
+    download and their connection is closed as soon as the scanner is done.
+
+    A fetcher can be kept and reused: pass the URLs to fetch_all() instead
+    of the constructor.
     """
 
-    def __init__(self, urls: List[str]) -> None:
+    def __init__(
+        self,
+        urls: Optional[List[str]] = None,
+        timeout: float = 10,
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_workers: Optional[int] = None,
+    ) -> None:
         """
-        Initializes the fetcher with a list of URLs.
+        Initializes the fetcher.
 
         Args:
-            urls (List[str]): List of non-empty URL strings.
+            urls (List[str], optional): List of non-empty URL strings fetched by
+                fetch_all() when it is called without URLs.
+            timeout (float, optional): Timeout in seconds of each request.
+            retries (int, optional): Extra attempts for a failed request.
+            backoff (float, optional): Base delay in seconds between attempts,
+                doubled on each retry.
+            max_workers (int, optional): Threads of a private executor. Defaults
+                to the executor shared by every fetcher.
 
         Raises:
-            ValueError: If the list is empty or contains invalid items.
+            ValueError: If the list is empty or contains invalid items, or on
+                invalid options.
         """
-        self._urls = self._validate_urls(urls)
-        self._indexed_responses: List[Tuple[int, Optional[str]]] = []
+        if type(retries) is not int or retries < 0:
+            raise ValueError("retries must be a non-negative integer")
+        if type(timeout) not in (int, float) or timeout <= 0:
+            raise ValueError("timeout must be a positive number")
+        if type(backoff) not in (int, float) or backoff < 0:
+            raise ValueError("backoff must be a non-negative number")
+        self._urls = None if urls is None else self._validate_urls(urls)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._executor: Executor = (
+            get_shared_executor()
+            if max_workers is None
+            else ThreadPoolExecutor(max_workers, thread_name_prefix="uqload-fetch")
+        )
+        self._owns_executor = max_workers is not None
 
     def _validate_urls(self, urls: List[str]) -> List[str]:
         """
@@ -41,58 +183,191 @@ class ParallelURLFetcher:
             raise ValueError("The URL list must contain non-empty strings.")
         return urls
 
-    def _fetch_single_url(self, url: str, index: int) -> None:
+    def _read_text(
+        self,
+        response: http_pool.PooledResponse,
+        scanner: Optional[PageScanner],
+        cancel: Optional[Event] = None,
+    ) -> Optional[str]:
         """
-        Fetches a single URL and stores the response content.
+        Reads, decompresses and decodes a response body, stopping when the
+        scanner is done.
 
         Args:
-            url (str): The URL to fetch.
-            index (int): The index in the original URL list (for ordering).
-        """
-        try:
-            headers = {
-                "User-Agent": (
-                    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
-                    "(KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36 OPR/120.0.0.0"
-                ),
-                "Accept": (
-                    "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,"
-                    "image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7"
-                ),
-                "Referer": "https://www.google.com",
-                "Accept-Language": "en-US,en;q=0.9",
-            }
-            request = urllib.request.Request(url, headers=headers)
-            with urllib.request.urlopen(request, timeout=10) as response:
-                if response.getcode() == 200:
-                    content = response.read().decode("utf-8")
-                    self._indexed_responses.append((index, content))
-                else:
-                    self._indexed_responses.append((index, None))
-        except Exception as ex:
-            self._indexed_responses.append((index, None))
-            print("ERROR: ParallelURLFetcher ", ex)
-
-    def _run_fetch_threads(self) -> None:
+            response (PooledResponse): The response to read.
+            scanner (PageScanner, optional): Decides when to stop reading.
+            cancel (Event, optional): Abandons a scanned page once set.
+
+        Returns:
+            Optional[str]: The text read, or None if cancelled.
         """
-        Starts and joins threads for fetching all URLs in parallel.
+        content = ContentDecoder(response.info().get("Content-Encoding"))
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        if scanner is None:
+            body = content.decompress(response.read()) + content.flush()
+            return decoder.decode(body, final=True)
+
+        scanner.reset()
+        while chunk := response.read(READ_SIZE):
+            if cancel is not None and cancel.is_set():
+                return None
+            if scanner.feed(decoder.decode(content.decompress(chunk))):
+                if response.length is not None and response.length <= DRAIN_LIMIT:
+                    response.read()
+                return scanner.text
+        scanner.feed(decoder.decode(content.flush(), final=True))
+        return scanner.text
+
+    def _fetch_single_url(
+        self,
+        url: str,
+        scanner: Optional[PageScanner] = None,
+        cancel: Optional[Event] = None,
+    ) -> Optional[str]:
         """
-        threads: List[Thread] = []
-        for idx, url in enumerate(self._urls):
-            thread = Thread(target=self._fetch_single_url, args=(url, idx))
-            threads.append(thread)
-            thread.start()
+        Fetches a single URL, retrying network errors and temporary failures.
 
-        for thread in threads:
-            thread.join()
+        Args:
+            url (str): The URL to fetch.
+            scanner (PageScanner, optional): Scans the page while it downloads
+                and stops reading when done. Only the text read is returned.
+            cancel (Event, optional): Abandons the fetch once set.
+
+        Returns:
+            Optional[str]: The response content, or None if it could not be fetched.
+        """
+        for attempt in range(self.retries + 1):
+            if cancel is not None and cancel.is_set():
+                return None
+            if attempt:
+                time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+            try:
+                with http_pool.urlopen(
+                    url, headers=PAGE_HEADERS, timeout=self.timeout
+                ) as response:
+                    status = response.getcode()
+                    if status == 200:
+                        return self._read_text(response, scanner, cancel)
+                    if status not in RETRY_STATUSES:
+                        return None
+            except (OSError, http.client.HTTPException, zlib.error) as ex:
+                if attempt == self.retries:
+                    print("ERROR: ParallelURLFetcher ", ex)
+            except Exception as ex:
+                print("ERROR: ParallelURLFetcher ", ex)
+                return None
+        return None
 
-    def fetch_all(self) -> List[Optional[str]]:
+    def fetch_all(
+        self,
+        urls: Optional[List[str]] = None,
+        scanners: Optional[Sequence[Optional[PageScanner]]] = None,
+    ) -> List[Optional[str]]:
         """
-        Initiates the fetching process for all URLs and returns responses in order.
+        Fetches every URL in parallel and returns the responses in order.
+
+        Args:
+            urls (List[str], optional): The URLs to fetch. Defaults to the URLs
+                given to the constructor.
+            scanners (Sequence[Optional[PageScanner]], optional): A scanner, or
+                None, for each URL, to stop reading a page early.
 
         Returns:
             List[Optional[str]]: A list of response contents (as text), ordered by original input.
                                  If a URL fails or does not return 200, its position will be None.
+
+        Raises:
+            ValueError: If there are no URLs or they are invalid.
         """
-        self._run_fetch_threads()
-        return [resp for _, resp in sorted(self._indexed_responses)]
+        urls = self._urls if urls is None else self._validate_urls(urls)
+        if urls is None:
+            raise ValueError("The URL list must contain non-empty strings.")
+
+        scanners = scanners or [None] * len(urls)
+        if len(scanners) != len(urls):
+            raise ValueError("There must be one scanner per URL.")
+
+        futures = [
+            self._executor.submit(self._fetch_single_url, url, scanner)
+            for url, scanner in zip(urls, scanners)
+        ]
+        responses: List[Optional[str]] = [None] * len(futures)
+        for index, future in enumerate(futures):
+            responses[index] = future.result()
+        return responses
+
+    def fetch_first(
+        self,
+        urls: List[str],
+        scanners: Sequence[PageScanner],
+        accept: Callable[[str], bool],
+        stagger: float = 0.0,
+    ) -> Tuple[Optional[int], Optional[str], Dict[int, Optional[float]]]:
+        """
+        Races the URLs and returns the first response that is accepted.
+
+        The URLs are started in order, each one `stagger` seconds after the
+        previous one or as soon as an earlier one fails, so the first URLs
+        win without load on the others when they answer quickly. Once a
+        response is accepted the rest are cancelled: pending fetches never
+        start and running ones stop at their next chunk.
+
+        Args:
+            urls (List[str]): The URLs, in order of preference.
+            scanners (Sequence[PageScanner]): A scanner for each URL.
+            accept (Callable[[str], bool]): Tells whether a page is valid.
+            stagger (float, optional): Seconds between starts. 0 starts all at once.
+
+        Returns:
+            Tuple[Optional[int], Optional[str], Dict[int, Optional[float]]]: The
+            index and text of the winner, or (None, None) if every URL failed,
+            and the seconds each finished fetch took, None for failures.
+
+        Raises:
+            ValueError: If the URLs are invalid or do not match the scanners.
+        """
+        urls = self._validate_urls(urls)
+        if len(scanners) != len(urls):
+            raise ValueError("There must be one scanner per URL.")
+
+        cancel = Event()
+
+        def attempt(index: int) -> Tuple[Optional[str], float]:
+            started = time.monotonic()
+            text = self._fetch_single_url(urls[index], scanners[index], cancel)
+            return text, time.monotonic() - started
+
+        outcomes: Dict[int, Optional[float]] = {}
+        pending: Dict[Future, int] = {}
+        next_index = 0
+        try:
+            while next_index < len(urls) or pending:
+                timeout = None
+                if next_index < len(urls):
+                    pending[self._executor.submit(attempt, next_index)] = next_index
+                    next_index += 1
+                    timeout = stagger if next_index < len(urls) else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    text, elapsed = future.result()
+                    if text is not None and accept(text):
+                        outcomes[index] = elapsed
+                        return index, text, outcomes
+                    outcomes[index] = None
+        finally:
+            cancel.set()
+            for future in pending:
+                future.cancel()
+        return None, None, outcomes
+
+    def close(self) -> None:
+        """Shuts down the private executor, if the fetcher has one."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "ParallelURLFetcher":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,78 @@
+import time
+from typing import Callable, Optional
+
+
+class ProgressDispatcher:
+    """
+    Coalesces progress updates before they reach a callback.
+
+    An update is delivered when at least `min_interval` seconds have passed
+    or at least `min_bytes` bytes have been transferred since the last
+    delivered one. The final update (downloaded == total) is always delivered.
+
+    Args:
+        callback (Callable): Function called with (downloaded, total).
+        min_interval (float, optional): Minimum seconds between two callbacks.
+            None disables the time criterion. Defaults to 0.1.
+        min_bytes (int, optional): Minimum bytes between two callbacks.
+            None disables the byte criterion. Defaults to None.
+
+    Raises:
+        ValueError: If no criterion is set.
+    """
+
+    def __init__(
+        self,
+        callback: Callable,
+        min_interval: Optional[float] = 0.1,
+        min_bytes: Optional[int] = None,
+    ) -> None:
+        if min_interval is None and min_bytes is None:
+            raise ValueError("min_interval or min_bytes must be set")
+        self.callback = callback
+        self.min_interval = min_interval
+        self.min_bytes = min_bytes
+        self.delivered = 0
+        self.__last_time = float("-inf")
+        self.__last_bytes: Optional[int] = None
+        self.__pending = None
+
+    def update(self, downloaded: int, total: int) -> None:
+        """
+        Records progress and calls the callback if a threshold is reached.
+
+        Args:
+            downloaded (int): Bytes downloaded so far.
+            total (int): Total bytes.
+        """
+        now = time.monotonic()
+        if self.__is_due(downloaded, total, now):
+            self.__deliver(downloaded, total, now)
+        else:
+            self.__pending = (downloaded, total)
+
+    def flush(self) -> None:
+        """Delivers the last update if it was held back."""
+        if self.__pending is not None:
+            self.__deliver(*self.__pending, time.monotonic())
+
+    def __is_due(self, downloaded: int, total: int, now: float) -> bool:
+        """Returns True if the update must be delivered now."""
+        if downloaded >= total or self.__last_bytes is None:
+            return True
+        if self.min_interval is not None:
+            if now - self.__last_time >= self.min_interval:
+                return True
+        if self.min_bytes is not None:
+            if downloaded - self.__last_bytes >= self.min_bytes:
+                return True
+        return False
+
+    def __deliver(self, downloaded: int, total: int, now: float) -> None:
+        """Calls the callback, skipping duplicates of the last delivered update."""
+        self.__pending = None
+        if downloaded == self.__last_bytes:
+            return
+        self.__last_time, self.__last_bytes = now, downloaded
+        self.delivered += 1
+        self.callback(downloaded, total)
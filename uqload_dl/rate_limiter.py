@@ -0,0 +1,113 @@
+import time
+from threading import Lock
+from typing import Optional, Union
+
+# Seconds of traffic the bucket may accumulate and release as a burst.
+BURST_SECONDS = 0.25
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket limiting a byte rate.
+
+    Every byte consumes one token. Tokens refill continuously at `rate` per
+    second up to `capacity`. Consumers may go into debt, which makes them
+    wait just long enough for the debt to be paid back, so large reads are
+    spread out instead of rejected.
+
+    Args:
+        rate (float): Bytes per second.
+        capacity (float, optional): Maximum burst in bytes. Defaults to
+            BURST_SECONDS worth of traffic.
+
+    Raises:
+        ValueError: If rate is not a positive number.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.__lock = Lock()
+        self.__tokens = 0.0
+        self.__updated_at = time.monotonic()
+        self.configure(rate, capacity)
+
+    @property
+    def rate(self) -> float:
+        """Returns the rate in bytes per second."""
+        return self.__rate
+
+    def configure(self, rate: float, capacity: Optional[float] = None) -> None:
+        """
+        Changes the rate and burst capacity.
+
+        Args:
+            rate (float): Bytes per second.
+            capacity (float, optional): Maximum burst in bytes.
+
+        Raises:
+            ValueError: If rate is not a positive number.
+        """
+        if type(rate) not in (int, float) or rate <= 0:
+            raise ValueError("rate must be a positive number")
+        with self.__lock:
+            self.__rate = float(rate)
+            self.__capacity = float(capacity or rate * BURST_SECONDS)
+            self.__tokens = min(self.__tokens, self.__capacity)
+
+    def consume(self, amount: int) -> None:
+        """
+        Takes `amount` tokens, sleeping until the bucket can afford them.
+
+        Args:
+            amount (int): Number of bytes transferred.
+        """
+        wait = self.reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    def reserve(self, amount: int) -> float:
+        """
+        Takes `amount` tokens without sleeping.
+
+        Used by asyncio code, which waits with asyncio.sleep() instead.
+
+        Args:
+            amount (int): Number of bytes transferred.
+
+        Returns:
+            float: Seconds the caller must wait before transferring more.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(
+                self.__capacity,
+                self.__tokens + (now - self.__updated_at) * self.__rate,
+            )
+            self.__updated_at = now
+            self.__tokens -= amount
+            return -self.__tokens / self.__rate if self.__tokens < 0 else 0
+
+
+_shared_bucket: Optional[TokenBucket] = None
+_shared_lock = Lock()
+
+
+def get_shared_bucket(rate: Union[int, float]) -> TokenBucket:
+    """
+    Returns the bucket shared by every download of the process.
+
+    The first call creates it; later calls update its rate, so the aggregate
+    of all concurrent downloads stays under the most recently set limit.
+
+    Args:
+        rate (int, float): Bytes per second.
+
+    Returns:
+        TokenBucket: The process-wide bucket.
+    """
+    global _shared_bucket
+    with _shared_lock:
+        if _shared_bucket is None:
+            _shared_bucket = TokenBucket(rate)
+        elif _shared_bucket.rate != rate:
+            _shared_bucket.configure(rate)
+        return _shared_bucket
@@ -1,16 +1,32 @@
-import re, urllib.request
 from uuid import uuid4
+from uqload_dl.extractor import (
+    embed_page_scanner,
+    extract_video_data,
+    is_embed_page,
+    video_page_scanner,
+)
+from uqload_dl.mirrors import (
+    RACE_STAGGER,
+    MirrorStats,
+    get_default_stats,
+    normalize_mirror,
+)
 from uqload_dl.parallel_url_fetcher import ParallelURLFetcher
 from uqload_dl.utils import (
-    is_uqload_url,
+    format_duration,
+    format_embed_url,
+    get_video_id,
     remove_special_characters,
     is_a_callback,
     is_a_valid_directory,
     validate_output_file,
 )
 from uqload_dl.file_downloader import FileDownloader
+from uqload_dl.metadata_cache import MetadataCache
+from uqload_dl.metrics import JobMetrics, report_metrics
 from uqload_dl.exceptions import VideoNotFound
-from typing import Dict, Callable, Union
+from uqload_dl.write_pipeline import DEFAULT_BUFFER_MEMORY
+from typing import Any, BinaryIO, Dict, Callable, Iterator, Optional, Sequence, Union
 
 
 class UQLoad:
@@ -24,6 +40,17 @@ class UQLoad:
         output_file: str = None,
         output_dir: str = None,
         on_progress_callback: Callable = None,
+        connections: int = 1,
+        rate_limit: Union[int, float, str] = None,
+        cache: Optional[MetadataCache] = None,
+        fetcher: Optional[ParallelURLFetcher] = None,
+        mirrors: Optional[Sequence[str]] = None,
+        mirror_stats: Optional[MirrorStats] = None,
+        on_metrics_callback: Callable = None,
+        sink: str = "pwrite",
+        fsync: str = "complete",
+        buffer_memory: Union[int, str] = DEFAULT_BUFFER_MEMORY,
+        video_page: bool = True,
     ) -> None:
         """
         Initializes the UQLoad instance.
@@ -33,15 +60,54 @@ class UQLoad:
             output_file (Optional[str], optional): Custom name for the output file.
             output_dir (Optional[str], optional): Directory where the video will be saved.
             on_progress_callback (Optional[Callable], optional): A function to report download progress.
+            connections (int, optional): Number of parallel connections used to download the video.
+            rate_limit (Union[int, float, str], optional): Maximum download rate in bytes per second
+                (e.g. "2M"), shared by every download of the process.
+            cache (Optional[MetadataCache], optional): Cache of resolved video metadata.
+            fetcher (Optional[ParallelURLFetcher], optional): Fetcher of the video pages,
+                which can be shared by many instances.
+            mirrors (Optional[Sequence[str]], optional): Uqload domains raced for the
+                embed page, e.g. DEFAULT_MIRRORS. The fastest valid answer wins.
+            mirror_stats (Optional[MirrorStats], optional): Mirror stats used to
+                order the race, defaults to the stats shared by the process.
+            on_metrics_callback (Optional[Callable], optional): Called with the job
+                metrics (page fetch, HEAD, connect, time to first byte, transfer,
+                bytes, retries and status) once download() ends.
+            sink (str, optional): How the video file is written: "pwrite", "mmap"
+                or "buffered".
+            fsync (str, optional): When the video data is forced to disk: "never",
+                "complete" or "periodic".
+            buffer_memory (Union[int, str], optional): Ceiling of the memory held
+                by video data read but not written to disk yet, e.g. "64M".
+            video_page (bool, optional): Also fetch the plain video page, for
+                its title. Set to False to resolve the video from the embed
+                page alone; the resolution and duration come from the video
+                file either way.
 
         Raises:
             ValueError: If the URL is invalid.
         """
         self.__video_info: Dict[str, Union[str, None]] = {}
+        self.__downloader: Optional[FileDownloader] = None
+        self.__from_cache = False
+        self.__title: Optional[str] = None
         self.url = self.__validate_url(url)
+        self.video_id = get_video_id(self.url)
         self.output_dir = is_a_valid_directory(output_dir)
         self.output_file = self.__validate_output_file(output_file)
         self.on_progress_callback = is_a_callback(on_progress_callback)
+        self.connections = connections
+        self.rate_limit = rate_limit
+        self.cache = cache
+        self.fetcher = fetcher
+        self.mirrors = [normalize_mirror(mirror) for mirror in mirrors or ()]
+        self.mirror_stats = mirror_stats
+        self.on_metrics_callback = is_a_callback(on_metrics_callback)
+        self.metrics = JobMetrics(self.video_id)
+        self.sink = sink
+        self.fsync = fsync
+        self.buffer_memory = buffer_memory
+        self.video_page = video_page
 
     def __validate_output_file(self, output_file: str = None) -> Union[str, None]:
         """
@@ -73,26 +139,16 @@ class UQLoad:
         Raises:
             ValueError: If the URL is invalid or does not match UQload patterns.
         """
-        if url is None or not isinstance(url, str) or len(url) < 12:
-            raise ValueError("Invalid Uqload URL. Please try again.")
-
-        parts = url.rsplit("/", 1)
-        base_url = parts[0] if len(parts) == 2 else "https://uqload.cx"
-        video_id = parts[-1]
+        return format_embed_url(url)
 
-        video_id = f"{video_id}.html" if ".html" not in video_id else video_id
-        video_id = f"embed-{video_id}" if "embed-" not in video_id else video_id
-
-        full_url = f"{base_url}/{video_id}"
-
-        if not is_uqload_url(full_url):
-            raise ValueError("Invalid Uqload URL. Please try again.")
+    def __resolve(self) -> Dict[str, Any]:
+        """
+        Scrapes the video data from UQload.
 
-        return full_url
+        Deleted videos are recorded in the cache as negative entries.
 
-    def __get_video(self) -> None:
-        """
-        Retrieves video data from UQload and prepares the downloader.
+        Returns:
+            Dict[str, Any]: The video metadata, with a sanitized title.
 
         Raises:
             ValueError: If network content is missing.
@@ -100,82 +156,290 @@ class UQLoad:
         """
         print(f"Looking for video...")
 
-        urls = [self.url, self.url.replace("embed-", "")]
-        responses = ParallelURLFetcher(urls).fetch_all()
-
-        if responses[0] is None and responses[1] is None:
-            raise ValueError("No content")
-
-        if "File was deleted" in responses[0]:
-            raise VideoNotFound("The video has been deleted or does not exist")
+        fetcher = self.fetcher or ParallelURLFetcher()
+        if self.mirrors:
+            embed_page = self.__race_mirrors(fetcher)
+            page = None
+            if embed_page is not None and self.video_page:
+                url = self.url.replace("embed-", "")
+                page = fetcher.fetch_all([url], [video_page_scanner()])[0]
+            responses = [embed_page, page]
+        elif self.video_page:
+            urls = [self.url, self.url.replace("embed-", "")]
+            # Both pages are scanned as they arrive and closed once complete.
+            scanners = [embed_page_scanner(), video_page_scanner()]
+            responses = fetcher.fetch_all(urls, scanners)
+        else:
+            responses = fetcher.fetch_all([self.url], [embed_page_scanner()]) + [None]
+
+        try:
+            data = extract_video_data(*responses)
+        except VideoNotFound:
+            if self.cache:
+                self.cache.put_missing(self.video_id)
+            raise
+
+        return {
+            "url": data["video_url"],
+            "title": remove_special_characters(data["title"]),
+            "image_url": data["image_url"],
+            "resolution": data["resolution"],
+            "duration": data["duration"],
+            "codec": None,
+            "bitrate": None,
+            "size": None,
+            "type": None,
+        }
 
-        response_text_0, response_text_1 = responses
+    def __race_mirrors(self, fetcher: ParallelURLFetcher) -> Optional[str]:
+        """
+        Races the mirrors for the embed page and records how each one did.
 
-        matches = re.findall(r"https?://.+/v\.mp4", response_text_0)
-        if not matches:
-            raise VideoNotFound("The video has been deleted or does not exist")
+        The winning mirror becomes the URL of this instance.
 
-        video_url = matches[0]
-        image_url = re.findall(r"https?://.*?\.jpg", response_text_0)[0]
-        title_match = re.findall(r'title:\s*"([^"]+)"', response_text_0)
-        title = title_match[0] if title_match else "video"
+        Args:
+            fetcher (ParallelURLFetcher): The fetcher running the race.
 
-        # NOTE: sometimes the duration and resolution may not be available.
+        Returns:
+            Optional[str]: The embed page, or None if no mirror answered.
+        """
+        stats = self.mirror_stats or get_default_stats()
+        mirrors = stats.rank(self.mirrors)
+        urls = [f"https://{mirror}/embed-{self.video_id}.html" for mirror in mirrors]
+        index, embed_page, outcomes = fetcher.fetch_first(
+            urls,
+            [embed_page_scanner() for _ in urls],
+            accept=is_embed_page,
+            stagger=RACE_STAGGER,
+        )
+        for position, latency in outcomes.items():
+            stats.record(mirrors[position], latency)
+        stats.save()
 
-        resolution = duration = None
+        if index is not None:
+            self.url = urls[index]
+        return embed_page
 
-        class_names = re.findall(r'class\s*=\s*[\'"]([^\'" ]+)[\'"]', response_text_1)
-        if not "err" in class_names:
-            h1_match = re.findall(r"<h1[^>]*>(.*?)</h1>", response_text_1, re.DOTALL)
-            if h1_match:
-                title = remove_special_characters(" ".join(h1_match[0].split()))
+    def __get_video(self, use_cache: bool = True, refresh_link: bool = False) -> None:
+        """
+        Retrieves video data, from the cache when possible, and prepares the downloader.
 
-            textarea_content = re.findall(
-                r"<textarea[^>]*>(.*?)</textarea>", response_text_1, re.DOTALL
-            )
-            pattern = r"\[(\d+x\d+)\, ((\d+:)*\d+)\]"
-            for text in textarea_content:
-                match = re.search(pattern, text)
-                if match:
-                    resolution, duration = match.group(1), match.group(2)
-                    break
+        Args:
+            use_cache (bool, optional): Whether a fresh cache entry may be used.
+            refresh_link (bool, optional): Only renew the video link: the rest of
+                the info already known, such as the probed size, is kept.
 
-        final_title = remove_special_characters(title)
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+        """
+        previous = self.__video_info
+        data = self.cache.get(self.video_id) if self.cache and use_cache else None
+        self.__from_cache = data is not None
+        if not self.__from_cache:
+            with self.metrics.phase("page_fetch"):
+                data = self.__resolve()
+
+        self.__title = data["title"]
         if not self.output_file:
-            self.output_file = final_title or uuid4().hex
+            self.output_file = data["title"] or uuid4().hex
 
         self.__downloader = FileDownloader(
-            url=video_url,
+            url=data["url"],
             filename=self.output_file,
             output_dir=self.output_dir,
             on_progress_callback=self.on_progress_callback,
+            connections=self.connections,
+            rate_limit=self.rate_limit,
+            on_metrics_callback=self.on_metrics_callback,
+            metrics=self.metrics,
+            sink=self.sink,
+            fsync=self.fsync,
+            buffer_memory=self.buffer_memory,
+            resume_key=self.video_id,
         )
 
         self.__video_info = {
-            "url": video_url,
+            "url": data["url"],
             "title": self.output_file,
-            "image_url": image_url,
-            "resolution": resolution,
-            "duration": duration,
-            "size": self.__downloader.total_size,
-            "type": self.__downloader.type,
+            "image_url": data["image_url"],
+            "resolution": data["resolution"],
+            "duration": data["duration"],
+            "codec": data.get("codec"),
+            "bitrate": data.get("bitrate"),
+            "size": data["size"],
+            "type": data["type"],
         }
-
-    def get_video_info(self) -> Dict[str, str]:
+        if refresh_link and previous:
+            self.__video_info = {**previous, "url": data["url"]}
+        if not self.__from_cache:
+            self.__store()
+
+    def __store(self) -> None:
+        """Writes the current video info to the cache, under the scraped title."""
+        if self.cache:
+            self.cache.put(self.video_id, {**self.__video_info, "title": self.__title})
+
+    @property
+    def destination(self) -> Optional[str]:
+        """Returns the path of the downloaded file, once a download has started."""
+        return self.__downloader.destination if self.__downloader else None
+
+    def get_video_info(self, use_cache: bool = True) -> Dict[str, str]:
         """
         Returns detailed information about the video.
 
+        A fresh cache entry answers without any request. Otherwise the size
+        and type, and the exact resolution, duration, codec and bitrate of
+        the video, are read from the headers of the video file with one or
+        two small Range requests, only when the info is asked for, and the
+        result is cached. If the file is not an MP4 file, the size and type
+        come from a HEAD request and the rest from the video page.
+
+        Args:
+            use_cache (bool, optional): Set to False to bypass the cache and
+                refresh its entry.
+
         Returns:
             Dict[str, Union[str, None]]: A dictionary containing video metadata.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
         """
-        if not self.__video_info:
-            self.__get_video()
+        if not self.__video_info or (self.__from_cache and not use_cache):
+            self.__get_video(use_cache)
+        if self.__video_info["size"] is None:
+            self.__probe()
+            self.__store()
         return self.__video_info
 
+    def __probe(self) -> None:
+        """
+        Fills the video info from the container of the video file.
+
+        Raises:
+            ValueError: If the video metadata cannot be retrieved.
+        """
+        try:
+            container = self.__downloader.probe_container()
+        except ValueError:
+            container = None
+            if self.__downloader.total_size is None:
+                self.__downloader.fetch_metadata()
+
+        self.__video_info["size"] = self.__downloader.total_size
+        self.__video_info["type"] = self.__downloader.type
+        if container:
+            if container["width"]:
+                resolution = f"{container['width']}x{container['height']}"
+                self.__video_info["resolution"] = resolution
+            self.__video_info["duration"] = format_duration(container["duration"])
+            self.__video_info["codec"] = container["codec"]
+            self.__video_info["bitrate"] = container["bitrate"]
+
+    def get_video_url(self) -> str:
+        """
+        Resolves the video for a transfer and returns the link of its file.
+
+        A transfer started afterwards uses this link without fetching the
+        pages again.
+
+        Returns:
+            str: The URL of the video file.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+        """
+        self.__prepare()
+        return self.__video_info["url"]
+
     def download(self) -> None:
         """
         Downloads the video to the specified output directory.
+
+        The video metadata is taken from the download response, so no
+        separate HEAD request is sent. Cached video links may have expired,
+        so info answered from the cache is resolved again first.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+            DownloadError: If the download stopped before the video was complete.
         """
-        if not self.__video_info:
-            self.__get_video()
+        self.__prepare()
         self.__downloader.download()
+
+    def download_clip(self, start: float, end: float) -> None:
+        """
+        Downloads the part of the video between two times as a playable MP4.
+
+        See FileDownloader.download_clip.
+
+        Args:
+            start (float): Start time, in seconds.
+            end (float): End time, in seconds.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+            DownloadError: If the download stopped before the clip was complete.
+        """
+        self.__prepare()
+        self.__downloader.download_clip(start, end)
+
+    def iter_content(self) -> Iterator[bytes]:
+        """
+        Yields the video in chunks as it arrives, without writing it to disk.
+
+        See FileDownloader.iter_content.
+
+        Yields:
+            bytes: The next chunk of the video.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+            DownloadError: If the stream stopped before the end of the video.
+        """
+        self.__prepare()
+        yield from self.__downloader.iter_content()
+
+    def stream_to(self, file: BinaryIO) -> None:
+        """
+        Writes the video to a binary file-like object, e.g. sys.stdout.buffer.
+
+        See FileDownloader.stream_to.
+
+        Args:
+            file (BinaryIO): The output. It is flushed at the end, not closed.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+            DownloadError: If the stream stopped before the end of the video,
+                or the output could not be written.
+        """
+        self.__prepare()
+        self.__downloader.stream_to(file)
+
+    def __prepare(self) -> None:
+        """
+        Resolves the video before a transfer, again if the info came from the cache.
+
+        The metrics of the job are reported if it fails here.
+
+        Raises:
+            ValueError: If network content is missing.
+            VideoNotFound: If the video has been deleted or not found.
+        """
+        try:
+            if not self.__video_info or self.__from_cache:
+                self.__get_video(use_cache=False, refresh_link=True)
+        except KeyboardInterrupt:
+            report_metrics(self.metrics, self.on_metrics_callback, "cancelled")
+            raise
+        except Exception as ex:
+            report_metrics(self.metrics, self.on_metrics_callback, "failed", ex)
+            raise
@@ -1,6 +1,13 @@
 import re, os
 from typing import Callable, Union
 
+# Compiled once at import; these run for every URL and title handled.
+SIZE_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*$", re.I)
+UQLOAD_URL_PATTERN = re.compile(
+    r"^https?://(www\.)?uqload\.[a-z]+/(embed-)?[a-zA-Z0-9]{12}\.html$"
+)
+SPECIAL_CHARACTERS_PATTERN = re.compile(r"[^a-zA-Z0-9\s\-\_áéíóúñÁÉÍÓÚÑüÜ]")
+
 
 # https://stackoverflow.com/questions/1094841/get-a-human-readable-version-of-a-file-size
 def sizeof_fmt(num, suffix="B"):
@@ -21,6 +28,52 @@ def sizeof_fmt(num, suffix="B"):
     return f"{num:.1f}Yi{suffix}"
 
 
+def format_duration(seconds: float) -> str:
+    """Convert a duration into the "mm:ss" or "h:mm:ss" form shown by Uqload.
+
+    Args:
+        seconds (float): The duration in seconds.
+
+    Returns:
+        str: The duration, e.g. "01:23" or "1:02:03".
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes:02d}:{seconds:02d}"
+
+
+def parse_size(size: Union[int, float, str]) -> int:
+    """Convert a human-readable size such as "500K" or "2.5MiB" into bytes.
+
+    Units are binary multiples (K = 1024). A trailing "B" or "iB" is optional.
+
+    Args:
+        size (int, float, str): The size as a number of bytes or a string.
+
+    Returns:
+        int: The size in bytes.
+
+    Raises:
+        ValueError: If the size is not a positive number or cannot be parsed.
+    """
+    if type(size) in (int, float):
+        value = size
+    elif isinstance(size, str):
+        match = SIZE_PATTERN.match(size)
+        if not match:
+            raise ValueError(f"Invalid size: {size}")
+        exponent = " kmgt".index(match.group(2).lower() or " ")
+        value = float(match.group(1)) * 1024**exponent
+    else:
+        raise ValueError(f"Invalid size: {size}")
+
+    if value <= 0:
+        raise ValueError("size must be a positive number")
+    return int(value)
+
+
 def validate_output_file(output_file: str) -> str:
     """
     Validates and sanitizes the output file name.
@@ -100,12 +153,60 @@ def is_uqload_url(url: str) -> bool:
     """
     if url is None:
         return False
-    uqload_regex = r"^https?://(www\.)?uqload\.[a-z]+/(embed-)?[a-zA-Z0-9]{12}\.html$"
-    if not isinstance(url, str) or not re.match(uqload_regex, url):
+    if not isinstance(url, str) or not UQLOAD_URL_PATTERN.match(url):
         return False
     return True
 
 
+def format_embed_url(url: str) -> str:
+    """
+    Validates a Uqload URL or video ID and formats it as an embed URL.
+
+    Bare IDs are resolved against https://uqload.cx.
+
+    Args:
+        url (str): The input URL or video ID.
+
+    Returns:
+        str: A validated and formatted embed URL.
+
+    Raises:
+        ValueError: If the URL is invalid or does not match Uqload patterns.
+    """
+    if url is None or not isinstance(url, str) or len(url) < 12:
+        raise ValueError("Invalid Uqload URL. Please try again.")
+
+    parts = url.rsplit("/", 1)
+    base_url = parts[0] if len(parts) == 2 else "https://uqload.cx"
+    video_id = parts[-1]
+
+    video_id = f"{video_id}.html" if ".html" not in video_id else video_id
+    video_id = f"embed-{video_id}" if "embed-" not in video_id else video_id
+
+    full_url = f"{base_url}/{video_id}"
+
+    if not is_uqload_url(full_url):
+        raise ValueError("Invalid Uqload URL. Please try again.")
+
+    return full_url
+
+
+def get_video_id(url: str) -> str:
+    """
+    Returns the 12 character ID of a Uqload URL or video ID.
+
+    Args:
+        url (str): The input URL or video ID.
+
+    Returns:
+        str: The video ID.
+
+    Raises:
+        ValueError: If the URL is invalid or does not match Uqload patterns.
+    """
+    return format_embed_url(url).rsplit("embed-", 1)[1].removesuffix(".html")
+
+
 def remove_special_characters(input_string: str) -> str:
     """
     Removes special characters from a string, leaving only alphanumeric characters,
@@ -125,7 +226,6 @@ def remove_special_characters(input_string: str) -> str:
         or not len(input_string)
     ):
         raise ValueError("input_string must be a non-empty string")
-    pattern = r"[^a-zA-Z0-9\s\-\_áéíóúñÁÉÍÓÚÑüÜ]"
-    cleaned_string = re.sub(pattern, " ", input_string)
+    cleaned_string = SPECIAL_CHARACTERS_PATTERN.sub(" ", input_string)
 
     return " ".join((cleaned_string.split()))
@@ -0,0 +1,141 @@
+import queue
+from threading import Lock, Thread
+from typing import Callable, Optional
+
+# Default ceiling of the memory held by buffers waiting to be written.
+DEFAULT_BUFFER_MEMORY = 16 * 1024 * 1024
+
+# Seconds a blocked reader waits between two checks for a writer failure.
+POLL_INTERVAL = 0.1
+
+
+class WritePipeline:
+    """
+    Decouples the network reads of a download from its disk writes.
+
+    Readers take a buffer from a bounded pool, fill it from the socket and
+    submit it. A writer thread drains submitted buffers to the sink, reports
+    them and recycles them. When the disk falls behind, the pool runs dry and
+    readers wait for a buffer: this backpressure caps the memory in flight at
+    `max_memory`, while the socket keeps being read as long as buffers remain.
+
+    A write error stops the writes and is raised to the readers by the next
+    acquire(), submit() or drain().
+
+    Args:
+        write (Callable): Called as write(offset, data) by the writer thread.
+        on_written (Callable): Called as on_written(offset, size) once the data
+            is written, by the writer thread.
+        max_memory (int, optional): Bytes of buffers allocated at most.
+        buffer_size (int, optional): Size of each buffer. Lowered if needed so
+            the pool holds at least two buffers.
+    """
+
+    def __init__(
+        self,
+        write: Callable,
+        on_written: Callable[[int, int], None],
+        max_memory: int = DEFAULT_BUFFER_MEMORY,
+        buffer_size: int = 1024 * 1024,
+    ) -> None:
+        self.buffer_size = max(1, min(buffer_size, max_memory // 2))
+        self.max_buffers = max(2, max_memory // self.buffer_size)
+        self.__write = write
+        self.__on_written = on_written
+        self.__free: "queue.Queue[bytearray]" = queue.Queue()
+        self.__pending: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self.__allocated = 0
+        self.__lock = Lock()
+        self.__error: Optional[BaseException] = None
+        self.__thread = Thread(target=self.__run, name="uqload-dl-writer", daemon=True)
+        self.__thread.start()
+
+    @property
+    def allocated(self) -> int:
+        """Returns the number of buffers allocated so far."""
+        return self.__allocated
+
+    def __raise_error(self) -> None:
+        """Raises the error of the writer thread, if any."""
+        if self.__error is not None:
+            raise self.__error
+
+    def acquire(self) -> bytearray:
+        """
+        Returns a free buffer, waiting for the writer if none is left.
+
+        Buffers are allocated on demand, up to the memory ceiling.
+
+        Returns:
+            bytearray: A buffer of buffer_size bytes.
+
+        Raises:
+            Exception: The error of the writer thread, if it failed.
+        """
+        while True:
+            self.__raise_error()
+            try:
+                return self.__free.get_nowait()
+            except queue.Empty:
+                pass
+            with self.__lock:
+                if self.__allocated < self.max_buffers:
+                    self.__allocated += 1
+                    return bytearray(self.buffer_size)
+            try:
+                return self.__free.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+    def release(self, buffer: bytearray) -> None:
+        """Gives back a buffer that will not be submitted."""
+        self.__free.put(buffer)
+
+    def submit(self, offset: int, buffer: bytearray, size: int) -> None:
+        """
+        Queues the first `size` bytes of a buffer to be written at `offset`.
+
+        The buffer belongs to the pipeline until the writer recycles it.
+
+        Raises:
+            Exception: The error of the writer thread, if it failed.
+        """
+        try:
+            self.__raise_error()
+        except BaseException:
+            self.release(buffer)
+            raise
+        self.__pending.put((offset, buffer, size))
+
+    def drain(self) -> None:
+        """
+        Waits until every submitted buffer is written.
+
+        Raises:
+            Exception: The error of the writer thread, if it failed.
+        """
+        self.__pending.join()
+        self.__raise_error()
+
+    def close(self) -> None:
+        """Writes the submitted buffers and stops the writer thread."""
+        self.__pending.put(None)
+        self.__thread.join()
+
+    def __run(self) -> None:
+        """Writes submitted buffers until close() is called."""
+        while True:
+            item = self.__pending.get()
+            if item is None:
+                self.__pending.task_done()
+                return
+            offset, buffer, size = item
+            try:
+                if self.__error is None:
+                    self.__write(offset, memoryview(buffer)[:size])
+                    self.__on_written(offset, size)
+            except BaseException as ex:
+                self.__error = ex
+            finally:
+                self.__free.put(buffer)
+                self.__pending.task_done()